@@ -0,0 +1,450 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+import logging
+
+from models import Resume
+
+# --- Analytics Aggregates ---
+# Dashboard numbers (top skills, degree levels, years of experience, intake
+# per day) kept as materialized counters in SQLite (ANALYTICS_PATH), shared by
+# every worker on the host. Each stored resume contributes a few facts, rows
+# of (dimension, key, label, weight):
+#   total        ''                  1
+#   day          '2026-01-05'        1      UTC date the resume was saved
+#   skill        'python' (Python)   1      per distinct skill
+#   degree       'master' (Master's) 1      per distinct degree level
+#   experience   '3-5' (3-5 years)   1      bucket of the total years of experience
+#   experience_months ''             months of dated experience
+# The facts of every resume are stored next to the counters, so a delete or
+# an edit subtracts exactly what the resume added. Counters are updated by a
+# database change listener; a dashboard query reads a few indexed rows, however
+# large the collection. rebuild() recomputes everything from the database in
+# one pass (aggregated with pandas), and runs once on first use to backfill.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_SKILLS = 20
+DEFAULT_INTAKE_DAYS = 30
+# Resume fields the facts are computed from; edits to anything else leave the counters as they are
+COUNTED_FIELDS = {'skills', 'education', 'work_experience'}
+
+DEGREE_LEVELS = [
+    # (key, label, pattern), checked in order; the first match wins
+    ('doctorate', 'Doctorate', re.compile(r'\b(ph\.?\s?d|doctor(ate)?|d\.?phil|md)\b')),
+    ('master', "Master's", re.compile(r"\b(masters?|master's|mba|mca|m\.?\s?(sc|tech|com|phil|eng|des|arch|s|e|a)\b)")),
+    ('bachelor', "Bachelor's", re.compile(r"\b(bachelors?|bachelor's|bca|bba|b\.?\s?(sc|tech|com|eng|des|arch|s|e|a)\b|undergraduate)")),
+    ('diploma', 'Diploma / Associate', re.compile(r'\b(diploma|associate|certificate)\b')),
+    ('school', 'School', re.compile(r'\b(high school|secondary|hsc|ssc|12th|10th|class (x|xii)|intermediate)\b')),
+]
+OTHER_DEGREE = ('other', 'Other')
+
+EXPERIENCE_BUCKETS = [
+    # (key, label, upper bound in years, exclusive)
+    ('0-1', '< 1 year', 1),
+    ('1-3', '1-3 years', 3),
+    ('3-5', '3-5 years', 5),
+    ('5-10', '5-10 years', 10),
+    ('10+', '10+ years', None),
+]
+UNKNOWN_EXPERIENCE = ('unknown', 'Unknown')
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1)}
+_DATE_RE = re.compile(
+    r'(?:\b(?P<month_name>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?,?\s*'
+    r'|\b(?P<month>0?[1-9]|1[0-2])\s*[/.-]\s*)?'
+    r'(?P<year>(?:19|20)\d\d)\b'
+    r'|\b(?P<present>present|current|now|today|ongoing|till date|to date)\b'
+)
+
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+
+def entry_months(dates, today):
+    """
+    Parses a work experience 'dates' string ("Jan 2019 - Present",
+    "2016 - 2018", "03/2020 - 11/2021") into (start, end) month indexes.
+    Returns:
+        tuple: (start, end), or None if the string has no year.
+    """
+    points = []
+    for match in _DATE_RE.finditer(dates.lower()):
+        if match.group('present'):
+            if points:
+                points.append(_month_index(today.year, today.month))
+            continue
+        month = _MONTHS[match.group('month_name')[:3]] if match.group('month_name') else int(match.group('month') or 1)
+        points.append(_month_index(int(match.group('year')), month))
+    if not points:
+        return None
+    return points[0], max(points[-1], points[0])
+
+
+def experience_months(resume, today=None):
+    """
+    Months of work experience: the summed length of the dated entries, at
+    most the span from the earliest start to the latest end (so overlapping
+    jobs are not counted twice in full).
+    Returns:
+        int, or None if no entry has a parseable date.
+    """
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    spans = [span for span in (entry_months(exp.dates, today) for exp in resume.work_experience) if span]
+    if not spans:
+        return None
+    total = sum(end - start for start, end in spans)
+    return min(total, max(end for _, end in spans) - min(start for start, _ in spans))
+
+
+def degree_level(degree):
+    text = degree.lower()
+    for key, label, pattern in DEGREE_LEVELS:
+        if pattern.search(text):
+            return key, label
+    return OTHER_DEGREE
+
+
+def experience_bucket(months):
+    if months is None:
+        return UNKNOWN_EXPERIENCE
+    years = months / 12
+    for key, label, upper in EXPERIENCE_BUCKETS:
+        if upper is None or years < upper:
+            return key, label
+
+
+def intake_day(document):
+    """
+    The UTC date a stored document was saved (today for a document that was
+    just inserted and has no timestamp yet).
+    """
+    timestamp = document.get('timestamp')
+    if isinstance(timestamp, datetime.datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(datetime.timezone.utc)
+        return timestamp.date().isoformat()
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+def resume_facts(document, day=None):
+    """
+    The facts a stored resume contributes to the counters.
+    Args:
+        document (dict): The stored document.
+        day (str, optional): Intake day to use instead of the document's timestamp.
+    Returns:
+        list: (dimension, key, label, weight) tuples.
+    """
+    resume = Resume.from_dict(document)
+    facts = [('total', '', '', 1), ('day', day or intake_day(document), '', 1)]
+    seen = set()
+    for skill in resume.skills:
+        key = skill.lower()
+        if key not in seen:
+            seen.add(key)
+            facts.append(('skill', key, skill, 1))
+    levels = dict(degree_level(edu.degree) for edu in resume.education if edu.degree)
+    facts.extend(('degree', key, label, 1) for key, label in levels.items())
+    months = experience_months(resume)
+    facts.append(('experience',) + experience_bucket(months) + (1,))
+    if months:
+        facts.append(('experience_months', '', '', months))
+    return facts
+
+
+class AnalyticsStore:
+    """
+    Persistent aggregate counters and the per-resume facts behind them.
+
+    Args:
+        path (str): SQLite file (':memory:' for a private in-memory store).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS analytics_counts ("
+            " dimension TEXT, key TEXT, label TEXT, count INTEGER, PRIMARY KEY (dimension, key)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS analytics_counts_rank ON analytics_counts (dimension, count);"
+            "CREATE TABLE IF NOT EXISTS analytics_facts ("
+            " id TEXT, dimension TEXT, key TEXT, label TEXT, weight INTEGER,"
+            " PRIMARY KEY (id, dimension, key)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS analytics_meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    def _add(self, resume_id, facts):
+        self._conn.executemany(
+            "INSERT INTO analytics_counts (dimension, key, label, count) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count",
+            [(dimension, key, label, weight) for dimension, key, label, weight in facts]
+        )
+        self._conn.executemany(
+            "INSERT INTO analytics_facts (id, dimension, key, label, weight) VALUES (?, ?, ?, ?, ?)",
+            [(resume_id, dimension, key, label, weight) for dimension, key, label, weight in facts]
+        )
+
+    def _remove(self, resume_id):
+        """
+        Subtracts a resume's stored facts. Returns them (empty if it was not counted).
+        """
+        facts = self._conn.execute(
+            "SELECT dimension, key, label, weight FROM analytics_facts WHERE id = ?", (resume_id,)).fetchall()
+        if facts:
+            params = [(weight, dimension, key) for dimension, key, _, weight in facts]
+            self._conn.executemany("UPDATE analytics_counts SET count = count - ? WHERE dimension = ? AND key = ?", params)
+            self._conn.executemany("DELETE FROM analytics_counts WHERE count <= 0 AND dimension = ? AND key = ?",
+                                   [param[1:] for param in params])
+            self._conn.execute("DELETE FROM analytics_facts WHERE id = ?", (resume_id,))
+        return facts
+
+    def _transaction(self, operation, *args):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                result = operation(*args)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add(self, resume_id, document):
+        """
+        Counts a stored resume (replacing what it contributed before, so
+        repeating an insert does not count it twice).
+        """
+        facts = resume_facts(document)
+        def write():
+            self._remove(resume_id)
+            self._add(resume_id, facts)
+        self._transaction(write)
+
+    def update(self, resume_id, document):
+        """
+        Recounts an edited resume, keeping the day it was first saved.
+        """
+        def write():
+            previous = self._remove(resume_id)
+            day = next((key for dimension, key, _, _ in previous if dimension == 'day'), None)
+            self._add(resume_id, resume_facts(document, day=day))
+        self._transaction(write)
+
+    def remove(self, resume_id):
+        self._transaction(self._remove, resume_id)
+
+    def on_change(self, event, resume_id, data):
+        if event == 'insert':
+            self.add(resume_id, data)
+        elif event == 'update':
+            if COUNTED_FIELDS.intersection(data['changed']):
+                self.update(resume_id, data['document'])
+        elif event == 'delete':
+            self.remove(resume_id)
+
+    def rebuild(self, resumes):
+        """
+        Replaces every counter with a recount of `resumes` (stored documents
+        with 'id'), in one transaction.
+        Returns:
+            int: The number of resumes counted.
+        """
+        import pandas as pd
+        rows = [(resume['id'],) + fact for resume in resumes for fact in resume_facts(resume)]
+        facts = pd.DataFrame(rows, columns=['id', 'dimension', 'key', 'label', 'weight'])
+        facts = facts.drop_duplicates(subset=['id', 'dimension', 'key'], keep='last')
+        counts = facts.groupby(['dimension', 'key'], sort=False).agg(label=('label', 'first'), count=('weight', 'sum'))
+        def write():
+            self._conn.execute("DELETE FROM analytics_counts")
+            self._conn.execute("DELETE FROM analytics_facts")
+            self._conn.executemany(
+                "INSERT INTO analytics_facts (id, dimension, key, label, weight) VALUES (?, ?, ?, ?, ?)",
+                facts.itertuples(index=False, name=None))
+            self._conn.executemany(
+                "INSERT INTO analytics_counts (dimension, key, label, count) VALUES (?, ?, ?, ?)",
+                ((dimension, key, label, int(count)) for (dimension, key), label, count in counts.itertuples(name=None)))
+            self._conn.execute("INSERT OR REPLACE INTO analytics_meta (key, value) VALUES ('built', ?)", (str(time.time()),))
+        self._transaction(write)
+        return int(facts['id'].nunique())
+
+    def is_built(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM analytics_meta WHERE key = 'built'").fetchone() is not None
+
+    def _counts(self, dimension):
+        return self._conn.execute(
+            "SELECT key, label, count FROM analytics_counts WHERE dimension = ?", (dimension,)).fetchall()
+
+    def summary(self, top_skills=DEFAULT_TOP_SKILLS, intake_days=DEFAULT_INTAKE_DAYS, today=None):
+        """
+        The dashboard aggregates.
+        Args:
+            top_skills (int): Number of most common skills to return.
+            intake_days (int): Days of intake history to return, ending today.
+        Returns:
+            dict: 'resumes', 'top_skills' (skill, count), 'degrees' (level,
+            key, count), 'experience' ('buckets' of range, key, count and
+            'mean_years' over the resumes with dated experience) and 'intake'
+            (date, count for each of the last `intake_days` days, oldest first).
+        """
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        first_day = today - datetime.timedelta(days=intake_days - 1)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT count FROM analytics_counts WHERE dimension = 'total' AND key = ''").fetchone()
+            total = row[0] if row else 0
+            skills = self._conn.execute(
+                "SELECT label, count FROM analytics_counts WHERE dimension = 'skill'"
+                " ORDER BY count DESC, key LIMIT ?", (top_skills,)).fetchall()
+            degrees = {key: count for key, _, count in self._counts('degree')}
+            experience = {key: count for key, _, count in self._counts('experience')}
+            row = self._conn.execute(
+                "SELECT count FROM analytics_counts WHERE dimension = 'experience_months' AND key = ''").fetchone()
+            months = row[0] if row else 0
+            intake = dict(self._conn.execute(
+                "SELECT key, count FROM analytics_counts WHERE dimension = 'day' AND key >= ? AND key <= ?",
+                (first_day.isoformat(), today.isoformat())).fetchall())
+
+        dated = total - experience.get(UNKNOWN_EXPERIENCE[0], 0)
+        return {
+            'resumes': total,
+            'top_skills': [{'skill': label, 'count': count} for label, count in skills],
+            'degrees': [{'level': label, 'key': key, 'count': degrees.get(key, 0)}
+                        for key, label, _ in DEGREE_LEVELS] +
+                       [{'level': OTHER_DEGREE[1], 'key': OTHER_DEGREE[0], 'count': degrees.get(OTHER_DEGREE[0], 0)}],
+            'experience': {
+                'buckets': [{'range': label, 'key': key, 'count': experience.get(key, 0)}
+                            for key, label, _ in EXPERIENCE_BUCKETS + [UNKNOWN_EXPERIENCE + (None,)]],
+                'mean_years': round(months / 12 / dated, 1) if dated > 0 else None
+            },
+            'intake': [{'date': day, 'count': intake.get(day, 0)}
+                       for day in ((first_day + datetime.timedelta(days=i)).isoformat() for i in range(intake_days))]
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'resumes': (self._conn.execute(
+                    "SELECT count FROM analytics_counts WHERE dimension = 'total' AND key = ''").fetchone() or (0,))[0],
+                'counters': self._conn.execute("SELECT COUNT(*) FROM analytics_counts").fetchone()[0],
+                'built': self._conn.execute("SELECT 1 FROM analytics_meta WHERE key = 'built'").fetchone() is not None
+            }
+
+
+# --- Shared Store ---
+# Opened on first use; app.py registers on_change at start-up so every write
+# made by the process is counted. Events that arrive while a rebuild is
+# reading the collection are held back and applied after it.
+
+_store = None
+_pending = None # change events received while a rebuild is in progress
+_events_lock = threading.Lock()
+_store_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _rebuild(store, resumes=None):
+    global _pending
+    import database
+    with _rebuild_lock:
+        with _events_lock:
+            _pending = []
+        try:
+            start = time.perf_counter()
+            if resumes is None:
+                # Read through the repository so a failed scan is not mistaken for an empty collection
+                resumes = database.run(database.get_repository().list_all())
+            count = store.rebuild(resumes)
+            logger.info("Analytics rebuilt from %d resumes in %.2fs", count, time.perf_counter() - start)
+            return count
+        finally:
+            with _events_lock:
+                for event, resume_id, data in _pending:
+                    store.on_change(event, resume_id, data)
+                _pending = None
+
+
+def get_store(backfill=True):
+    """
+    Returns the shared AnalyticsStore. The first call in a process opens it
+    and, if the persisted counters have never been filled (and `backfill`
+    is set), backfills them from the database.
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is not None:
+            return _store
+        store = AnalyticsStore(os.environ.get('ANALYTICS_PATH', os.path.join('cache', 'analytics.sqlite3')))
+        if backfill and not store.is_built():
+            try:
+                _rebuild(store)
+            except Exception as e:
+                # New writes are still counted; the backfill is retried by the next process
+                logger.error("Analytics backfill failed: %s", e)
+        _store = store
+        return store
+
+
+def rebuild(resumes=None):
+    """
+    Recounts every aggregate from the database (or from `resumes`), e.g. after
+    a bulk import that bypassed this app. Writes made by other processes while
+    the collection is read are not counted; run it when writes are quiet.
+    Returns:
+        int: The number of resumes counted.
+    """
+    return _rebuild(get_store(backfill=False), resumes)
+
+
+def on_change(event, resume_id, data):
+    """
+    Change listener for database.add_change_listener.
+    """
+    store = get_store()
+    with _events_lock:
+        if _pending is not None:
+            _pending.append((event, resume_id, data))
+            return
+    store.on_change(event, resume_id, data)
+
+
+def stats():
+    store = _store
+    return store.stats() if store is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the analytics counters from the resumes collection.")
+    parser.add_argument('--rebuild', action='store_true', help="Recount every aggregate from the database")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_SKILLS, help="Skills to show")
+    parser.add_argument('--days', type=int, default=DEFAULT_INTAKE_DAYS, help="Days of intake to show")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(levelname)s %(name)s: %(message)s')
+
+    if args.rebuild:
+        print(f"Counted {rebuild()} resumes.", file=sys.stderr)
+    store = get_store()
+    json.dump(store.summary(top_skills=args.top, intake_days=args.days), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,40 +1,125 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file
+import time
+import logging
+import threading
+from flask import Flask, Request, render_template, stream_template, request, redirect, url_for, jsonify, send_file, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
 # ADDED: Import the json module
 import json
-from resume_parser import extract_text_from_pdf, extract_text_from_docx, parse_resume_text
+
+# Configured before the project modules are imported, since some of them log on import.
+# Messages below LOG_LEVEL are dropped before their arguments are ever formatted.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+import metrics
+import resume_parser
+from resume_parser import extract_text_from_bytes, parse_resume_text, stream_resume_text, PARSER_VERSION, ExtractionError, guard as llm_guard, warm_up as warm_up_parser
+from parse_cache import create_parse_cache
+from batch_ingest import collect_uploads, ingest_files, in_input_order, save_results, summarize, BatchBusyError
+import bulk_export
+from jobs import create_job_queue, QueueFullError, PermanentJobError
+from llm_guard import LimiterTimeout
+from models import Resume, ResumeValidationError, DOCUMENT_FIELDS
+import fast_extract
+import preprocess
+import search_index
+import dedup
+import matcher
+import ocr
+import analytics
+from dedup import merge_resumes
 # Import database functions (now using Firestore)
-from database import insert_resume_data, get_all_resumes, delete_resume_data, get_resume_by_id 
-import uuid # Import uuid for unique filenames
+from database import insert_resume_data, update_resume_data, get_resumes_page, delete_resume_data, get_resume_by_id, add_change_listener, get_repository, cache_stats
+from repository import document_version, ConflictError, ResumeNotFoundError
 import io
-import re # Import re for filename cleaning
 
-# For PDF generation
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
+# PDF/DOCX generation
+from renderers import render_resume, file_basename, MIMETYPES, warm_up as warm_up_renderers
+from render_cache import create_render_cache, content_hash
 
-# For DOCX generation
-from docx import Document as DocxDocument
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+class InMemoryRequest(Request):
+    """
+    Keeps uploaded files in memory. Werkzeug otherwise spools uploads larger
+    than 500 KB to a temporary file on disk before we ever read them.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 
-# Configuration for file uploads
-UPLOAD_FOLDER = 'uploads'
+# Configuration for file uploads (uploads are processed in memory, never written to disk)
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Create the uploads directory if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Pagination for /view_resumes (and result limits for /search)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+if os.environ.get('MAX_UPLOAD_MB'):
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ['MAX_UPLOAD_MB']) * 1024 * 1024
+
+# Cache of parsed results keyed on file/text content hash (None when disabled)
+parse_cache = create_parse_cache(version=PARSER_VERSION)
+
+# Rendered PDF/DOCX downloads keyed on resume id + content hash (None when disabled)
+render_cache = create_render_cache()
+if render_cache:
+    add_change_listener(render_cache.on_change)
+
+# Dashboard counters, updated on every write (see analytics.py)
+add_change_listener(analytics.on_change)
+
+# Duplicate index, updated on every write so it never drifts from the store
+if dedup.DEDUP_MODE != 'off':
+    add_change_listener(dedup.on_change)
+
+# Note: Firebase is initialized by database.py on first use (or by warm_up below).
+# No explicit init_db() call needed here; all reads and writes go through the
+# async repository (repository.py) behind the database.py functions.
 
-# Note: Firebase initialization now happens directly in database.py when it's imported.
-# No explicit init_db() call needed here.
+# Deferred initialization: 'background' (default) warms up in a thread once the
+# app is imported, 'sync' finishes it before the import returns, 'off' leaves
+# everything to the first request that needs it.
+WARMUP = os.environ.get('WARMUP', 'background').lower()
+
+def warm_up():
+    """
+    Builds the model client and parse chain, imports the PDF/DOCX libraries,
+    prepares the render styles and connects to the resume store.
+    """
+    start = time.perf_counter()
+    try:
+        warm_up_parser()
+        warm_up_renderers()
+        get_repository()
+        logger.info("Warm-up finished in %.2fs", time.perf_counter() - start)
+    except Exception as e:
+        # Whatever failed is retried by the first request that needs it
+        logger.exception("Warm-up failed: %s", e)
+
+@app.before_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    g.timing_token = metrics.start_request_timing() if metrics.TIMING_HEADER else None
+
+@app.after_request
+def record_timing(response):
+    """
+    Records request latency and, with TIMING_HEADER=1, adds a Server-Timing
+    header listing the pipeline spans (extract, llm, firestore_*, render_*...)
+    that ran during the request.
+    """
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.HTTP_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+    token = g.pop('timing_token', None)
+    if token is not None:
+        response.headers['Server-Timing'] = metrics.finish_request_timing(token, elapsed)
+    return response
 
 def allowed_file(filename):
     """
@@ -50,159 +135,440 @@ def index():
     """
     return render_template('index.html')
 
+def parse_upload(original_filename, file_bytes):
+    """
+    Extracts and parses an uploaded resume, consulting the parse cache first.
+    Args:
+        original_filename (str): Sanitized name of the uploaded file.
+        file_bytes (bytes): Raw file contents.
+    Returns:
+        dict: The parsed resume data, including 'original_filename'.
+    Raises:
+        ExtractionError: If no text could be extracted from the document.
+    """
+    # Same bytes uploaded before: skip extraction and the model call entirely
+    file_key = parse_cache.file_key(file_bytes) if parse_cache else None
+    parsed_data = parse_cache.get(file_key) if parse_cache else None
+
+    if parsed_data is not None:
+        logger.debug("Parse cache hit (file) for %s", original_filename)
+    else:
+        # Extract straight from the uploaded bytes, no temporary file on disk
+        extracted_text = extract_text_from_bytes(file_bytes, original_filename)
+
+        if not extracted_text:
+            logger.error("Could not extract text from %s. File might be empty or corrupted.", original_filename)
+            raise ExtractionError('Could not extract text from the document. The file might be empty, corrupted or a scan that could not be OCR\'d.')
+
+        logger.debug("Extracted text length from %s: %d characters.", original_filename, len(extracted_text))
+
+        text_key = parse_cache.text_key(extracted_text) if parse_cache else None
+        parsed_data = parse_cache.get(text_key) if parse_cache else None
+        if parsed_data is not None:
+            logger.debug("Parse cache hit (text) for %s", original_filename)
+            parse_cache.set([file_key], parsed_data)
+        else:
+            parsed_data = parse_resume_text(extracted_text)
+            if parse_cache:
+                parse_cache.set([file_key, text_key], parsed_data)
+
+    # Store the original filename in the parsed_data dictionary
+    parsed_data['original_filename'] = original_filename
+    return parsed_data
+
+def stream_upload(original_filename, file_bytes):
+    """
+    Streaming version of parse_upload: extracts and parses an upload, yielding
+    updates as fields become known. Errors are reported as an update, since
+    the response has already started.
+    Yields:
+        dict: {'field': name, 'value': value} for each field (rule-based fields
+        first, then model fields as the model finishes them), then either
+        {'done': True, 'data': parsed data} or {'error': message}.
+    """
+    try:
+        streamed = False
+        file_key = parse_cache.file_key(file_bytes) if parse_cache else None
+        parsed_data = parse_cache.get(file_key) if parse_cache else None
+        if parsed_data is None:
+            extracted_text = extract_text_from_bytes(file_bytes, original_filename)
+            if not extracted_text:
+                raise ExtractionError('Could not extract text from the document. The file might be empty, corrupted or a scan that could not be OCR\'d.')
+            text_key = parse_cache.text_key(extracted_text) if parse_cache else None
+            parsed_data = parse_cache.get(text_key) if parse_cache else None
+            if parsed_data is not None:
+                parse_cache.set([file_key], parsed_data)
+            else:
+                for field, value in stream_resume_text(extracted_text):
+                    if field == 'result':
+                        parsed_data = value
+                    else:
+                        yield {'field': field, 'value': value}
+                if parse_cache:
+                    parse_cache.set([file_key, text_key], parsed_data)
+                streamed = True
+        if not streamed:
+            # Parse cache hit: every field is known at once
+            for field in fast_extract.FIELDS:
+                if field in parsed_data:
+                    yield {'field': field, 'value': parsed_data[field]}
+        parsed_data['original_filename'] = original_filename
+        yield {'done': True, 'data': parsed_data}
+    except ExtractionError as e:
+        yield {'error': str(e)}
+    except LimiterTimeout as e:
+        logger.warning("Parse rejected: %s", e)
+        yield {'error': 'The parser is busy, please retry shortly.'}
+    except Exception as e:
+        logger.exception("An error occurred during streamed file processing: %s", e)
+        yield {'error': f'Error processing file: {str(e)}'}
+
+def run_parse_job(original_filename, file_bytes):
+    """
+    Job queue handler: parses an upload in a background worker.
+    """
+    try:
+        return parse_upload(original_filename, file_bytes)
+    except ExtractionError as e:
+        # Extraction failures are deterministic, retrying will not help
+        raise PermanentJobError(str(e))
+
+# Background workers for /jobs (asynchronous parsing)
+job_queue = create_job_queue(run_parse_job)
+
 @app.route('/parse', methods=['POST'])
 def parse():
     """
     Handles resume file upload, parsing, and displays the auto-filled form.
+    With stream=1 the (empty) form is sent at once and filled in field by
+    field as the parse progresses (a chunked response).
     """
     if 'resume' not in request.files:
-        print("Error: No file part in request.") # Debugging print
+        logger.warning("No file part in request.")
         return jsonify({'error': 'No file part'}), 400
 
     file = request.files['resume']
 
     if file.filename == '':
-        print("Error: No selected file.") # Debugging print
+        logger.warning("No selected file.")
         return jsonify({'error': 'No selected file'}), 400
 
     if file and allowed_file(file.filename):
         original_filename = secure_filename(file.filename)
-        # Generate a unique filename to prevent caching issues and overwrites
-        unique_filename = str(uuid.uuid4()) + "_" + original_filename
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
+
         try:
-            file.save(filepath)
-            print(f"DEBUG: File saved to: {filepath}") # Debugging print
+            with metrics.span('upload_read'):
+                file_bytes = file.read()
+            if request.values.get('stream') == '1':
+                empty = dict(Resume().to_dict(), original_filename=original_filename)
+                return Response(stream_template('parsed_form.html', data=empty, dedup_mode=dedup.DEDUP_MODE,
+                                                updates=stream_upload(original_filename, file_bytes)),
+                                mimetype='text/html', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            parsed_data = parse_upload(original_filename, file_bytes)
+
+            # Serializing the whole result is only worth it when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Parsed data before rendering parsed_form.html:\n%s", json.dumps(parsed_data, indent=2))
 
-            extracted_text = ""
-            if original_filename.endswith('.pdf'):
-                extracted_text = extract_text_from_pdf(filepath)
-            elif original_filename.endswith('.docx'):
-                extracted_text = extract_text_from_docx(filepath)
+            # Render a new template to display the parsed data in an editable form
+            return render_template('parsed_form.html', data=parsed_data, dedup_mode=dedup.DEDUP_MODE)
+
+        except ExtractionError as e:
+            return jsonify({'error': str(e)}), 500
+        except LimiterTimeout as e:
+            # Too many model calls in flight: ask the client to come back instead of failing outright
+            logger.warning("Parse rejected: %s", e)
+            response = jsonify({'error': 'The parser is busy, please retry shortly.'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        except Exception as e:
+            logger.exception("An error occurred during file processing: %s", e)
+            return jsonify({'error': f'Error processing file: {str(e)}'}), 500
+    else:
+        logger.warning("Unsupported file type for %s.", file.filename)
+        return jsonify({'error': 'Unsupported file type. Please upload a PDF or DOCX file.'}), 400
 
+@app.route('/parse_stream', methods=['POST'])
+def parse_stream():
+    """
+    Parses an uploaded resume ('resume' field) and streams the result as
+    Server-Sent Events: a 'field' event per field as soon as it is known
+    (name, email and phone usually first), then 'done' with the full data,
+    or 'error'.
+    """
+    file = request.files.get('resume')
+    if file is None or file.filename == '':
+        logger.warning("No selected file.")
+        return jsonify({'error': 'No selected file'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Unsupported file type. Please upload a PDF or DOCX file.'}), 400
+    original_filename = secure_filename(file.filename)
+    file_bytes = file.read()
 
-            if not extracted_text:
-                print(f"ERROR: Could not extract text from {unique_filename}. File might be empty or corrupted.") # Debugging print
-                return jsonify({'error': 'Could not extract text from the document. The file might be empty or corrupted.'}), 500
+    def stream():
+        for update in stream_upload(original_filename, file_bytes):
+            event = 'field' if 'field' in update else 'done' if update.get('done') else 'error'
+            yield f"event: {event}\ndata: {json.dumps(update.get('data', update))}\n\n"
 
-            print(f"DEBUG: Extracted text length from {unique_filename}: {len(extracted_text)} characters.") # Debugging print
-            parsed_data = parse_resume_text(extracted_text)
-            print(parsed_data)
-            
-            
-            # Store the original filename in the parsed_data dictionary
-            parsed_data['original_filename'] = original_filename
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-            # Debugging: Print the parsed data before rendering the template
-            print("\n--- DEBUG: Parsed Data before rendering parsed_form.html ---")
-            print(json.dumps(parsed_data, indent=2)) # json.dumps requires 'json' module
-            print("---------------------------------------------------\n")
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queues a resume for background parsing and returns a job id immediately.
+    Poll /jobs/<job_id> or subscribe to /jobs/<job_id>/events for the result.
+    """
+    file = request.files.get('resume')
+    if file is None or file.filename == '':
+        logger.warning("No selected file.")
+        return jsonify({'error': 'No selected file'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Unsupported file type. Please upload a PDF or DOCX file.'}), 400
 
-            # Render a new template to display the parsed data in an editable form
-            return render_template('parsed_form.html', data=parsed_data)
+    try:
+        job_id = job_queue.submit(secure_filename(file.filename), file.read())
+    except QueueFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    logger.debug("Queued parse job %s", job_id)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('get_job', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<string:job_id>')
+def get_job(job_id):
+    """
+    Returns the status (and result, once done) of a background parse job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
-        except Exception as e:
-            print(f"ERROR: An error occurred during file processing: {str(e)}") # Debugging print
-            return jsonify({'error': f'Error processing file: {str(e)}'}), 500
-        finally:
-            # Ensure the uploaded file is removed after processing
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f"DEBUG: Cleaned up: {filepath}") # Debugging print
-    else:
-        print(f"ERROR: Unsupported file type for {original_filename if 'original_filename' in locals() else 'unknown file'}.") # Debugging print
-        return jsonify({'error': 'Unsupported file type. Please upload a PDF or DOCX file.'}), 400
+@app.route('/jobs/<string:job_id>/events')
+def job_events(job_id):
+    """
+    Streams job status changes as Server-Sent Events until the job finishes.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream():
+        for job in job_queue.events(job_id):
+            if job is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/parse_batch', methods=['POST'])
+def parse_batch():
+    """
+    Parses many resumes in one request. Accepts any number of PDF/DOCX files
+    and/or ZIP archives under the 'resumes' field and returns one JSON result
+    (parsed data or error) per resume, in upload order. With save=1 the parsed
+    resumes are also stored (batched writes) and each result carries its new 'id'.
+    """
+    uploads = request.files.getlist('resumes') + request.files.getlist('resume')
+    uploads = [f for f in uploads if f.filename]
+    if not uploads:
+        logger.warning("No files in batch request.")
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    try:
+        files, errors = collect_uploads((secure_filename(f.filename), f.read()) for f in uploads)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+
+    try:
+        results = in_input_order(ingest_files(files, parse_cache=parse_cache), errors)
+        if request.values.get('save') == '1':
+            save_results(results)
+    except BatchBusyError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    except Exception as e:
+        logger.exception("Batch processing failed: %s", e)
+        return jsonify({'error': f'Error processing batch: {str(e)}'}), 500
+
+    summary = summarize(results)
+    logger.info("Batch parsed %d files (%d errors, %d cached).", summary['total'], summary['errors'], summary['cached'])
+    return jsonify({'summary': summary, 'results': results})
 
 @app.route('/submit_form', methods=['POST'])
 def submit_form():
     """
     Handles the submission of the edited form data and saves it to the database.
     """
-    # Get form data from request.form
-    name = request.form.get('name', '')
-    email = request.form.get('email', '')
-    phone = request.form.get('phone', '')
-
-    # Skills are submitted as a comma-separated string, convert to list
-    skills_str = request.form.get('skills', '')
-    skills = [s.strip() for s in skills_str.split(',') if s.strip()]
-
-    education = []
-    i = 0
-    while True:
-        institution = request.form.get(f'education_{i}_institution')
-        degree = request.form.get(f'education_{i}_degree')
-        passing_year = request.form.get(f'education_{i}_passing_year')
-        marks_percentage_cgpa = request.form.get(f'education_{i}_marks_percentage_cgpa')
-        
-        # Break if no education field for this index is found
-        if institution is None and degree is None and passing_year is None and marks_percentage_cgpa is None:
-            break
-        
-        # Only add if at least one field is present for the current education entry
-        if institution or degree or passing_year or marks_percentage_cgpa:
-            education.append({
-                'institution': institution if institution else '',
-                'degree': degree if degree else '',
-                'passing_year': passing_year if passing_year else '',
-                'marks_percentage_cgpa': marks_percentage_cgpa if marks_percentage_cgpa else ''
-            })
-        i += 1
-
-    work_experience = []
-    j = 0
-    while True:
-        company = request.form.get(f'work_experience_{j}_company')
-        title = request.form.get(f'work_experience_{j}_title')
-        dates = request.form.get(f'work_experience_{j}_dates')
-        description = request.form.get(f'work_experience_{j}_description')
-        
-        # Break if no work experience field for this index is found
-        if company is None and title is None and dates is None and description is None:
-            break
-        
-        # Only add if at least one field is present for the current experience entry
-        if company or title or dates or description:
-            work_experience.append({
-                'company': company if company else '',
-                'title': title if title else '',
-                'dates': dates if dates else '',
-                'description': description if description else ''
-            })
-        j += 1
-
-    final_data = {
-        'name': name,
-        'email': email,
-        'phone': phone,
-        'skills': skills,
-        'education': education,
-        'work_experience': work_experience
-    }
+    # Validated and normalized once here; entry rows come from education_<i>_* / work_experience_<j>_* inputs
+    final_data = Resume.from_form(request.form)
 
     # Get the original filename passed from the hidden field
     original_filename = request.form.get('original_filename')
 
+    # Same candidate already stored? 'flag' saves a new resume and reports the
+    # matches, 'merge' folds the submission into the best match instead
+    on_duplicate = request.form.get('on_duplicate') or dedup.DEDUP_MODE
+    duplicates = []
+    if on_duplicate in ('flag', 'merge'):
+        try:
+            index = dedup.get_index()
+            duplicates = index.find(final_data) if index else []
+        except Exception as e:
+            # Duplicate detection is advisory; never block the save on it
+            logger.error("Duplicate lookup failed: %s", e)
+
     # Save the data to the database (now Firestore)
     try:
+        if duplicates and on_duplicate == 'merge':
+            target_id = duplicates[0]['id']
+            # Only the fields the merge changed are written; if the duplicate is
+            # edited in between, merge into the fresh copy once more
+            for attempt in range(2):
+                existing = get_resume_by_id(target_id)
+                if not existing:
+                    break
+                try:
+                    update_resume_data(target_id, merge_resumes(existing, final_data, original_filename),
+                                       expected_version=document_version(existing))
+                except ConflictError:
+                    if attempt:
+                        return ("The matching resume is being edited right now. "
+                                "Submit the form again to merge into its latest version."), 409
+                    continue
+                logger.info("Merged submission into duplicate resume %s (%s)", target_id, duplicates[0]['reason'])
+                return redirect(url_for('view_resumes', db_save_status="merged", duplicate_of=target_id))
         inserted_id = insert_resume_data(final_data, original_filename)
-        print(f"DEBUG: Data saved to Firestore with ID: {inserted_id}")
+        logger.debug("Data saved to Firestore with ID: %s", inserted_id)
     except Exception as e:
-        print(f"ERROR: Error saving data to Firestore: {e}")
+        logger.error("Error saving data to Firestore: %s", e)
         return jsonify({'error': f'Failed to save data to Firestore: {str(e)}'}), 500
 
+    if duplicates:
+        logger.info("Resume %s looks like a duplicate of %s", inserted_id, [match['id'] for match in duplicates])
+        return redirect(url_for('view_resumes', db_save_status="duplicate",
+                                duplicate_of=','.join(match['id'] for match in duplicates)))
     # Redirect to the view_resumes page after successful submission
     return redirect(url_for('view_resumes', db_save_status="success"))
 
+@app.route('/stats')
+def stats():
+    """
+    Returns runtime statistics (parse cache, job queue, fast-path and prompt token counters) as JSON.
+    """
+    return jsonify({
+        'parse_cache': parse_cache.stats() if parse_cache else None,
+        'jobs': job_queue.stats(),
+        'fast_path': fast_extract.stats(),
+        'preprocess': preprocess.stats(),
+        'search_index': search_index.stats(),
+        'render_cache': render_cache.stats() if render_cache else None,
+        'resume_cache': cache_stats(),
+        'llm': llm_guard.stats(),
+        'llm_tiers': resume_parser.router.stats(),
+        'dedup': dedup.stats(),
+        'matcher': matcher.stats(),
+        'ocr': ocr.stats(),
+        'analytics': analytics.stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Exposes latency histograms and counters in the Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/search')
+def search():
+    """
+    Searches saved resumes by skills, job titles/descriptions and education.
+    Query parameters: q (e.g. "python django -java", "flask OR fastapi",
+    "skills:aws"), limit (default 20, max 100) and sort ("score" for BM25
+    ranking, the default, or "recent").
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    ranked = request.args.get('sort', 'score') != 'recent'
+    try:
+        index = search_index.get_index()
+    except Exception as e:
+        logger.error("Search index build failed: %s", e)
+        return jsonify({'error': 'Search is temporarily unavailable, try again later.'}), 503
+    total, results = index.search(query, k=limit, ranked=ranked)
+    return jsonify({'query': query, 'total': total, 'results': results})
+
+@app.route('/match', methods=['GET', 'POST'])
+def match():
+    """
+    Ranks saved resumes against a job description (shortlisting).
+    Takes the description as `job_description` (JSON body or form field, or
+    `q` in the query string) and an optional `k` (default 20, max 100).
+    Returns the skills found in the description and the top-k resumes with
+    their combined, text and skill-overlap scores.
+    """
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None:
+        job_description = payload.get('job_description', '')
+        k = payload.get('k', DEFAULT_PAGE_SIZE)
+    else:
+        job_description = request.values.get('job_description') or request.values.get('q', '')
+        k = request.values.get('k', DEFAULT_PAGE_SIZE)
+    if not isinstance(job_description, str) or not job_description.strip():
+        return jsonify({"error": "Missing job description ('job_description')"}), 400
+    try:
+        k = min(max(int(k), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "'k' must be an integer"}), 400
+    try:
+        index = matcher.get_index()
+    except Exception as e:
+        logger.error("Match index build failed: %s", e)
+        return jsonify({'error': 'Matching is temporarily unavailable, try again later.'}), 503
+    with metrics.span('match'):
+        result = index.match(job_description, k=k)
+    return jsonify(result)
+
+@app.route('/analytics')
+def analytics_summary():
+    """
+    Dashboard aggregates: top skills, degree levels, years of experience and
+    intake per day, read from counters that are kept current on every write.
+    Query parameters: top (skills to list, default 20, max 100) and days
+    (days of intake history, default 30, max 366).
+    """
+    top = min(max(request.args.get('top', analytics.DEFAULT_TOP_SKILLS, type=int), 1), MAX_PAGE_SIZE)
+    days = min(max(request.args.get('days', analytics.DEFAULT_INTAKE_DAYS, type=int), 1), 366)
+    with metrics.span('analytics'):
+        summary = analytics.get_store().summary(top_skills=top, intake_days=days)
+    return jsonify(summary)
+
 @app.route('/view_resumes')
 def view_resumes():
     """
-    Fetches and displays all saved resumes from the database (now Firestore).
+    Displays one page of saved resumes from the database (now Firestore).
+    Query parameters: page_size (default 20, max 100) and cursor (from the
+    "Next" link of the previous page).
     """
-    all_resumes = get_all_resumes()
+    page_size = min(max(request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor') or None
+    try:
+        resumes, next_cursor = get_resumes_page(page_size, cursor)
+    except ValueError:
+        return "Invalid cursor", 400
     db_save_status = request.args.get('db_save_status') # Get status from redirect
-    return render_template('view_resumes.html', resumes=all_resumes, db_save_status=db_save_status)
+    duplicate_of = [resume_id for resume_id in request.args.get('duplicate_of', '').split(',') if resume_id]
+    return render_template('view_resumes.html', resumes=resumes, db_save_status=db_save_status,
+                           duplicate_of=duplicate_of, page_size=page_size, cursor=cursor, next_cursor=next_cursor)
 
 @app.route('/view_resume_detail/<string:resume_id>') # Changed to string for Firestore ID
 def view_resume_detail(resume_id):
@@ -212,10 +578,61 @@ def view_resume_detail(resume_id):
     resume = get_resume_by_id(resume_id)
     
     if resume:
-        return render_template('result.html', data=resume, db_save_status="view_mode")
+        updated = request.args.get('updated') # Set after an edit: the changed fields
+        updated_fields = [field for field in updated.split(',') if field] if updated is not None else None
+        return render_template('result.html', data=resume, db_save_status="view_mode", updated_fields=updated_fields)
     else:
         return "Resume not found", 404
 
+@app.route('/edit_resume/<string:resume_id>')
+def edit_resume(resume_id):
+    """
+    Shows the edit form for a saved resume. The form carries the version the
+    resume was loaded at, so saving it cannot overwrite a newer edit.
+    """
+    resume = get_resume_by_id(resume_id)
+    if not resume:
+        return "Resume not found", 404
+    return render_template('parsed_form.html', data=resume, dedup_mode='off',
+                           form_action=url_for('update_resume', resume_id=resume_id),
+                           version=document_version(resume))
+
+@app.route('/update_resume/<string:resume_id>', methods=['POST', 'PATCH'])
+def update_resume(resume_id):
+    """
+    Updates a saved resume, writing only the fields that changed.
+    Takes the edit form (the whole resume plus its `version`) or a JSON body
+    with just the fields to change and an optional `version`; fields missing
+    from the JSON body keep their stored values.
+    Returns 409 if the resume was modified after `version`.
+    """
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None:
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        data, version = payload, payload.get('version')
+        fields = [field for field in DOCUMENT_FIELDS if field in payload]
+    else:
+        data, version, fields = Resume.from_form(request.form), request.form.get('version') or None, None
+
+    try:
+        changed = update_resume_data(resume_id, data, expected_version=version, fields=fields)
+    except ResumeNotFoundError:
+        return (jsonify({"error": "Resume not found"}), 404) if payload is not None else ("Resume not found", 404)
+    except ConflictError as e:
+        if payload is not None:
+            return jsonify({"error": "Resume was modified after this version", "version": e.current_version}), 409
+        return "This resume was changed after you opened it. Reload the edit page and try again.", 409
+    except ResumeValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error updating resume %s: %s", resume_id, e)
+        return jsonify({'error': f'Failed to update resume: {str(e)}'}), 500
+
+    if payload is not None:
+        return jsonify({"id": resume_id, "changed": changed})
+    return redirect(url_for('view_resume_detail', resume_id=resume_id, updated=','.join(changed)))
+
 @app.route('/download_resume/<string:resume_id>/<file_type>') # Changed to string for Firestore ID
 def download_resume(resume_id, file_type):
     """
@@ -225,24 +642,50 @@ def download_resume(resume_id, file_type):
     if not resume_data:
         return "Resume not found", 404
 
-    buffer = io.BytesIO()
-    filename_base = resume_data.get('name', 'resume').replace(' ', '_') # Use name for filename, secure_filename not needed for base
-    # Ensure filename_base is safe for file systems (remove invalid chars)
-    filename_base = re.sub(r'[^\w\s.-]', '', filename_base).strip()
-    filename_base = re.sub(r'\s+', '_', filename_base)
-
-
-    if file_type == 'pdf':
-        generate_pdf_from_data(resume_data, buffer)
-        buffer.seek(0)
-        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=f'{filename_base}.pdf')
-    elif file_type == 'docx':
-        generate_docx_from_data(resume_data, buffer)
-        buffer.seek(0)
-        return send_file(buffer, mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document', as_attachment=True, download_name=f'{filename_base}.docx')
-    else:
+    if file_type not in MIMETYPES:
         return "Invalid file type", 400
 
+    filename_base = file_basename(resume_data)
+
+    # Unchanged resume downloaded before: serve the cached file without rendering
+    digest = content_hash(resume_data)
+    cache_key = (resume_id, digest, file_type)
+    body = render_cache.get(cache_key) if render_cache else None
+    if body is None:
+        body = render_resume(resume_data, file_type)
+        if render_cache:
+            render_cache.set(cache_key, body)
+    else:
+        logger.debug("Render cache hit for %s (%s)", resume_id, file_type)
+
+    return send_file(io.BytesIO(body), mimetype=MIMETYPES[file_type], as_attachment=True,
+                     download_name=f'{filename_base}.{file_type}', etag=f'{digest}-{file_type}')
+
+@app.route('/export', methods=['GET', 'POST'])
+def export_resumes():
+    """
+    Exports many resumes in one download: a ZIP of PDF/DOCX files or a CSV/JSONL
+    file of the structured fields, streamed as it is produced.
+    Parameters (query string or form): ids (comma-separated and/or repeated)
+    or q (search query), format (pdf, docx, csv or jsonl; default pdf) and
+    limit (maximum resumes for a query).
+    """
+    ids = [resume_id.strip() for value in request.values.getlist('ids') for resume_id in value.split(',')]
+    file_type = request.values.get('format', 'pdf').lower()
+    limit = min(max(request.values.get('limit', bulk_export.MAX_EXPORT_RESUMES, type=int), 1), bulk_export.MAX_EXPORT_RESUMES)
+    if file_type not in bulk_export.EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(sorted(bulk_export.EXPORT_FORMATS))}"}), 400
+    try:
+        ids = bulk_export.resolve_ids(ids=ids, query=request.values.get('q', '').strip(), limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    logger.info("Exporting %d resumes as %s", len(ids), file_type)
+
+    chunks = bulk_export.export(ids, file_type, render_cache=render_cache)
+    filename = bulk_export.export_filename(file_type)
+    return Response(stream_with_context(chunks), mimetype=bulk_export.MIMETYPES_BY_FORMAT[file_type],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @app.route('/delete_resume/<string:resume_id>', methods=['POST']) # Changed to string for Firestore ID
 def delete_resume(resume_id):
     """
@@ -252,158 +695,10 @@ def delete_resume(resume_id):
     return redirect(url_for('view_resumes', db_save_status="deleted"))
 
 
-# Helper functions for resume generation (no changes needed here for Firestore switch)
-def generate_pdf_from_data(data, buffer):
-    """Generates a PDF resume from parsed data and writes to a buffer."""
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Modify existing 'Normal' and 'Bullet' styles
-    styles['Normal'].fontSize = 10
-    styles['Normal'].leading = 12
-    styles['Normal'].spaceAfter = 6
-
-    styles['Bullet'].fontSize = 10
-    styles['Bullet'].leading = 12
-    styles['Bullet'].spaceAfter = 2
-    styles['Bullet'].leftIndent = 0.2 * inch
-    styles['Bullet'].bulletIndent = 0.1 * inch
-    styles['Bullet'].bulletText = '•'
-
-    # Add custom styles with unique names
-    styles.add(ParagraphStyle(name='TitleStyle', fontSize=24, leading=28, alignment=TA_CENTER, spaceAfter=12, fontName='Helvetica-Bold'))
-    styles.add(ParagraphStyle(name='ContactStyle', fontSize=10, leading=12, alignment=TA_CENTER, spaceAfter=12))
-    styles.add(ParagraphStyle(name='SectionHeading', fontSize=16, leading=18, spaceAfter=8, fontName='Helvetica-Bold', textColor='#4f46e5')) # Indigo color
-    styles.add(ParagraphStyle(name='SubHeading', fontSize=12, leading=14, spaceAfter=4, fontName='Helvetica-Bold'))
-    
-    story = []
-
-    # Personal Details
-    story.append(Paragraph(data.get('name', 'Unnamed Resume'), styles['TitleStyle']))
-    contact_info = []
-    if data.get('email'):
-        contact_info.append(data['email'])
-    if data.get('phone'):
-        contact_info.append(data['phone'])
-    if contact_info:
-        story.append(Paragraph(" | ".join(contact_info), styles['ContactStyle']))
-    story.append(Spacer(1, 0.2 * inch))
-
-    # Skills
-    if data.get('skills'):
-        story.append(Paragraph("Skills", styles['SectionHeading']))
-        story.append(Paragraph(", ".join(data['skills']), styles['Normal']))
-        story.append(Spacer(1, 0.1 * inch))
-
-    # Education
-    if data.get('education'):
-        story.append(Paragraph("Education", styles['SectionHeading']))
-        for edu in data['education']:
-            edu_line = f"<b>{edu.get('degree', '')}</b>"
-            if edu.get('institution'):
-                edu_line += f" - {edu.get('institution')}"
-            if edu.get('passing_year'):
-                edu_line += f" ({edu.get('passing_year')})"
-            story.append(Paragraph(edu_line, styles['SubHeading']))
-            if edu.get('marks_percentage_cgpa'):
-                story.append(Paragraph(f"Marks/CGPA: {edu.get('marks_percentage_cgpa')}", styles['Normal']))
-            story.append(Spacer(1, 0.05 * inch))
-        story.append(Spacer(1, 0.1 * inch))
-
-    # Work Experience
-    if data.get('work_experience'):
-        story.append(Paragraph("Work Experience", styles['SectionHeading']))
-        for exp in data['work_experience']:
-            exp_line = f"<b>{exp.get('title', '')}</b>"
-            if exp.get('company'):
-                exp_line += f" at {exp.get('company')}"
-            if exp.get('dates'):
-                exp_line += f" ({exp.get('dates')})"
-            story.append(Paragraph(exp_line, styles['SubHeading']))
-            if exp.get('description'):
-                # Split description into lines and add as bullet points
-                desc_lines = [line.strip() for line in exp['description'].split('\n') if line.strip()]
-                for desc_line in desc_lines:
-                    story.append(Paragraph(desc_line, styles['Bullet']))
-            story.append(Spacer(1, 0.05 * inch))
-        story.append(Spacer(1, 0.1 * inch))
-
-    doc.build(story)
-
-def generate_docx_from_data(data, buffer):
-    """Generates a DOCX resume from parsed data and writes to a buffer."""
-    document = DocxDocument()
-    
-    # Add Name
-    name_para = document.add_paragraph()
-    name_run = name_para.add_run(data.get('name', 'Unnamed Resume'))
-    name_run.bold = True
-    name_run.font.size = Pt(24)
-    name_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Add Contact Info
-    contact_para = document.add_paragraph()
-    contact_info = []
-    if data.get('email'):
-        contact_info.append(data['email'])
-    if data.get('phone'):
-        contact_info.append(data['phone'])
-    if contact_info:
-        contact_para.add_run(" | ".join(contact_info)).font.size = Pt(10)
-    contact_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    document.add_paragraph() # Spacer
-
-    # Skills
-    if data.get('skills'):
-        document.add_heading('Skills', level=2)
-        skills_para = document.add_paragraph()
-        skills_para.add_run(", ".join(data['skills'])).font.size = Pt(10)
-        document.add_paragraph() # Spacer
-
-    # Education
-    if data.get('education'):
-        document.add_heading('Education', level=2)
-        for edu in data['education']:
-            edu_para = document.add_paragraph()
-            edu_para.add_run(f"{edu.get('degree', '')}").bold = True
-            if edu.get('institution'):
-                edu_para.add_run(f" - {edu.get('institution')}")
-            if edu.get('passing_year'):
-                edu_para.add_run(f" ({edu.get('passing_year')})")
-            edu_para.runs[0].font.size = Pt(12) # Apply size to bold part
-            if len(edu_para.runs) > 1: # Apply size to rest of the run
-                for run in edu_para.runs[1:]:
-                    run.font.size = Pt(12)
-
-            if edu.get('marks_percentage_cgpa'):
-                marks_para = document.add_paragraph()
-                marks_para.add_run(f"Marks/CGPA: {edu.get('marks_percentage_cgpa')}").font.size = Pt(10)
-            document.add_paragraph() # Small spacer
-
-    # Work Experience
-    if data.get('work_experience'):
-        document.add_heading('Work Experience', level=2)
-        for exp in data['work_experience']:
-            exp_para = document.add_paragraph()
-            exp_para.add_run(f"{exp.get('title', '')}").bold = True
-            if exp.get('company'):
-                exp_para.add_run(f" at {exp.get('company')}")
-            if exp.get('dates'):
-                exp_para.add_run(f" ({exp.get('dates')})")
-            exp_para.runs[0].font.size = Pt(12) # Apply size to bold part
-            if len(exp_para.runs) > 1: # Apply size to rest of the run
-                for run in exp_para.runs[1:]:
-                    run.font.size = Pt(12)
-
-            if exp.get('description'):
-                desc_lines = [line.strip() for line in exp['description'].split('\n') if line.strip()]
-                for desc_line in desc_lines:
-                    bullet_para = document.add_paragraph(style='List Bullet')
-                    bullet_para.add_run(desc_line).font.size = Pt(10)
-            document.add_paragraph() # Small spacer
-            
-    document.save(buffer)
-
+if WARMUP == 'sync':
+    warm_up()
+elif WARMUP == 'background':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
 
 if __name__ == '__main__':
     import os
@@ -0,0 +1,310 @@
+import os
+import io
+import sys
+import json
+import time
+import zipfile
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from resume_parser import extract_text_from_bytes, parse_resume_texts, PARSER_VERSION
+
+# --- Bulk Resume Ingestion ---
+# Used by the /parse_batch endpoint and by the command line:
+#   python batch_ingest.py resumes.zip more/*.pdf --output results.jsonl
+# Text extraction is CPU bound and runs in a process pool; the LLM calls are
+# I/O bound and run through LangChain's `batch` with bounded concurrency.
+# The pool is created on first use and shared by every batch in the process;
+# at most BATCH_MAX_CONCURRENT batches run at once, later ones wait up to
+# BATCH_QUEUE_TIMEOUT seconds for a slot.
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'pdf', 'docx'}
+MAX_BATCH_FILES = int(os.environ.get('BATCH_MAX_FILES', 1000))
+MAX_ARCHIVE_BYTES = int(os.environ.get('BATCH_MAX_ARCHIVE_BYTES', 500 * 1024 * 1024))
+EXTRACT_WORKERS = int(os.environ.get('BATCH_EXTRACT_WORKERS', os.cpu_count() or 2))
+LLM_CONCURRENCY = int(os.environ.get('BATCH_LLM_CONCURRENCY', 8))
+MAX_CONCURRENT_BATCHES = int(os.environ.get('BATCH_MAX_CONCURRENT', 2))
+QUEUE_TIMEOUT = float(os.environ.get('BATCH_QUEUE_TIMEOUT', 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+_batch_slots = threading.BoundedSemaphore(MAX_CONCURRENT_BATCHES)
+
+
+class BatchBusyError(RuntimeError):
+    """Raised when no batch slot frees up within BATCH_QUEUE_TIMEOUT."""
+
+
+def is_resume_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def expand_upload(filename, data):
+    """
+    Yields (filename, bytes) for a single upload, unpacking ZIP archives.
+    Archive members that are not PDF/DOCX (and macOS metadata) are skipped.
+    Raises:
+        ValueError: If the archive expands beyond MAX_ARCHIVE_BYTES.
+    """
+    if not filename.lower().endswith('.zip'):
+        yield filename, data
+        return
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            and is_resume_file(info.filename)
+        ]
+        # Check declared sizes up front so a zip bomb is rejected before reading it
+        if sum(info.file_size for info in members) > MAX_ARCHIVE_BYTES:
+            raise ValueError(f"Archive {filename} is larger than {MAX_ARCHIVE_BYTES} bytes uncompressed.")
+        for info in members:
+            yield os.path.basename(info.filename), archive.read(info)
+
+
+def collect_uploads(uploads):
+    """
+    Flattens (filename, bytes) uploads into a list of resume files.
+    Returns:
+        tuple: (files, errors) where files is a list of (filename, bytes) and
+        errors is a list of (position in files, error result) for rejected
+        uploads; `in_input_order` puts them back in upload order.
+    """
+    files = []
+    errors = []
+    for filename, data in uploads:
+        if not (is_resume_file(filename) or filename.lower().endswith('.zip')):
+            errors.append((len(files), {'filename': filename, 'status': 'error', 'error': 'Unsupported file type. Please upload a PDF, DOCX or ZIP file.'}))
+            continue
+        try:
+            files.extend(expand_upload(filename, data))
+        except (zipfile.BadZipFile, ValueError) as e:
+            errors.append((len(files), {'filename': filename, 'status': 'error', 'error': f'Could not read archive: {e}'}))
+    if len(files) > MAX_BATCH_FILES:
+        raise ValueError(f"Batch contains {len(files)} files; the limit is {MAX_BATCH_FILES}.")
+    return files, errors
+
+
+def in_input_order(results, errors):
+    """
+    Merges the results for `files` with the rejected-upload errors from
+    `collect_uploads`, in the order the uploads were given.
+    """
+    ordered = list(results)
+    # Last position first, so earlier insertion points don't shift
+    for position, error in reversed(errors):
+        ordered.insert(position, error)
+    return ordered
+
+
+def _extract_one(item):
+    """
+    Process pool worker: returns (text, error) for one (filename, bytes) item.
+    """
+    filename, data = item
+    try:
+        return extract_text_from_bytes(data, filename), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _get_pool(max_workers=EXTRACT_WORKERS):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def extract_texts(files, max_workers=EXTRACT_WORKERS):
+    """
+    Extracts text from many files, fanning out across the shared process
+    pool (created with `max_workers` processes on first use).
+    Returns:
+        list: (text, error) tuples aligned with `files`.
+    """
+    if len(files) <= 1 or max_workers <= 1:
+        return [_extract_one(item) for item in files]
+    pool = _get_pool(max_workers)
+    try:
+        return list(pool.map(_extract_one, files, chunksize=max(1, len(files) // (max_workers * 4))))
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); the next batch gets a fresh pool
+        logger.error("Extraction pool broke, extracting this batch inline: %s", e)
+        _discard_pool(pool)
+        return [_extract_one(item) for item in files]
+
+
+def ingest_files(files, parse_cache=None, max_workers=EXTRACT_WORKERS, max_concurrency=LLM_CONCURRENCY):
+    """
+    Extracts and parses a batch of resume files.
+    Args:
+        files (list): (filename, bytes) tuples.
+        parse_cache (ParseCache, optional): Cache consulted before extraction and before the model call.
+        max_workers (int): Process pool size for text extraction.
+        max_concurrency (int): Maximum LLM calls in flight.
+    Returns:
+        list: One result dict per file, in input order. Successful results look
+        like {'filename', 'status': 'ok', 'cached', 'data'}; failures like
+        {'filename', 'status': 'error', 'error'}.
+    Raises:
+        BatchBusyError: If BATCH_MAX_CONCURRENT batches are already running
+            and none finishes within BATCH_QUEUE_TIMEOUT seconds.
+    """
+    if not _batch_slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise BatchBusyError(f"{MAX_CONCURRENT_BATCHES} batches are already running; try again later.")
+    try:
+        return _ingest(files, parse_cache, max_workers, max_concurrency)
+    finally:
+        _batch_slots.release()
+
+
+def _ingest(files, parse_cache, max_workers, max_concurrency):
+    results = [None] * len(files)
+    file_keys = [None] * len(files)
+
+    # 1. File-hash cache lookups; only misses are extracted
+    to_extract = []
+    for i, (filename, data) in enumerate(files):
+        if parse_cache:
+            file_keys[i] = parse_cache.file_key(data)
+            cached = parse_cache.get(file_keys[i])
+            if cached is not None:
+                cached['original_filename'] = filename
+                results[i] = {'filename': filename, 'status': 'ok', 'cached': True, 'data': cached}
+                continue
+        to_extract.append(i)
+
+    # 2. Parallel text extraction
+    extracted = extract_texts([files[i] for i in to_extract], max_workers=max_workers)
+
+    # 3. Text-hash cache lookups; only misses go to the model
+    to_parse = []
+    texts = []
+    text_keys = {}
+    for i, (text, error) in zip(to_extract, extracted):
+        filename = files[i][0]
+        if error or not text:
+            results[i] = {'filename': filename, 'status': 'error', 'error': error or 'Could not extract text from the document. The file might be empty or corrupted.'}
+            continue
+        if parse_cache:
+            text_keys[i] = parse_cache.text_key(text)
+            cached = parse_cache.get(text_keys[i])
+            if cached is not None:
+                parse_cache.set([file_keys[i]], cached)
+                cached['original_filename'] = filename
+                results[i] = {'filename': filename, 'status': 'ok', 'cached': True, 'data': cached}
+                continue
+        to_parse.append(i)
+        texts.append(text)
+
+    # 4. Batched model calls with bounded concurrency
+    if texts:
+        parsed = parse_resume_texts(texts, max_concurrency=max_concurrency)
+        for i, data in zip(to_parse, parsed):
+            filename = files[i][0]
+            if isinstance(data, Exception) or not isinstance(data, dict):
+                results[i] = {'filename': filename, 'status': 'error', 'error': f'Error parsing resume: {data}'}
+                continue
+            if parse_cache:
+                parse_cache.set([file_keys[i], text_keys[i]], data)
+            data['original_filename'] = filename
+            results[i] = {'filename': filename, 'status': 'ok', 'cached': False, 'data': data}
+
+    return results
+
+
+def save_results(results):
+    """
+    Stores every successfully parsed resume with batched writes and records
+    the new document id on its result as 'id'.
+    """
+    # Imported here so parsing-only runs never initialize the database
+    from database import insert_many_resume_data
+    ok = [result for result in results if result['status'] == 'ok']
+    ids = insert_many_resume_data([(result['data'], result['filename']) for result in ok])
+    for result, resume_id in zip(ok, ids):
+        result['id'] = resume_id
+
+
+def summarize(results):
+    ok = sum(1 for r in results if r['status'] == 'ok')
+    return {
+        'total': len(results),
+        'ok': ok,
+        'errors': len(results) - ok,
+        'cached': sum(1 for r in results if r.get('cached')),
+        'saved': sum(1 for r in results if r.get('id'))
+    }
+
+
+def _iter_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse many resumes (PDF, DOCX or ZIP archives) in one run.")
+    parser.add_argument('paths', nargs='+', help="Files, directories or ZIP archives to ingest")
+    parser.add_argument('-o', '--output', help="Write JSON Lines results here (default: stdout)")
+    parser.add_argument('--workers', type=int, default=EXTRACT_WORKERS, help="Text extraction processes")
+    parser.add_argument('--concurrency', type=int, default=LLM_CONCURRENCY, help="Maximum LLM calls in flight")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the parse cache")
+    parser.add_argument('--save', action='store_true', help="Store parsed resumes in the database")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(), format='%(levelname)s %(name)s: %(message)s')
+
+    uploads = []
+    for path in _iter_paths(args.paths):
+        if is_resume_file(path) or path.lower().endswith('.zip'):
+            with open(path, 'rb') as f:
+                uploads.append((os.path.basename(path), f.read()))
+
+    parse_cache = None
+    if not args.no_cache:
+        from parse_cache import create_parse_cache
+        parse_cache = create_parse_cache(version=PARSER_VERSION)
+
+    start = time.perf_counter()
+    files, errors = collect_uploads(uploads)
+    results = in_input_order(ingest_files(files, parse_cache=parse_cache, max_workers=args.workers, max_concurrency=args.concurrency), errors)
+    if args.save:
+        save_results(results)
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in results:
+            out.write(json.dumps(result) + '\n')
+    finally:
+        if args.output:
+            out.close()
+
+    summary = summarize(results)
+    print(f"Processed {summary['total']} files in {elapsed:.1f}s: {summary['ok']} ok, "
+          f"{summary['errors']} errors, {summary['cached']} from cache, {summary['saved']} saved.", file=sys.stderr)
+    return 0 if summary['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import os
+import random
+import argparse
+
+from renderers import render_resume
+from fast_extract import DEFAULT_SKILLS
+
+# --- Synthetic Resume Corpus ---
+# Generates realistic-looking resumes for benchmarks, rendered to PDF and DOCX
+# with the app's own renderers so the extractors see the same kind of layout
+# they see in production. Generation is seeded and therefore repeatable:
+#   python -m benchmarks.corpus --out bench_corpus --count 60
+
+SIZES = {
+    # size: (work experience entries, description lines per entry, education entries)
+    'small': (2, 2, 1),
+    'medium': (5, 5, 2),
+    'large': (14, 10, 3),
+}
+
+FIRST_NAMES = ['Priya', 'Rahul', 'Ananya', 'Arjun', 'Meera', 'Vikram', 'Sara', 'David', 'Chen', 'Fatima', 'Lucas', 'Aisha']
+LAST_NAMES = ['Sharma', 'Iyer', 'Patel', 'Nair', 'Khan', 'Smith', 'Garcia', 'Wang', 'Okafor', 'Silva', 'Müller', 'Rossi']
+TITLES = ['Software Engineer', 'Senior Backend Engineer', 'Data Scientist', 'DevOps Engineer', 'Frontend Developer',
+          'Machine Learning Engineer', 'QA Engineer', 'Product Analyst', 'Engineering Manager']
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella Labs', 'Stark Industries', 'Wayne Enterprises', 'Hooli', 'Vandelay Imports']
+DEGREES = ['B.Tech in Computer Science', 'M.Sc in Data Science', 'B.E. in Electronics', 'MBA', 'M.Tech in Software Systems']
+INSTITUTIONS = ['XYZ Institute of Technology', 'State University', 'National Institute of Engineering', 'City College']
+VERBS = ['Built', 'Designed', 'Migrated', 'Optimized', 'Led', 'Automated', 'Maintained', 'Scaled']
+OBJECTS = ['REST APIs', 'data pipelines', 'the billing service', 'CI/CD workflows', 'dashboards', 'a recommendation engine',
+           'the search backend', 'microservices']
+OUTCOMES = ['reducing latency by {n}%', 'serving {n}k daily users', 'cutting costs by {n}%', 'improving test coverage to {n}%']
+
+
+def make_resume(rng, size='medium'):
+    """
+    Builds one synthetic resume dict (the stored/parsed resume format).
+    """
+    jobs, lines, degrees = SIZES[size]
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    year = 2024
+    work_experience = []
+    for _ in range(jobs):
+        start = year - rng.randint(1, 4)
+        description = '\n'.join(
+            f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(DEFAULT_SKILLS)}, "
+            f"{rng.choice(OUTCOMES).format(n=rng.randint(10, 90))}."
+            for _ in range(lines)
+        )
+        work_experience.append({'title': rng.choice(TITLES), 'company': rng.choice(COMPANIES),
+                                'dates': f"{start} - {year}", 'description': description})
+        year = start
+    education = [{'degree': rng.choice(DEGREES), 'institution': rng.choice(INSTITUTIONS),
+                  'passing_year': str(year - 4 * i), 'marks_percentage_cgpa': f"{rng.uniform(6.5, 9.8):.1f} CGPA"}
+                 for i in range(degrees)]
+    return {
+        'name': f"{first} {last}",
+        'email': f"{first.lower()}.{last.lower()}{rng.randint(1, 999)}@example.com",
+        'phone': f"+91 9{rng.randint(100000000, 999999999)}",
+        'skills': rng.sample(DEFAULT_SKILLS, min(len(DEFAULT_SKILLS), rng.randint(6, 18))),
+        'education': education,
+        'work_experience': work_experience,
+    }
+
+
+def generate_corpus(count, seed=42, formats=('pdf', 'docx')):
+    """
+    Generates `count` resumes spread evenly over the sizes and formats.
+    Returns:
+        list: (filename, file bytes, size, resume dict) tuples.
+    """
+    rng = random.Random(seed)
+    sizes = list(SIZES)
+    corpus = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        file_type = formats[(i // len(sizes)) % len(formats)]
+        data = make_resume(rng, size)
+        corpus.append((f"resume_{i:04d}_{size}.{file_type}", render_resume(data, file_type), size, data))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic PDF/DOCX resume corpus to a directory.")
+    parser.add_argument('--out', default='bench_corpus', help="Output directory")
+    parser.add_argument('--count', type=int, default=60, help="Number of resumes")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    for filename, body, _, _ in generate_corpus(args.count, seed=args.seed):
+        with open(os.path.join(args.out, filename), 'wb') as f:
+            f.write(body)
+    print(f"Wrote {args.count} resumes to {args.out}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import json
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from preprocess import estimate_tokens
+
+# --- Offline Stand-ins ---
+# A fake chat model for resume_parser and a helper to point the database layer
+# at the in-memory store (repository.MemoryBackend), so benchmarks never call
+# Gemini or Firestore.
+
+FAKE_RESPONSE = {
+    'name': 'Benchmark Candidate',
+    'email': 'candidate@example.com',
+    'phone': '+91 9000000000',
+    'skills': ['Python', 'SQL', 'Docker'],
+    'education': [{'degree': 'B.Tech in Computer Science', 'institution': 'State University',
+                   'passing_year': '2019', 'marks_percentage_cgpa': '8.1 CGPA'}],
+    'work_experience': [{'title': 'Software Engineer', 'company': 'Acme Corp', 'dates': '2019 - 2024',
+                         'description': 'Built REST APIs.'}],
+}
+
+
+def fake_llm(latency=0.0, response=None):
+    """
+    Builds a chat-model stand-in that waits `latency` seconds, then answers with
+    a fixed JSON resume and token usage estimated from the prompt.
+    """
+    content = json.dumps(response or FAKE_RESPONSE)
+
+    def respond(prompt_value):
+        if latency:
+            time.sleep(latency)
+        prompt_text = prompt_value.to_string() if hasattr(prompt_value, 'to_string') else str(prompt_value)
+        input_tokens, output_tokens = estimate_tokens(prompt_text), estimate_tokens(content)
+        return AIMessage(content=content, usage_metadata={
+            'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens
+        })
+
+    return RunnableLambda(respond)
+
+
+def offline_environment(store_latency=0.0):
+    """
+    Environment settings that keep the app offline; apply before importing app/database.
+    """
+    return {
+        'GOOGLE_API_KEY': 'offline-benchmark', # the client is never called, but refuses to build without a key
+        'RESUME_STORE_BACKEND': 'memory',
+        'MEMORY_STORE_LATENCY': str(store_latency),
+        'LOG_LEVEL': 'WARNING',
+    }
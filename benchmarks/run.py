@@ -0,0 +1,184 @@
+import io
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+
+from benchmarks.fakes import fake_llm, offline_environment
+
+# --- Benchmark Runner ---
+# Runs offline: the model is replaced by benchmarks.fakes.fake_llm and resumes
+# are stored in the in-memory repository backend.
+#   python -m benchmarks.run --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run --compare benchmarks/baseline.json   # exits 1 on regression
+# Each scenario reports throughput and p50/p95/p99 latency. A comparison fails
+# when a scenario's p50 or p95 is slower than the baseline by more than
+# --tolerance (a fraction, default 0.25).
+
+SCENARIOS = ['extract_pdf', 'extract_docx', 'parse', 'view_resumes', 'render_pdf', 'render_docx']
+COMPARED_STATS = ['p50_ms', 'p95_ms']
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations, wall_time):
+    ordered = sorted(durations)
+    return {
+        'samples': len(ordered),
+        'throughput_per_s': round(len(ordered) / wall_time, 2) if wall_time else None,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def measure(operation, inputs, iterations, warmup=3):
+    """
+    Calls `operation` on inputs (cycled) `iterations` times after `warmup` untimed calls.
+    """
+    for i in range(min(warmup, iterations)):
+        operation(inputs[i % len(inputs)])
+    durations = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        began = time.perf_counter()
+        operation(inputs[i % len(inputs)])
+        durations.append(time.perf_counter() - began)
+    return summarize(durations, time.perf_counter() - start)
+
+
+def run_benchmarks(scenarios, iterations, corpus_size, stored_resumes, llm_latency):
+    # Imported only after offline_environment() is applied
+    import app
+    import database
+    import resume_parser
+    from renderers import render_resume
+    from benchmarks.corpus import generate_corpus, make_resume
+    import random
+
+    resume_parser.set_llm(fake_llm(latency=llm_latency))
+    client = app.app.test_client()
+    corpus = generate_corpus(corpus_size)
+    pdfs = [(name, body) for name, body, _, _ in corpus if name.endswith('.pdf')]
+    docxs = [(name, body) for name, body, _, _ in corpus if name.endswith('.docx')]
+    resumes = [data for _, _, _, data in corpus]
+
+    def parse(item):
+        name, body = item
+        response = client.post('/parse', data={'resume': (io.BytesIO(body), name)}, content_type='multipart/form-data')
+        assert response.status_code == 200, response.status_code
+
+    def view_resumes(cursor):
+        response = client.get('/view_resumes', query_string={'cursor': cursor} if cursor else None)
+        assert response.status_code == 200, response.status_code
+
+    operations = {
+        'extract_pdf': (lambda item: resume_parser.extract_text_from_bytes(item[1], item[0]), pdfs),
+        'extract_docx': (lambda item: resume_parser.extract_text_from_bytes(item[1], item[0]), docxs),
+        'parse': (parse, pdfs + docxs),
+        'render_pdf': (lambda data: render_resume(data, 'pdf'), resumes),
+        'render_docx': (lambda data: render_resume(data, 'docx'), resumes),
+    }
+    if 'view_resumes' in scenarios:
+        rng = random.Random(7)
+        database.insert_many_resume_data([(make_resume(rng, 'small'), f'stored_{i}.pdf') for i in range(stored_resumes)])
+        # First page plus a few deeper pages reached through cursors
+        cursors = [None]
+        for _ in range(4):
+            _, next_cursor = database.get_resumes_page(app.DEFAULT_PAGE_SIZE, cursors[-1])
+            if not next_cursor:
+                break
+            cursors.append(next_cursor)
+        operations['view_resumes'] = (view_resumes, cursors)
+
+    results = {}
+    for scenario in scenarios:
+        operation, inputs = operations[scenario]
+        results[scenario] = measure(operation, inputs, iterations)
+        stats = results[scenario]
+        print(f"{scenario:<14} {stats['throughput_per_s']:>9.1f}/s  p50 {stats['p50_ms']:>9.2f} ms  "
+              f"p95 {stats['p95_ms']:>9.2f} ms  p99 {stats['p99_ms']:>9.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of regression messages (empty when within tolerance).
+    """
+    regressions = []
+    for scenario, stats in results.items():
+        reference = baseline.get('results', {}).get(scenario)
+        if not reference:
+            continue
+        for stat in COMPARED_STATS:
+            if reference.get(stat) and stats[stat] > reference[stat] * (1 + tolerance):
+                regressions.append(f"{scenario} {stat}: {stats[stat]:.2f} ms vs baseline {reference[stat]:.2f} ms "
+                                   f"(+{(stats[stat] / reference[stat] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks for the resume parser.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--iterations', type=int, default=50, help="Timed calls per scenario")
+    parser.add_argument('--corpus-size', type=int, default=24, help="Synthetic resumes to generate")
+    parser.add_argument('--stored-resumes', type=int, default=500, help="Resumes in the store for view_resumes")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds the fake model waits per call")
+    parser.add_argument('--store-latency', type=float, default=0.0, help="Seconds per in-memory store round-trip")
+    parser.add_argument('-o', '--output', help="Write results as JSON here")
+    parser.add_argument('--save-baseline', help="Write results as the new baseline to this file")
+    parser.add_argument('--compare', help="Baseline file to compare against; exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown over the baseline (fraction)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Offline settings win over the shell environment; caches are off so every call does the real work
+    os.environ.update(offline_environment(store_latency=args.store_latency))
+    os.environ.update({'PARSE_CACHE_BACKEND': 'none', 'RENDER_CACHE_MAX_MB': '0', 'WARMUP': 'sync'})
+
+    results = run_benchmarks(scenarios, args.iterations, args.corpus_size, args.stored_resumes, args.llm_latency)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': {key: value for key, value in vars(args).items()
+                     if key in ('iterations', 'corpus_size', 'stored_resumes', 'llm_latency', 'store_latency')},
+        'results': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('settings') != report['settings']:
+            print("Warning: baseline was recorded with different settings.", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from benchmarks.fakes import offline_environment
+
+# --- Cold Start Benchmark ---
+# Starts fresh interpreters and measures, from process launch:
+#   import        `import app` finished (the server could start accepting requests)
+#   first_page    first response from GET /
+#   first_parse   first response from POST /parse (offline fake model)
+#   first_render  first PDF rendered through /download_resume
+#   python -m benchmarks.startup --runs 5 --warmup off,background,sync
+# --idle inserts a pause between the import and the first request (excluded
+# from the timings) to model an instance that starts before traffic reaches it,
+# which is when WARMUP=background pays off.
+
+CHILD = r'''
+import io, json, sys, time
+launched, idle, path = float(sys.argv[1]), float(sys.argv[2]), sys.argv[3]
+marks = {}
+import app
+marks['import'] = time.time() - launched
+time.sleep(idle)
+import resume_parser, database
+
+class FakeModel:
+    # Minimal stand-in so the child never imports LangChain itself
+    def invoke(self, prompt_value):
+        return json.dumps({'education': [], 'work_experience': []})
+
+resume_parser.set_llm(FakeModel())
+with open(path, 'rb') as f:
+    body = f.read()
+client = app.app.test_client()
+assert client.get('/').status_code == 200
+marks['first_page'] = time.time() - launched - idle
+response = client.post('/parse', data={'resume': (io.BytesIO(body), 'resume.pdf')}, content_type='multipart/form-data')
+assert response.status_code == 200, response.status_code
+marks['first_parse'] = time.time() - launched - idle
+resume_id = database.insert_resume_data({'name': 'Cold Start'}, 'resume.pdf')
+assert client.get(f'/download_resume/{resume_id}/pdf').status_code == 200
+marks['first_render'] = time.time() - launched - idle
+print(json.dumps(marks))
+'''
+
+
+def run_once(warmup, idle, resume_path):
+    env = dict(os.environ, **offline_environment(), WARMUP=warmup, PARSE_CACHE_BACKEND='none', RENDER_CACHE_MAX_MB='0')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    launched = time.time()
+    result = subprocess.run([sys.executable, '-c', CHILD, repr(launched), repr(idle), resume_path],
+                            env=env, cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_modes(args, resume_path):
+    report = {}
+    for mode in [m.strip() for m in args.warmup.split(',') if m.strip()]:
+        runs = [run_once(mode, args.idle, resume_path) for _ in range(args.runs)]
+        report[mode] = {mark: round(statistics.median(run[mark] for run in runs) * 1000, 1) for mark in runs[0]}
+        print(f"WARMUP={mode:<11} " + "  ".join(f"{mark} {ms:>7.1f} ms" for mark, ms in report[mode].items()),
+              file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app cold start and time to first responses.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh processes per warm-up mode")
+    parser.add_argument('--warmup', default='off,background,sync', help="Comma-separated WARMUP modes to compare")
+    parser.add_argument('--idle', type=float, default=0.0,
+                        help="Seconds between import and the first request (excluded from the timings)")
+    parser.add_argument('-o', '--output', help="Write the medians as JSON here")
+    args = parser.parse_args(argv)
+
+    from benchmarks.corpus import generate_corpus
+    with tempfile.TemporaryDirectory() as directory:
+        resume_path = os.path.join(directory, 'resume.pdf')
+        with open(resume_path, 'wb') as f:
+            f.write(generate_corpus(1, formats=('pdf',))[0][1])
+        report = run_modes(args, resume_path)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
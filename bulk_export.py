@@ -0,0 +1,312 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+import zipfile
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from renderers import render_resume, file_basename, MIMETYPES
+
+# --- Bulk Resume Export ---
+# Used by the /export endpoint and by the command line:
+#   python bulk_export.py --query "python -java" --format pdf -o packet.zip
+#   python bulk_export.py --ids ID1,ID2 --format csv -o panel.csv
+# PDF/DOCX exports are rendered in a process pool shared by all exports (so
+# only the first one pays for starting it) and written into a ZIP that
+# is streamed out as renders complete; only a bounded window of renders is in
+# flight, so memory does not grow with the size of the packet. CSV/JSONL
+# exports stream the structured fields row by row.
+
+EXPORT_FORMATS = {'pdf', 'docx', 'csv', 'jsonl'}
+MAX_EXPORT_RESUMES = int(os.environ.get('EXPORT_MAX_RESUMES', 1000))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', os.cpu_count() or 2))
+FETCH_CHUNK = 100 # resumes fetched per database round-trip
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = ['id', 'name', 'email', 'phone', 'skills', 'education', 'work_experience', 'original_filename', 'timestamp']
+
+MIMETYPES_BY_FORMAT = {
+    'pdf': 'application/zip',
+    'docx': 'application/zip',
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson'
+}
+
+# Render pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def resolve_ids(ids=None, query=None, limit=MAX_EXPORT_RESUMES):
+    """
+    Turns an explicit id list or a search query (see search_index) into the ids
+    to export. A query selects its `limit` best matches.
+    Raises:
+        ValueError: If neither is given or more than `limit` ids are listed.
+    """
+    if ids:
+        ids = list(dict.fromkeys(resume_id for resume_id in ids if resume_id)) # de-duplicate, keep order
+        if len(ids) > limit:
+            raise ValueError(f"Export lists {len(ids)} resumes; the limit is {limit}.")
+        return ids
+    if query:
+        import search_index
+        total, results = search_index.get_index().search(query, k=limit)
+        return [result['id'] for result in results]
+    raise ValueError("Provide resume ids or a search query.")
+
+
+def iter_resumes(ids, chunk_size=FETCH_CHUNK):
+    """
+    Yields (resume_id, resume dict or None) for `ids`, fetching in batched reads.
+    """
+    from database import get_resumes_by_ids
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        yield from zip(chunk, get_resumes_by_ids(chunk))
+
+
+def _render_one(item):
+    """
+    Process pool worker: returns (body, error) for one (resume, file_type) item.
+    """
+    data, file_type = item
+    try:
+        return render_resume(data, file_type), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _get_pool(max_workers=EXPORT_WORKERS):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max_workers)
+    return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def render_resumes(resumes, file_type, max_workers=EXPORT_WORKERS, render_cache=None):
+    """
+    Renders resumes, yielding results as they complete (not in input order).
+    Args:
+        resumes (iterable): Resume dicts with 'id'.
+        file_type (str): 'pdf' or 'docx'.
+        max_workers (int): Render processes (used when the shared pool is first
+            created; also bounds the renders in flight); 1 renders in this process.
+        render_cache (RenderCache, optional): Consulted before rendering and filled afterwards.
+    Yields:
+        tuple: (resume, body or None, error or None)
+    """
+    from render_cache import content_hash
+
+    def cache_key(resume):
+        return (resume['id'], content_hash(resume), file_type)
+
+    def finish(resume, body, error):
+        if body is not None and render_cache:
+            render_cache.set(cache_key(resume), body)
+        return resume, body, error
+
+    pool = _get_pool(max_workers) if max_workers > 1 else None
+    pending = {}
+
+    def collect(done):
+        nonlocal pool
+        for future in done:
+            resume = pending.pop(future)
+            try:
+                yield finish(resume, *future.result())
+            except BrokenProcessPool as e:
+                # A render process died (e.g. killed for memory); this export
+                # finishes in-process and the next one gets a fresh pool
+                if pool is not None:
+                    logger.warning("Export: Render pool broke (%s), rendering in-process.", e)
+                    _discard_pool(pool)
+                    pool = None
+                yield finish(resume, *_render_one((resume, file_type)))
+
+    try:
+        for resume in resumes:
+            body = render_cache.get(cache_key(resume)) if render_cache else None
+            if body is not None:
+                yield resume, body, None
+                continue
+            if pool is None:
+                yield finish(resume, *_render_one((resume, file_type)))
+                continue
+            pending[pool.submit(_render_one, (resume, file_type))] = resume
+            # Keep a bounded window in flight; hand back whatever has finished
+            while len(pending) >= max_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        # The pool is shared; only drop this export's queued renders
+        for future in pending:
+            future.cancel()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable sink that zipfile writes into; the bytes written
+    since the last `drain` are handed to the response.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile records offsets with tell() even on unseekable streams
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(ids, file_type, max_workers=EXPORT_WORKERS, render_cache=None):
+    """
+    Generates a ZIP archive of rendered resumes, chunk by chunk.
+    Resumes that are missing or fail to render are listed in errors.txt.
+    """
+    sink = _StreamBuffer()
+    errors = []
+    names = set()
+
+    def found():
+        for resume_id, resume in iter_resumes(ids):
+            if resume is None:
+                errors.append(f"{resume_id}: not found")
+            else:
+                yield resume
+
+    # DOCX files are already ZIP-compressed; deflating them again only costs CPU
+    compression = zipfile.ZIP_STORED if file_type == 'docx' else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, 'w', compression=compression) as archive:
+        for resume, body, error in render_resumes(found(), file_type, max_workers, render_cache):
+            if error:
+                errors.append(f"{resume['id']}: {error}")
+                continue
+            name = f"{file_basename(resume)}.{file_type}"
+            if name in names:
+                name = f"{file_basename(resume)}_{resume['id']}.{file_type}"
+            names.add(name)
+            archive.writestr(name, body)
+            yield sink.drain()
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+    yield sink.drain()
+
+
+def _csv_row(resume):
+    row = dict(resume)
+    row['skills'] = '; '.join(str(skill) for skill in resume.get('skills') or [])
+    row['education'] = json.dumps(resume.get('education') or [], default=str)
+    row['work_experience'] = json.dumps(resume.get('work_experience') or [], default=str)
+    return row
+
+
+def stream_records(ids, file_type):
+    """
+    Generates a CSV or JSON Lines export of the structured fields, chunk by chunk.
+    Missing resumes are skipped.
+    """
+    if file_type == 'csv':
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for resume_id, resume in iter_resumes(ids):
+            if resume is not None:
+                writer.writerow(_csv_row(resume))
+            if out.tell() > 64 * 1024:
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue()
+    else:
+        for resume_id, resume in iter_resumes(ids):
+            if resume is not None:
+                yield json.dumps(resume, default=str) + '\n'
+
+
+def export(ids, file_type, max_workers=EXPORT_WORKERS, render_cache=None):
+    """
+    Streams an export of `ids` in `file_type` (pdf/docx ZIP, csv or jsonl).
+    Returns:
+        iterator: bytes (ZIP) or str (CSV/JSONL) chunks.
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if file_type not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_type}")
+    if file_type in MIMETYPES:
+        return stream_zip(ids, file_type, max_workers=max_workers, render_cache=render_cache)
+    return stream_records(ids, file_type)
+
+
+def export_filename(file_type):
+    extension = 'zip' if file_type in MIMETYPES else file_type
+    return f"resumes_{time.strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export many stored resumes as a ZIP of PDF/DOCX files, CSV or JSON Lines.")
+    parser.add_argument('--ids', help="Comma-separated resume ids")
+    parser.add_argument('--ids-file', help="File with one resume id per line")
+    parser.add_argument('-q', '--query', help="Search query selecting the resumes (see /search)")
+    parser.add_argument('-f', '--format', choices=sorted(EXPORT_FORMATS), default='pdf')
+    parser.add_argument('-o', '--output', help="Output file (default: a timestamped name in the current directory)")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS, help="Render processes")
+    parser.add_argument('--limit', type=int, default=MAX_EXPORT_RESUMES, help="Maximum resumes to export")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(), format='%(levelname)s %(name)s: %(message)s')
+
+    ids = args.ids.split(',') if args.ids else []
+    if args.ids_file:
+        with open(args.ids_file, encoding='utf-8') as f:
+            ids.extend(line.strip() for line in f if line.strip())
+    try:
+        ids = resolve_ids(ids=ids, query=args.query, limit=args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or export_filename(args.format)
+    start = time.perf_counter()
+    mode, encoding = ('wb', None) if args.format in MIMETYPES else ('w', 'utf-8')
+    with open(output, mode, encoding=encoding, newline='' if encoding else None) as out:
+        for chunk in export(ids, args.format, max_workers=args.workers):
+            out.write(chunk)
+    print(f"Exported {len(ids)} resumes to {output} in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,14 @@
 import os
+import copy
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
+import time
+import logging
+import threading
+from collections import OrderedDict
+from repository import create_repository, run, build_resume_doc, ConflictError
+import metrics
 
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "resume-parser-917f8-firebase-adminsdk-fbsvc-c298edca65.json"
+logger = logging.getLogger(__name__)
 
 # --- Firestore Initialization ---
 # For local development:
@@ -18,37 +23,281 @@ os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "resume-parser-917f8-firebase-adm
 # A simpler approach for Render is to put the JSON content into a single environment variable
 # like FIREBASE_CREDENTIALS_JSON and load it as a string.
 
-# Check if Firebase has already been initialized
-if not firebase_admin._apps:
-    try:
-        # Attempt to load credentials from GOOGLE_APPLICATION_CREDENTIALS environment variable
-        # This is the standard way for Google Cloud services
-        cred = credentials.ApplicationDefault()
-        firebase_admin.initialize_app(cred)
-        print("Firebase Admin SDK initialized using Application Default Credentials.")
-    except Exception as e:
-        print(f"Warning: Could not initialize Firebase with Application Default Credentials: {e}")
-        # Fallback for local development if GOOGLE_APPLICATION_CREDENTIALS is not set
-        # or for Render if using a direct JSON string env var
+def init_firebase():
+    """
+    Initializes the Firebase Admin SDK (once per process).
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+    # Check if Firebase has already been initialized
+    if not firebase_admin._apps:
         try:
-            # Look for a direct JSON string in an environment variable (e.g., for Render)
-            firebase_credentials_json = os.environ.get('FIREBASE_CREDENTIALS_JSON')
-            if firebase_credentials_json:
-                cred = credentials.Certificate(json.loads(firebase_credentials_json))
-                firebase_admin.initialize_app(cred)
-                print("Firebase Admin SDK initialized using FIREBASE_CREDENTIALS_JSON.")
-            else:
-                print("Error: FIREBASE_CREDENTIALS_JSON environment variable not found.")
-                raise Exception("Firebase credentials not found. Please set GOOGLE_APPLICATION_CREDENTIALS or FIREBASE_CREDENTIALS_JSON.")
-        except Exception as e_fallback:
-            print(f"Error: Failed to initialize Firebase Admin SDK: {e_fallback}")
-            print("Please ensure your Firebase service account key is correctly configured.")
-            # In a real app, you might want to exit or handle this more gracefully
-            # For this demo, we'll let it fail if credentials aren't found.
-            raise e_fallback # Re-raise the exception to stop the app if init fails
-
-db = firestore.client()
-print("Firestore client initialized.")
+            # Attempt to load credentials from GOOGLE_APPLICATION_CREDENTIALS environment variable
+            # This is the standard way for Google Cloud services
+            cred = credentials.ApplicationDefault()
+            firebase_admin.initialize_app(cred)
+            logger.info("Firebase Admin SDK initialized using Application Default Credentials.")
+        except Exception as e:
+            logger.warning("Could not initialize Firebase with Application Default Credentials: %s", e)
+            # Fallback for local development if GOOGLE_APPLICATION_CREDENTIALS is not set
+            # or for Render if using a direct JSON string env var
+            try:
+                # Look for a direct JSON string in an environment variable (e.g., for Render)
+                firebase_credentials_json = os.environ.get('FIREBASE_CREDENTIALS_JSON')
+                if firebase_credentials_json:
+                    cred = credentials.Certificate(json.loads(firebase_credentials_json))
+                    firebase_admin.initialize_app(cred)
+                    logger.info("Firebase Admin SDK initialized using FIREBASE_CREDENTIALS_JSON.")
+                else:
+                    logger.error("FIREBASE_CREDENTIALS_JSON environment variable not found.")
+                    raise Exception("Firebase credentials not found. Please set GOOGLE_APPLICATION_CREDENTIALS or FIREBASE_CREDENTIALS_JSON.")
+            except Exception as e_fallback:
+                logger.error("Failed to initialize Firebase Admin SDK: %s. Please ensure your Firebase service account key is correctly configured.", e_fallback)
+                # In a real app, you might want to exit or handle this more gracefully
+                # For this demo, we'll let it fail if credentials aren't found.
+                raise e_fallback # Re-raise the exception to stop the app if init fails
+
+
+# Which store backs the 'resumes' collection: firestore (default), sqlite (an embedded
+# file, see RESUME_STORE_PATH) or memory (tests)
+STORE_BACKEND = os.environ.get('RESUME_STORE_BACKEND', 'firestore').lower()
+
+# All reads and writes go through the async repository; the functions below
+# are synchronous wrappers for the Flask routes. Firebase and the Firestore
+# client are set up on first use, so importing this module is cheap.
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_repository():
+    """
+    Returns the shared ResumeRepository, initializing Firebase on first use (thread-safe).
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if STORE_BACKEND == 'firestore':
+                    init_firebase()
+                _repository = create_repository(STORE_BACKEND)
+                if CACHE_WATCH:
+                    try:
+                        start_cache_watch()
+                    except Exception as e:
+                        logger.warning("Firestore: Could not watch for changes, the read cache relies on its TTL: %s", e)
+    return _repository
+
+def __getattr__(name):
+    # `database.repository` is still available, created lazily
+    if name == 'repository':
+        return get_repository()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Change Listeners ---
+# Callbacks notified after successful writes, e.g. to keep the search index current.
+# Each is called as callback(event, resume_id, data) with event 'insert' (data is the
+# stored document), 'update' (data is {'document': the updated document, 'changed':
+# list of changed field names}, so listeners can skip edits to fields they don't use)
+# or 'delete' (data is None).
+_change_listeners = []
+
+def add_change_listener(callback):
+    """
+    Registers a callback for resume inserts, updates and deletes in this
+    process (a replace is reported as a delete followed by an insert).
+    """
+    _change_listeners.append(callback)
+
+def _notify(event, resume_id, data=None):
+    for callback in list(_change_listeners):
+        try:
+            callback(event, resume_id, data)
+        except Exception as e:
+            # A failing listener must never fail the write that triggered it
+            logger.exception("Change listener failed for %s %s: %s", event, resume_id, e)
+
+# --- Read Cache ---
+# Read-through cache in front of get_resume_by_id/get_resumes_by_ids (an LRU of
+# whole documents) and get_resumes_page (pages keyed by page size and cursor).
+# Every write in this process bumps a version number: pages cached under an
+# older version are never served again, and the written document is dropped.
+# A read that started before a write is not cached when it completes, so a
+# slow read can't put back what the write invalidated.
+# Writes made by other processes are picked up after RESUME_CACHE_TTL seconds,
+# or as they happen with RESUME_CACHE_WATCH=1, which subscribes to the
+# collection with Firestore's on_snapshot (the initial snapshot costs one read
+# per stored resume, later changes one read each).
+CACHE_MAX_DOCS = int(os.environ.get('RESUME_CACHE_MAX_DOCS', 1000)) # 0 disables the cache
+CACHE_MAX_PAGES = int(os.environ.get('RESUME_CACHE_MAX_PAGES', 64))
+CACHE_TTL = float(os.environ.get('RESUME_CACHE_TTL', 60)) # seconds; 0 keeps entries until invalidated
+CACHE_WATCH = os.environ.get('RESUME_CACHE_WATCH', '0') == '1'
+
+class ResumeCache:
+    """
+    Bounded LRU of resume documents and list pages, invalidated on writes.
+    """
+
+    def __init__(self, max_docs=CACHE_MAX_DOCS, max_pages=CACHE_MAX_PAGES, ttl=CACHE_TTL):
+        self.max_docs = max_docs
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.reads_saved = 0 # Firestore document reads answered from the cache
+        self.invalidations = 0
+        self._docs = OrderedDict() # resume_id -> (expires_at, document)
+        self._pages = OrderedDict() # (version, page_size, cursor) -> (expires_at, resumes, next_cursor)
+        self._lock = threading.Lock()
+
+    def _expiry(self):
+        return time.monotonic() + self.ttl if self.ttl > 0 else float('inf')
+
+    def _lookup(self, entries, key):
+        entry = entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del entries[key]
+            entry = None
+        if entry is not None:
+            entries.move_to_end(key)
+        return entry
+
+    def _count(self, kind, hit, reads=0):
+        # Called with the lock held
+        if hit:
+            self.hits += 1
+            self.reads_saved += reads
+            metrics.RESUME_CACHE_READS_SAVED.inc(reads)
+        else:
+            self.misses += 1
+        metrics.RESUME_CACHE_LOOKUPS.inc(cache=kind, result='hit' if hit else 'miss')
+
+    def get_many(self, resume_ids):
+        """
+        Returns (version, {resume_id: document}) for the cached documents;
+        pass the version back to put_many with the documents fetched for the rest.
+        """
+        found = {}
+        with self._lock:
+            for resume_id in resume_ids:
+                entry = self._lookup(self._docs, resume_id)
+                if entry is not None:
+                    found[resume_id] = copy.deepcopy(entry[1])
+                self._count('document', entry is not None, reads=1)
+            return self.version, found
+
+    def put_many(self, version, documents):
+        with self._lock:
+            if version != self.version:
+                return
+            expires_at = self._expiry()
+            for document in documents:
+                self._docs[document['id']] = (expires_at, copy.deepcopy(document))
+                self._docs.move_to_end(document['id'])
+            while len(self._docs) > self.max_docs:
+                self._docs.popitem(last=False)
+
+    def get_page(self, page_size, cursor):
+        """
+        Returns (version, (resumes, next_cursor) or None).
+        """
+        with self._lock:
+            entry = self._lookup(self._pages, (self.version, page_size, cursor))
+            self._count('page', entry is not None, reads=len(entry[1]) if entry else 0)
+            if entry is None:
+                return self.version, None
+            return self.version, ([dict(resume) for resume in entry[1]], entry[2])
+
+    def put_page(self, version, page_size, cursor, resumes, next_cursor):
+        with self._lock:
+            if version != self.version:
+                return
+            self._pages[(version, page_size, cursor)] = (self._expiry(), [dict(resume) for resume in resumes], next_cursor)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def invalidate(self, resume_ids=()):
+        """
+        Drops the given documents and every cached page (any write can move
+        resumes between pages).
+        """
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._pages.clear()
+            for resume_id in resume_ids:
+                self._docs.pop(resume_id, None)
+
+    def on_change(self, event, resume_id, data):
+        """
+        Change listener for add_change_listener.
+        """
+        # Inserted documents are not cached: the stored timestamp is only known after a read
+        self.invalidate([resume_id])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'documents': len(self._docs),
+                'pages': len(self._pages),
+                'max_documents': self.max_docs,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'reads_saved': self.reads_saved,
+                'invalidations': self.invalidations,
+                'version': self.version,
+                'ttl': self.ttl,
+                'watching': _watch is not None
+            }
+
+_cache = ResumeCache() if CACHE_MAX_DOCS > 0 else None
+if _cache is not None:
+    add_change_listener(_cache.on_change)
+_watch = None
+_watch_primed = False
+_watch_lock = threading.Lock()
+
+def _on_snapshot(collection_snapshot, changes, read_time):
+    global _watch_primed
+    # The first snapshot lists every stored resume as ADDED; there is nothing to invalidate yet
+    if not _watch_primed:
+        _watch_primed = True
+        return
+    if changes:
+        _cache.invalidate([change.document.id for change in changes])
+        logger.debug("Firestore: %d external changes invalidated the read cache.", len(changes))
+
+def start_cache_watch():
+    """
+    Subscribes the read cache to changes of the resumes collection (Firestore
+    only; the listener runs on the Firestore client's own thread). Does
+    nothing if the cache is disabled or already watching.
+    Returns:
+        bool: Whether a watch is active.
+    """
+    global _watch, _watch_primed
+    if _cache is None or STORE_BACKEND != 'firestore':
+        return False
+    with _watch_lock:
+        if _watch is None:
+            from firebase_admin import firestore
+            from repository import COLLECTION
+            init_firebase()
+            _watch_primed = False
+            _watch = firestore.client().collection(COLLECTION).on_snapshot(_on_snapshot)
+            logger.info("Firestore: Read cache is watching the %s collection.", COLLECTION)
+    return True
+
+def stop_cache_watch():
+    global _watch
+    with _watch_lock:
+        if _watch is not None:
+            _watch.unsubscribe()
+            _watch = None
+
+def cache_stats():
+    return _cache.stats() if _cache is not None else None
 
 # --- Database Operations ---
 
@@ -57,33 +306,94 @@ def insert_resume_data(data, original_filename=None):
     Inserts parsed resume data into Firestore.
 
     Args:
-        data (dict): A dictionary containing parsed resume details.
+        data (Resume or dict): The parsed resume details.
         original_filename (str, optional): The filename of the uploaded resume.
     Returns:
         str: The ID of the newly inserted document.
     """
     try:
-        # Create a new document in the 'resumes' collection
-        doc_ref = db.collection('resumes').document()
-        
-        # Firestore can directly store Python dicts and lists, no need for json.dumps
-        resume_doc = {
-            'name': data.get('name', ''),
-            'email': data.get('email', ''),
-            'phone': data.get('phone', ''),
-            'skills': data.get('skills', []),
-            'education': data.get('education', []),
-            'work_experience': data.get('work_experience', []),
-            'original_filename': original_filename,
-            'timestamp': firestore.SERVER_TIMESTAMP # Add a server timestamp
-        }
-        
-        doc_ref.set(resume_doc)
-        print(f"Firestore: Data saved with ID: {doc_ref.id}")
-        return doc_ref.id
+        with metrics.span('firestore_insert'):
+            resume_id = run(get_repository().insert(data, original_filename))
+        logger.info("Firestore: Data saved with ID: %s", resume_id)
+        _notify('insert', resume_id, build_resume_doc(data, original_filename))
+        return resume_id
+    except Exception as e:
+        logger.error("Firestore: Failed to insert data: %s", e)
+        raise
+
+def insert_many_resume_data(items):
+    """
+    Inserts many parsed resumes using batched writes.
+
+    Args:
+        items (list): (data, original_filename) tuples.
+    Returns:
+        list: The IDs of the new documents, aligned with `items`.
+    """
+    try:
+        with metrics.span('firestore_insert_many'):
+            ids = run(get_repository().insert_many(items))
+        logger.info("Firestore: Saved %d resumes in batched writes.", len(ids))
+        for (data, original_filename), resume_id in zip(items, ids):
+            _notify('insert', resume_id, build_resume_doc(data, original_filename))
+        return ids
+    except Exception as e:
+        logger.error("Firestore: Failed to insert %d resumes: %s", len(items), e)
+        raise
+
+def replace_resume_data(resume_id, data, original_filename=None):
+    """
+    Overwrites an existing resume as a whole, keeping its ID (see update_resume_data
+    for field-level edits).
+
+    Args:
+        resume_id (str): The ID of the resume document to overwrite.
+        data (Resume or dict): The new resume details.
+        original_filename (str, optional): The filename to store with it.
+    """
+    try:
+        with metrics.span('firestore_replace'):
+            run(get_repository().replace(resume_id, data, original_filename))
+        logger.info("Firestore: Resume with ID %s replaced.", resume_id)
+        # Listeners see a replace as the old document going away and the new one arriving
+        _notify('delete', resume_id)
+        _notify('insert', resume_id, build_resume_doc(data, original_filename))
+    except Exception as e:
+        logger.error("Firestore: Failed to replace resume with ID %s: %s", resume_id, e)
+        raise
+
+def update_resume_data(resume_id, data, expected_version=None, fields=None):
+    """
+    Applies an edit to a stored resume, writing only the fields that changed.
+
+    Args:
+        resume_id (str): The ID of the resume document to update.
+        data (Resume or dict): The edited resume details.
+        expected_version (str, optional): The version (see repository.document_version)
+            the edit was made on; the update fails if the resume changed since.
+        fields (iterable, optional): Only update these fields (partial edits).
+    Returns:
+        list: The names of the changed fields (empty if nothing changed).
+    Raises:
+        ResumeNotFoundError: If the resume does not exist.
+        ConflictError: If the resume was modified after `expected_version`.
+        ResumeValidationError: If `data` does not have the resume shape.
+    """
+    try:
+        with metrics.span('firestore_update'):
+            document, changes = run(get_repository().update(resume_id, data, expected_version, fields))
+    except ConflictError:
+        # Another process changed it; a cached copy is stale, so the caller's re-read goes to the store
+        if _cache is not None:
+            _cache.invalidate([resume_id])
+        raise
     except Exception as e:
-        print(f"Firestore Error: Failed to insert data: {e}")
+        logger.warning("Firestore: Failed to update resume with ID %s: %s", resume_id, e)
         raise
+    if changes:
+        logger.info("Firestore: Resume with ID %s updated (%s).", resume_id, ', '.join(changes))
+        _notify('update', resume_id, {'document': document, 'changed': list(changes)})
+    return list(changes)
 
 def get_all_resumes():
     """
@@ -92,43 +402,94 @@ def get_all_resumes():
         list: A list of dictionaries, each representing a resume.
     """
     try:
-        resumes_ref = db.collection('resumes')
-        docs = resumes_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).stream() # Order by timestamp
-        
-        all_resumes = []
-        for doc in docs:
-            resume_data = doc.to_dict()
-            resume_data['id'] = doc.id # Add the document ID to the data
-            all_resumes.append(resume_data)
-        print(f"Firestore: Fetched {len(all_resumes)} resumes.")
+        with metrics.span('firestore_list_all'):
+            all_resumes = run(get_repository().list_all()) # Ordered by timestamp, newest first
+        logger.info("Firestore: Fetched %d resumes.", len(all_resumes))
         return all_resumes
     except Exception as e:
-        print(f"Firestore Error: Failed to fetch all resumes: {e}")
+        logger.error("Firestore: Failed to fetch all resumes: %s", e)
         return []
 
+def get_resumes_page(page_size=20, cursor=None):
+    """
+    Fetches one page of resume summaries (name, email, phone, filename), newest first.
+    Args:
+        page_size (int): Resumes per page.
+        cursor (str, optional): The `next_cursor` returned for the previous page.
+    Returns:
+        tuple: (list of resume dicts, next_cursor or None on the last page)
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if _cache is not None:
+        version, page = _cache.get_page(page_size, cursor)
+        if page is not None:
+            return page
+    try:
+        with metrics.span('firestore_list_page'):
+            resumes, next_cursor = run(get_repository().list_page(page_size, cursor))
+        logger.debug("Firestore: Fetched page of %d resumes.", len(resumes))
+        if _cache is not None:
+            _cache.put_page(version, page_size, cursor, resumes, next_cursor)
+        return resumes, next_cursor
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error("Firestore: Failed to fetch resume page: %s", e)
+        return [], None
+
 def get_resume_by_id(resume_id):
     """
-    Fetches a single resume by its ID from Firestore.
+    Fetches a single resume by its ID, from the read cache or Firestore.
     Args:
         resume_id (str): The ID of the resume document.
     Returns:
         dict: The resume data, or None if not found.
     """
+    if _cache is not None:
+        version, cached = _cache.get_many([resume_id])
+        if resume_id in cached:
+            return cached[resume_id]
     try:
-        doc_ref = db.collection('resumes').document(resume_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            resume_data = doc.to_dict()
-            resume_data['id'] = doc.id # Add the document ID
-            print(f"Firestore: Fetched resume with ID: {resume_id}")
-            return resume_data
+        with metrics.span('firestore_get'):
+            resume_data = run(get_repository().get(resume_id))
+        if resume_data:
+            if _cache is not None:
+                _cache.put_many(version, [resume_data])
+            logger.debug("Firestore: Fetched resume with ID: %s", resume_id)
         else:
-            print(f"Firestore: Resume with ID {resume_id} not found.")
-            return None
+            logger.info("Firestore: Resume with ID %s not found.", resume_id)
+        return resume_data
     except Exception as e:
-        print(f"Firestore Error: Failed to fetch resume by ID {resume_id}: {e}")
+        logger.error("Firestore: Failed to fetch resume by ID %s: %s", resume_id, e)
         return None
 
+def get_resumes_by_ids(resume_ids):
+    """
+    Fetches many resumes in a single round-trip (only those not in the read cache).
+    Args:
+        resume_ids (list): Resume document IDs.
+    Returns:
+        list: Resume dicts aligned with `resume_ids` (None where not found).
+    """
+    if _cache is None:
+        version, cached = None, {}
+    else:
+        version, cached = _cache.get_many(resume_ids)
+    missing = [resume_id for resume_id in dict.fromkeys(resume_ids) if resume_id not in cached]
+    try:
+        if missing:
+            with metrics.span('firestore_get_many'):
+                fetched = run(get_repository().get_many(missing))
+            fetched = [resume for resume in fetched if resume is not None]
+            if _cache is not None:
+                _cache.put_many(version, fetched)
+            cached.update((resume['id'], resume) for resume in fetched)
+        return [cached.get(resume_id) for resume_id in resume_ids]
+    except Exception as e:
+        logger.error("Firestore: Failed to fetch %d resumes: %s", len(resume_ids), e)
+        return [None] * len(resume_ids)
+
 def delete_resume_data(resume_id):
     """
     Deletes a resume document from Firestore by its ID.
@@ -136,11 +497,29 @@ def delete_resume_data(resume_id):
         resume_id (str): The ID of the resume document to delete.
     """
     try:
-        db.collection('resumes').document(resume_id).delete()
-        print(f"Firestore: Resume with ID {resume_id} deleted successfully.")
+        with metrics.span('firestore_delete'):
+            run(get_repository().delete(resume_id))
+        logger.info("Firestore: Resume with ID %s deleted successfully.", resume_id)
+        _notify('delete', resume_id)
+    except Exception as e:
+        logger.error("Firestore: Failed to delete resume with ID %s: %s", resume_id, e)
+        raise
+
+def delete_many_resume_data(resume_ids):
+    """
+    Deletes many resume documents using batched writes.
+    Args:
+        resume_ids (list): Resume document IDs.
+    """
+    try:
+        with metrics.span('firestore_delete_many'):
+            run(get_repository().delete_many(resume_ids))
+        logger.info("Firestore: Deleted %d resumes.", len(resume_ids))
+        for resume_id in resume_ids:
+            _notify('delete', resume_id)
     except Exception as e:
-        print(f"Firestore Error: Failed to delete resume with ID {resume_id}: {e}")
+        logger.error("Firestore: Failed to delete %d resumes: %s", len(resume_ids), e)
         raise
 
-# No direct init_db() call here, as Firebase initialization happens on import
-# The `db` client is ready to be used by `app.py`
+# No direct init_db() call here: Firebase is initialized by the first database call
+# (or by app.warm_up()).
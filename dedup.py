@@ -0,0 +1,420 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import logging
+
+import numpy as np
+
+from models import Resume
+
+# --- Duplicate Candidate Detection ---
+# Finds stored resumes of the same candidate when a new one is submitted:
+#   * exact matches on the normalized email address or phone number
+#   * near-duplicates: MinHash signatures over the resume content (skills,
+#     titles, companies, descriptions, education) indexed with banded LSH,
+#     confirmed by the estimated Jaccard similarity (DEDUP_THRESHOLD)
+# The index lives in SQLite (DEDUP_INDEX_PATH), so it survives restarts and
+# is shared by every worker on the host. It is kept current by a database
+# change listener that app.py registers at startup; lookups read a handful of
+# indexed rows rather than the resumes collection. On first use an empty
+# index is backfilled once from the database; after writes that bypassed the
+# app (e.g. store_sync.py), run `python dedup.py --rebuild`.
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS # 4 rows per band: pairs above ~0.5 similarity usually share a bucket
+SHINGLE_SIZE = 3
+# Resume fields the keys and signature are computed from
+KEY_FIELDS = {'email', 'phone', 'skills', 'education', 'work_experience'}
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1) # Fixed seed: signatures are persisted and must stay comparable
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r'[a-z0-9][a-z0-9+#.]*')
+_DIGITS_RE = re.compile(r'\D+')
+
+DEDUP_MODES = ('off', 'flag', 'merge')
+
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    return email if '@' in email else ''
+
+
+def normalize_phone(phone):
+    """
+    Keeps the last 10 digits, so '+91 98765-43210' and '09876543210' match.
+    """
+    digits = _DIGITS_RE.sub('', phone or '')
+    return digits[-10:] if len(digits) >= 7 else ''
+
+
+def shingles(resume):
+    """
+    The set of features a resume's signature is built from: each skill, plus
+    word 3-grams of its work experience and education text.
+    """
+    features = {'skill:' + skill.lower() for skill in resume.skills}
+    parts = [f"{exp.title} {exp.company} {exp.description}" for exp in resume.work_experience]
+    parts += [f"{edu.degree} {edu.institution}" for edu in resume.education]
+    words = _WORD_RE.findall(' '.join(parts).lower())
+    if len(words) < SHINGLE_SIZE:
+        features.update(words)
+    else:
+        features.update(' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+    return features
+
+
+def minhash(features):
+    """
+    MinHash signature (NUM_PERM uint32 values) of a feature set, or None if it is empty.
+    """
+    if not features:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode('utf-8'), digest_size=4).digest(), 'little') for f in features),
+        dtype=np.uint64, count=len(features)
+    )
+    # (a * x + b) mod p over every feature and permutation at once; uint64 wrap-around is part of the hash
+    with np.errstate(over='ignore'):
+        permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    """
+    One LSH bucket key (signed 64-bit) per band of the signature.
+    """
+    return [int.from_bytes(hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                           'little', signed=True)
+            for band in range(BANDS)]
+
+
+def similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity of two signatures.
+    """
+    return float(np.count_nonzero(signature_a == signature_b)) / NUM_PERM
+
+
+def merge_resumes(existing, new, original_filename=None):
+    """
+    Merges a new submission into a stored resume of the same candidate. The
+    newer non-empty contact fields win; skills and entries are combined
+    (existing first) without duplicates. The stored original_filename is
+    kept, or `original_filename` (the new submission's) when it has none.
+    Returns:
+        dict: The merged resume fields plus 'original_filename'.
+    """
+    stored_filename = existing.get('original_filename') if isinstance(existing, dict) else None
+    existing, new = Resume.from_dict(existing), Resume.from_dict(new)
+    seen_skills = {skill.lower() for skill in existing.skills}
+
+    def combine(old_entries, new_entries):
+        combined = list(old_entries)
+        for entry in new_entries:
+            if entry not in combined:
+                combined.append(entry)
+        return combined
+
+    merged = Resume(
+        name=new.name or existing.name,
+        email=new.email or existing.email,
+        phone=new.phone or existing.phone,
+        skills=existing.skills + [skill for skill in new.skills if skill.lower() not in seen_skills],
+        education=combine(existing.education, new.education),
+        work_experience=combine(existing.work_experience, new.work_experience)
+    )
+    return dict(merged.to_dict(), original_filename=stored_filename or original_filename)
+
+
+class DedupIndex:
+    """
+    Persistent exact-key and MinHash LSH index of stored resumes.
+
+    Args:
+        path (str): SQLite file (':memory:' for a private in-memory index).
+        threshold (float): Minimum estimated similarity for a near-duplicate.
+    """
+
+    def __init__(self, path, threshold=0.8):
+        self.path = path
+        self.threshold = threshold
+        self.lookups = 0
+        self.matches = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS dedup_resumes ("
+            " id TEXT PRIMARY KEY, email TEXT, phone TEXT, signature BLOB);"
+            "CREATE INDEX IF NOT EXISTS dedup_resumes_email ON dedup_resumes (email) WHERE email != '';"
+            "CREATE INDEX IF NOT EXISTS dedup_resumes_phone ON dedup_resumes (phone) WHERE phone != '';"
+            "CREATE TABLE IF NOT EXISTS dedup_buckets ("
+            " band INTEGER, bucket INTEGER, id TEXT, PRIMARY KEY (band, bucket, id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS dedup_buckets_id ON dedup_buckets (id);"
+            "CREATE TABLE IF NOT EXISTS dedup_meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    def _keys(self, data):
+        resume = Resume.from_dict(data)
+        return normalize_email(resume.email), normalize_phone(resume.phone), minhash(shingles(resume))
+
+    def _write(self, resume_id, data):
+        email, phone, signature = self._keys(data)
+        self._conn.execute("DELETE FROM dedup_buckets WHERE id = ?", (resume_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO dedup_resumes (id, email, phone, signature) VALUES (?, ?, ?, ?)",
+            (resume_id, email, phone, signature.tobytes() if signature is not None else None)
+        )
+        if signature is not None:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO dedup_buckets (band, bucket, id) VALUES (?, ?, ?)",
+                [(band, key, resume_id) for band, key in enumerate(band_keys(signature))]
+            )
+
+    def add(self, resume_id, data):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._write(resume_id, data)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, resume_id):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM dedup_buckets WHERE id = ?", (resume_id,))
+                self._conn.execute("DELETE FROM dedup_resumes WHERE id = ?", (resume_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, items):
+        """
+        Replaces the whole index with (resume_id, data) pairs and marks it
+        built, in one transaction.
+        Returns:
+            int: The number of resumes indexed.
+        """
+        count = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM dedup_buckets")
+                self._conn.execute("DELETE FROM dedup_resumes")
+                for resume_id, data in items:
+                    self._write(resume_id, data)
+                    count += 1
+                self._conn.execute("INSERT OR REPLACE INTO dedup_meta (key, value) VALUES ('built', ?)", (str(time.time()),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def find(self, data, limit=5, exclude=None):
+        """
+        Finds stored resumes that are likely the same candidate as `data`.
+        Returns:
+            list: Up to `limit` dicts with 'id', 'reason' ('email', 'phone' or
+            'similar') and 'similarity' (estimated, None without a signature);
+            exact matches first, then by similarity.
+        """
+        email, phone, signature = self._keys(data)
+        matches = {}
+        with self._lock:
+            self.lookups += 1
+            for reason, value in (('email', email), ('phone', phone)):
+                if value:
+                    for resume_id, stored in self._conn.execute(
+                            f"SELECT id, signature FROM dedup_resumes WHERE {reason} = ?", (value,)):
+                        matches.setdefault(resume_id, (reason, stored))
+            if signature is not None:
+                keys = band_keys(signature)
+                placeholders = ', '.join('(?, ?)' for _ in keys)
+                params = [value for band, key in enumerate(keys) for value in (band, key)]
+                rows = self._conn.execute(
+                    "SELECT r.id, r.signature FROM dedup_resumes r WHERE r.id IN ("
+                    f" SELECT id FROM dedup_buckets WHERE (band, bucket) IN (VALUES {placeholders}))",
+                    params
+                ).fetchall()
+                for resume_id, stored in rows:
+                    matches.setdefault(resume_id, ('similar', stored))
+
+        results = []
+        for resume_id, (reason, stored) in matches.items():
+            if resume_id == exclude:
+                continue
+            score = None
+            if signature is not None and stored is not None:
+                score = similarity(signature, np.frombuffer(stored, dtype=np.uint32))
+            if reason == 'similar' and score < self.threshold:
+                continue # Shared a bucket but not similar enough
+            results.append({'id': resume_id, 'reason': reason, 'similarity': round(score, 3) if score is not None else None})
+        results.sort(key=lambda match: (match['reason'] == 'similar', -(match['similarity'] or 0)))
+        if results:
+            with self._lock:
+                self.matches += 1
+        return results[:limit]
+
+    def on_change(self, event, resume_id, data):
+        """
+        Change listener for database.add_change_listener.
+        """
+        if event == 'insert':
+            self.add(resume_id, data)
+        elif event == 'update':
+            if KEY_FIELDS.intersection(data['changed']):
+                self.add(resume_id, data['document'])
+        elif event == 'delete':
+            self.remove(resume_id)
+
+    def is_built(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM dedup_meta WHERE key = 'built'").fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dedup_resumes").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'resumes': self._conn.execute("SELECT COUNT(*) FROM dedup_resumes").fetchone()[0],
+                'lookups': self.lookups,
+                'lookups_with_matches': self.matches,
+                'threshold': self.threshold,
+                'bands': BANDS,
+                'rows_per_band': ROWS
+            }
+
+
+# --- Shared Index ---
+DEDUP_MODE = os.environ.get('DEDUP_MODE', 'flag').lower()
+
+_index = None # published once backfilled
+_opened = None
+_index_lock = threading.Lock()
+_pending = None # change events received while a rebuild is in progress
+_events_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _rebuild(index, resumes=None):
+    global _pending
+    import database
+    with _rebuild_lock:
+        with _events_lock:
+            _pending = []
+        try:
+            start = time.perf_counter()
+            if resumes is None:
+                # Read through the repository so a failed scan is not mistaken for an empty collection
+                resumes = database.run(database.get_repository().list_all())
+            count = index.rebuild((resume['id'], resume) for resume in resumes)
+            logger.info("Dedup index rebuilt from %d resumes in %.2fs", count, time.perf_counter() - start)
+            return count
+        finally:
+            with _events_lock:
+                # Writes that raced with the scan (deletes included) are applied on top
+                for event, resume_id, data in _pending:
+                    index.on_change(event, resume_id, data)
+                _pending = None
+
+
+def get_index(backfill=True):
+    """
+    Returns the shared DedupIndex, or None when DEDUP_MODE is 'off'. The first
+    call in a process opens it and, if the persisted index has never been
+    filled (and `backfill` is set), backfills it from the database. The index
+    is only published once that has succeeded; until then every call retries
+    the backfill and gets the unpublished index.
+    """
+    global _index, _opened
+    if _index is not None or DEDUP_MODE == 'off':
+        return _index
+    with _index_lock:
+        if _index is not None:
+            return _index
+        if _opened is None:
+            _opened = DedupIndex(os.environ.get('DEDUP_INDEX_PATH', os.path.join('cache', 'dedup.sqlite3')),
+                                 threshold=float(os.environ.get('DEDUP_THRESHOLD', 0.8)))
+        if backfill and not _opened.is_built():
+            try:
+                _rebuild(_opened)
+            except Exception as e:
+                logger.error("Dedup index backfill failed: %s", e)
+                return _opened
+        _index = _opened
+        return _index
+
+
+def rebuild(resumes=None):
+    """
+    Re-indexes every resume from the database (or from `resumes`), e.g. after
+    a bulk import that bypassed this app. Writes made by other processes while
+    the collection is read are not indexed; run it when writes are quiet.
+    Returns:
+        int: The number of resumes indexed (0 when DEDUP_MODE is 'off').
+    """
+    index = get_index(backfill=False)
+    return _rebuild(index, resumes) if index is not None else 0
+
+
+def on_change(event, resume_id, data):
+    """
+    Change listener for database.add_change_listener.
+    """
+    index = get_index()
+    if index is None:
+        return
+    with _events_lock:
+        if _pending is not None:
+            _pending.append((event, resume_id, data))
+            return
+    index.on_change(event, resume_id, data)
+
+
+def stats():
+    index = _index
+    return index.stats() if index is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the duplicate-detection index from the resumes collection.")
+    parser.add_argument('--rebuild', action='store_true', help="Re-index every resume from the database")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(levelname)s %(name)s: %(message)s')
+
+    if DEDUP_MODE == 'off':
+        print("DEDUP_MODE is off; nothing to do.", file=sys.stderr)
+        return 0
+    if args.rebuild:
+        print(f"Indexed {rebuild()} resumes.", file=sys.stderr)
+    json.dump(get_index().stats(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
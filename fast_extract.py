@@ -0,0 +1,385 @@
+import os
+import re
+import threading
+from collections import deque
+
+# --- Rule-Based Pre-Extraction ---
+# Pulls the well-structured fields (email, phone, name, skills) out of the
+# resume text with regexes and a dictionary matcher before the LLM is called.
+# Fields found with enough confidence are not requested from the model, and
+# the prompt only carries the resume sections the model still needs.
+
+# Bump when the extraction or confidence rules change, so cached parses are redone
+VERSION = '2'
+
+FIELDS = ['name', 'email', 'phone', 'skills', 'education', 'work_experience']
+
+EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}')
+PHONE_RE = re.compile(r'(?<![\w+])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,5}\)[\s.-]?)?\d(?:[\s.-]?\d){6,13}(?!\w)')
+YEAR_RE = re.compile(r'(?:19|20)\d\d')
+NAME_RE = re.compile(r"^[A-Z][A-Za-z'.-]*(?:\s+[A-Z][A-Za-z'.-]*){1,3}$")
+_SKILL_SPLIT_RE = re.compile(r'[,;|\u2022\u00b7\u25aa\u25cf]')
+
+# Canonical section name -> heading variants (matched against whole, short lines)
+SECTION_HEADINGS = {
+    'summary': ['summary', 'profile', 'professional summary', 'objective', 'career objective', 'about me'],
+    'education': ['education', 'academic background', 'academic qualifications', 'educational qualifications',
+                  'qualifications', 'academics', 'education and training'],
+    'experience': ['experience', 'work experience', 'professional experience', 'employment history',
+                   'work history', 'employment', 'internships', 'internship', 'experience and internships'],
+    'skills': ['skills', 'technical skills', 'key skills', 'core competencies', 'skills and tools',
+               'technologies', 'tech stack', 'areas of expertise'],
+    'projects': ['projects', 'academic projects', 'personal projects', 'key projects'],
+    'certifications': ['certifications', 'certificates', 'courses', 'licenses and certifications'],
+    'achievements': ['achievements', 'awards', 'honors', 'accomplishments', 'extracurricular activities'],
+    'other': ['languages', 'interests', 'hobbies', 'references', 'declaration', 'personal details'],
+}
+_HEADING_LOOKUP = {variant: section for section, variants in SECTION_HEADINGS.items() for variant in variants}
+_HEADING_CLEAN_RE = re.compile(r'[^a-z& ]+')
+
+# Sections the model needs to see for each field it is asked to extract
+FIELD_SECTIONS = {
+    'name': ['header'],
+    'email': ['header'],
+    'phone': ['header'],
+    'skills': ['skills'],
+    'education': ['education'],
+    'work_experience': ['experience'],
+}
+
+DEFAULT_SKILLS = [
+    'Python', 'Java', 'JavaScript', 'TypeScript', 'C++', 'C#', 'Go', 'Golang', 'Rust', 'Ruby', 'PHP', 'Kotlin',
+    'Swift', 'Scala', 'MATLAB', 'Perl', 'Dart', 'Bash', 'Shell Scripting', 'PowerShell', 'SQL', 'NoSQL',
+    'HTML', 'HTML5', 'CSS', 'CSS3', 'Sass', 'Tailwind CSS', 'Bootstrap', 'React', 'React.js', 'React Native',
+    'Angular', 'Vue.js', 'Next.js', 'Node.js', 'Express.js', 'jQuery', 'Redux', 'GraphQL', 'REST', 'REST APIs',
+    'Django', 'Flask', 'FastAPI', 'Spring', 'Spring Boot', 'Hibernate', '.NET', 'ASP.NET', 'Laravel',
+    'Ruby on Rails', 'Flutter', 'Android', 'iOS', 'MySQL', 'PostgreSQL', 'SQLite', 'MongoDB', 'Redis',
+    'Oracle', 'SQL Server', 'Cassandra', 'DynamoDB', 'Elasticsearch', 'Firebase', 'Firestore', 'AWS', 'Azure',
+    'GCP', 'Google Cloud', 'Docker', 'Kubernetes', 'Terraform', 'Ansible', 'Jenkins', 'CI/CD', 'Git', 'GitHub',
+    'GitLab', 'Linux', 'Unix', 'Nginx', 'Kafka', 'RabbitMQ', 'Spark', 'Apache Spark', 'Hadoop', 'Airflow',
+    'Pandas', 'NumPy', 'SciPy', 'scikit-learn', 'TensorFlow', 'PyTorch', 'Keras', 'OpenCV', 'NLTK', 'spaCy',
+    'LangChain', 'Machine Learning', 'Deep Learning', 'Natural Language Processing', 'NLP', 'Computer Vision',
+    'Data Analysis', 'Data Science', 'Data Visualization', 'Statistics', 'Power BI', 'Tableau', 'Excel',
+    'MS Excel', 'MS Office', 'Microsoft Office', 'Jira', 'Confluence', 'Agile', 'Scrum', 'Figma',
+    'Adobe Photoshop', 'Photoshop', 'Illustrator', 'AutoCAD', 'SolidWorks', 'Selenium', 'JUnit', 'PyTest',
+    'Postman', 'Microservices', 'System Design', 'Object-Oriented Programming', 'OOP', 'Data Structures',
+    'Algorithms', 'Networking', 'Cyber Security', 'Cloud Computing', 'DevOps', 'Blockchain', 'Solidity',
+    'Unity', 'Arduino', 'Embedded C', 'VHDL', 'Verilog', 'SAP', 'Salesforce', 'Communication', 'Leadership',
+    'Teamwork', 'Problem Solving', 'Time Management', 'Project Management',
+]
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick automaton over a skills dictionary. Finds every dictionary
+    skill in a text in a single pass, independent of the dictionary size.
+    Matching is case-insensitive and respects word boundaries, so "Java" does
+    not match inside "JavaScript".
+    """
+
+    def __init__(self, skills):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]] # state -> list of (length, canonical skill)
+        self.canonical = {}
+        for skill in skills:
+            key = skill.lower()
+            if len(key) < 2 or key in self.canonical:
+                continue
+            self.canonical[key] = skill
+            self._add(key, skill)
+        self._build_failure_links()
+
+    def _add(self, key, skill):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(key), skill))
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        Returns the dictionary skills found in `text`, in order of first occurrence.
+        """
+        lowered = text.lower()
+        matches = []
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for end, char in enumerate(lowered, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, skill in output[state]:
+                start = end - length
+                if (start == 0 or not lowered[start - 1].isalnum()) and \
+                   (end == len(lowered) or not lowered[end].isalnum()):
+                    matches.append((start, -length, skill))
+
+        # Keep the longest match at each position ("React.js" rather than "React" inside it)
+        found = []
+        covered_until = 0
+        for start, negative_length, skill in sorted(matches):
+            if start < covered_until:
+                continue
+            covered_until = start - negative_length
+            if skill not in found:
+                found.append(skill)
+        return found
+
+
+def _load_skills():
+    path = os.environ.get('SKILLS_DICTIONARY_PATH')
+    if not path:
+        return DEFAULT_SKILLS
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+skill_matcher = SkillMatcher(_load_skills())
+
+MIN_CONFIDENCE = float(os.environ.get('FAST_PATH_MIN_CONFIDENCE', 0.8))
+
+_stats_lock = threading.Lock()
+_stats = {'documents': 0, 'llm_skipped': 0, 'prompt_chars_in': 0, 'prompt_chars_sent': 0}
+_field_hits = {field: 0 for field in FIELDS}
+
+
+def segment_sections(text):
+    """
+    Splits resume text into sections on recognised headings.
+    Returns:
+        dict: canonical section name -> section text, in document order. Text
+        before the first heading is returned under 'header'.
+    """
+    sections = {'header': []}
+    current = 'header'
+    for line in text.splitlines():
+        stripped = line.strip()
+        if 0 < len(stripped) <= 40:
+            heading = _HEADING_CLEAN_RE.sub('', stripped.lower().replace('&', 'and')).strip()
+            section = _HEADING_LOOKUP.get(' '.join(heading.split()))
+            if section:
+                current = section
+                sections.setdefault(current, [])
+                continue
+        sections.setdefault(current, []).append(line)
+    return {name: '\n'.join(lines).strip() for name, lines in sections.items()}
+
+
+def _find_phone(text):
+    for match in PHONE_RE.finditer(text):
+        candidate = match.group().strip()
+        digits = re.sub(r'\D', '', candidate)
+        groups = re.findall(r'\d+', candidate)
+        # Date ranges such as "2019 - 2023" are digit runs too
+        if all(YEAR_RE.fullmatch(group) for group in groups):
+            continue
+        if 10 <= len(digits) <= 15:
+            return candidate
+    return None
+
+
+def _find_name(header):
+    for line in header.splitlines()[:5]:
+        line = line.strip()
+        if not line or EMAIL_RE.search(line) or any(ch.isdigit() for ch in line):
+            continue
+        if NAME_RE.match(line) and line.lower() not in ('curriculum vitae', 'resume'):
+            # Often the name, but job titles ("Data Scientist") and places look the same
+            return line.title() if line.isupper() else line
+        return None
+    return None
+
+
+def _name_matches_email(name, email):
+    """
+    Whether the email's local part is spelled from the name ("jane.doe",
+    "janedoe", "jdoe", "doej", "jane" for Jane Doe), which confirms the
+    header-line guess.
+    """
+    local = re.sub(r'[^a-z]', '', email.split('@')[0].lower())
+    parts = [re.sub(r'[^a-z]', '', part) for part in name.lower().split()]
+    first, last = parts[0], parts[-1]
+    if not first or not last:
+        return False
+    return local in {first + last, last + first, first[0] + last, first + last[0], last + first[0], first, last}
+
+
+def _skill_tokens(section):
+    """
+    The items listed in a skills section: lines split on commas, semicolons,
+    pipes and bullets, without "Languages:"-style labels.
+    """
+    tokens = []
+    for line in section.splitlines():
+        line = line.split(':', 1)[1] if ':' in line else line
+        for token in _SKILL_SPLIT_RE.split(line):
+            token = token.strip(' \t-*').rstrip('.')
+            if token:
+                tokens.append(token)
+    return tokens
+
+
+class PreExtraction:
+    """
+    Result of the rule-based stage.
+    Attributes:
+        data (dict): Extracted field values.
+        confidence (dict): Per-field confidence in [0, 1] for `data`.
+        sections (dict): Segmented resume sections.
+    """
+
+    def __init__(self, text, data, confidence, sections):
+        self.text = text
+        self.data = data
+        self.confidence = confidence
+        self.sections = sections
+
+    def confident_fields(self, min_confidence=None):
+        threshold = MIN_CONFIDENCE if min_confidence is None else min_confidence
+        return [field for field, score in self.confidence.items() if score >= threshold]
+
+    def missing_fields(self, min_confidence=None):
+        confident = set(self.confident_fields(min_confidence))
+        return [field for field in FIELDS if field not in confident]
+
+    def text_for(self, fields):
+        """
+        Returns only the resume sections the model needs for `fields`, or the
+        full text if any of them could not be located.
+        """
+        wanted = []
+        for field in fields:
+            for section in FIELD_SECTIONS[field]:
+                if not self.sections.get(section):
+                    return self.text
+                if section not in wanted:
+                    wanted.append(section)
+        parts = []
+        for section in self.sections: # keep document order
+            if section in wanted:
+                parts.append(self.sections[section] if section == 'header'
+                             else f"{section.title()}\n{self.sections[section]}")
+        return '\n\n'.join(parts)
+
+
+def pre_extract(text):
+    """
+    Runs the rule-based extractors over resume text.
+    Returns:
+        PreExtraction: Field values with per-field confidence.
+    """
+    sections = segment_sections(text)
+    header = sections.get('header', '')
+    data = {}
+    confidence = {}
+
+    emails = EMAIL_RE.findall(text)
+    if emails:
+        data['email'] = emails[0]
+        confidence['email'] = 0.99 if len(set(e.lower() for e in emails)) == 1 else 0.9
+
+    phone = _find_phone(header) or _find_phone(text)
+    if phone:
+        data['phone'] = phone
+        confidence['phone'] = 0.95 if phone in header else 0.85
+
+    name = _find_name(header)
+    if name:
+        data['name'] = name
+        # The top line alone is only a fallback for the model; an email spelled
+        # from it confirms it
+        confidence['name'] = 0.9 if emails and _name_matches_email(name, emails[0]) else 0.6
+
+    skills_section = sections.get('skills')
+    skills = skill_matcher.find(skills_section or text)
+    if skills:
+        data['skills'] = skills
+        # The dictionary can't tell whether a list is complete: only a skills
+        # section in which every listed item is a dictionary skill is reliable.
+        # Otherwise the hits are merged into the model's list.
+        tokens = _skill_tokens(skills_section) if skills_section else []
+        complete = len(tokens) >= 3 and all(token.lower() in skill_matcher.canonical for token in tokens)
+        confidence['skills'] = 0.9 if complete else 0.5
+
+    result = PreExtraction(text, data, confidence, sections)
+    with _stats_lock:
+        _stats['documents'] += 1
+        for field in result.confident_fields():
+            _field_hits[field] += 1
+    return result
+
+
+def merge(pre, llm_data):
+    """
+    Merges model output into the rule-based result. Confident rule-based
+    fields win; for the rest the model's non-empty value is used, falling
+    back to the rule-based guess. Skills found in a skills section are
+    added to the model's list when it missed them.
+    Returns:
+        dict: The merged resume data, with per-field confidence under
+        'field_confidence' (None for values supplied by the model).
+    """
+    llm_data = llm_data if isinstance(llm_data, dict) else {}
+    confident = set(pre.confident_fields())
+    merged = {}
+    field_confidence = {}
+    for field in FIELDS:
+        if field in confident:
+            merged[field] = pre.data[field]
+            field_confidence[field] = pre.confidence[field]
+        elif llm_data.get(field):
+            merged[field] = llm_data[field]
+            field_confidence[field] = None
+            if field == 'skills' and pre.sections.get('skills') and pre.data.get('skills') \
+                    and isinstance(llm_data[field], list):
+                listed = {str(skill).strip().lower() for skill in llm_data[field]}
+                merged[field] = list(llm_data[field]) + [skill for skill in pre.data['skills'] if skill.lower() not in listed]
+        elif field in pre.data:
+            merged[field] = pre.data[field]
+            field_confidence[field] = pre.confidence[field]
+        else:
+            merged[field] = [] if field in ('skills', 'education', 'work_experience') else ''
+            field_confidence[field] = None
+    merged['field_confidence'] = field_confidence
+    return merged
+
+
+def record_prompt(original_text, sent_text):
+    """
+    Records how much text was sent to the model (empty string if the call was skipped).
+    """
+    with _stats_lock:
+        _stats['prompt_chars_in'] += len(original_text)
+        _stats['prompt_chars_sent'] += len(sent_text)
+        if not sent_text:
+            _stats['llm_skipped'] += 1
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+        result['confident_fields'] = dict(_field_hits)
+    if result['prompt_chars_in']:
+        result['prompt_reduction'] = round(1 - result['prompt_chars_sent'] / result['prompt_chars_in'], 4)
+    return result
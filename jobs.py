@@ -0,0 +1,355 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# --- Background Parse Jobs ---
+# Uploads are queued and handled by a pool of worker threads so the HTTP
+# worker returns immediately with a job id. Clients poll /jobs/<id> or
+# subscribe to /jobs/<id>/events (Server-Sent Events) for the result.
+#
+# Job lifecycle: queued -> running -> (retrying -> running)* -> done | failed
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+RETRYING = 'retrying'
+DONE = 'done'
+FAILED = 'failed'
+TERMINAL_STATES = {DONE, FAILED}
+
+DEFAULT_RESULT_TTL = 60 * 60 # Finished jobs are kept for an hour
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity (backpressure)."""
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures that retrying cannot fix."""
+
+
+class MemoryJobStore:
+    """
+    In-process job store. Jobs are only visible to the process that created them.
+    """
+
+    def __init__(self, result_ttl=DEFAULT_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def create(self, job):
+        with self._changed:
+            self._purge()
+            self._jobs[job['id']] = dict(job)
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['version'] += 1
+            job['updated_at'] = time.time()
+            self._changed.notify_all()
+
+    def wait_for_change(self, job_id, version, timeout):
+        """
+        Blocks until the job's version differs from `version` or `timeout` passes.
+        Returns:
+            dict: The current job, or None if it no longer exists.
+        """
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['version'] != version:
+                    return dict(job) if job else None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return dict(job)
+                self._changed.wait(remaining)
+
+    def _purge(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in TERMINAL_STATES and job['updated_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    SQLite-backed job store. Job status and results are visible to every
+    process on the host, so a job created by one gunicorn worker can be polled
+    through any other.
+    """
+
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, path, result_ttl=DEFAULT_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def create(self, job):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - self.result_ttl)
+            )
+            self._conn.execute(
+                "INSERT INTO jobs (id, data, status, updated_at) VALUES (?, ?, ?, ?)",
+                (job['id'], json.dumps(job), job['status'], job['updated_at'])
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return
+                job = json.loads(row[0])
+                job.update(fields)
+                job['version'] += 1
+                job['updated_at'] = time.time()
+                self._conn.execute(
+                    "UPDATE jobs SET data = ?, status = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(job), job['status'], job['updated_at'], job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def wait_for_change(self, job_id, version, timeout):
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['version'] != version or time.time() >= deadline:
+                return job
+            time.sleep(self.POLL_INTERVAL)
+
+
+class JobQueue:
+    """
+    Bounded queue of parse jobs served by a pool of background worker threads.
+
+    Args:
+        handler (callable): handler(filename, data) -> dict result. Raise
+            PermanentJobError for failures that should not be retried.
+        store: MemoryJobStore or SQLiteJobStore.
+        workers (int): Number of worker threads.
+        max_queued (int): Jobs allowed to wait before submit() rejects new ones.
+        timeout (float): Seconds a single attempt may run before it is abandoned.
+            A timed-out job fails without retrying.
+        max_retries (int): Extra attempts after a failed attempt.
+        backoff (float): Base delay in seconds for exponential retry backoff.
+    """
+
+    def __init__(self, handler, store, workers=4, max_queued=100, timeout=120, max_retries=2, backoff=1.0):
+        self.handler = handler
+        self.store = store
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=max_queued)
+        # Attempts run here so a worker can stop waiting on a hung attempt.
+        # Abandoned attempts keep their thread until they return, so the
+        # runner pool is larger than the worker pool. Once abandoned attempts
+        # hold all the spare threads, new attempts would wait behind them and
+        # time out too, so submit() rejects work until some of them return.
+        self._runner = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix='job-attempt')
+        self._max_abandoned = workers
+        self._abandoned = set()
+        self._counters = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'retries': 0, 'timeouts': 0}
+        self._counters_lock = threading.Lock()
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, filename, data):
+        """
+        Queues a parse job.
+        Returns:
+            str: The new job id.
+        Raises:
+            QueueFullError: If the queue is at capacity, or too many timed-out
+                attempts are still holding runner threads.
+        """
+        with self._counters_lock:
+            stalled = len(self._abandoned) >= self._max_abandoned
+        if stalled:
+            self._count('rejected')
+            raise QueueFullError("Parse workers are stalled on timed-out jobs, try again later.")
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'filename': filename,
+            'status': QUEUED,
+            'attempts': 0,
+            'result': None,
+            'error': None,
+            'version': 0,
+            'created_at': now,
+            'updated_at': now
+        }
+        self.store.create(job)
+        try:
+            self._queue.put_nowait((job['id'], filename, data))
+        except queue.Full:
+            self.store.update(job['id'], status=FAILED, error='Job queue is full.')
+            self._count('rejected')
+            raise QueueFullError("Job queue is full, try again later.")
+        self._count('submitted')
+        return job['id']
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def events(self, job_id, heartbeat=15):
+        """
+        Yields the job each time it changes until it reaches a terminal state.
+        Yields None every `heartbeat` seconds without a change, so callers can
+        keep idle connections alive.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        yield job
+        while job['status'] not in TERMINAL_STATES:
+            changed = self.store.wait_for_change(job_id, job['version'], heartbeat)
+            if changed is None:
+                return
+            if changed['version'] == job['version']:
+                yield None
+            else:
+                job = changed
+                yield job
+
+    def stats(self):
+        with self._counters_lock:
+            stats = dict(self._counters)
+            stats['abandoned'] = len(self._abandoned)
+        stats['queued'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        stats['workers'] = len(self._workers)
+        return stats
+
+    def _count(self, name):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def _abandon(self, future):
+        """Tracks a timed-out attempt until its thread returns."""
+        with self._counters_lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._reclaim)
+
+    def _reclaim(self, future):
+        with self._counters_lock:
+            self._abandoned.discard(future)
+
+    def _work(self):
+        while True:
+            job_id, filename, data = self._queue.get()
+            try:
+                self._run(job_id, filename, data)
+            except Exception as e:
+                logger.exception("Job: Worker failed on job %s: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id, filename, data):
+        for attempt in range(1, self.max_retries + 2):
+            self.store.update(job_id, status=RUNNING, attempts=attempt)
+            future = self._runner.submit(self.handler, filename, data)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # The attempt keeps its runner thread; retrying would only tie
+                # up another one with the same input.
+                self._abandon(future)
+                self._count('timeouts')
+                self.store.update(job_id, status=FAILED, error=f'Timed out after {self.timeout} seconds.')
+                self._count('failed')
+                return
+            except PermanentJobError as e:
+                self.store.update(job_id, status=FAILED, error=str(e))
+                self._count('failed')
+                return
+            except Exception as e:
+                error = f'Error processing file: {e}'
+            else:
+                self.store.update(job_id, status=DONE, result=result, error=None)
+                self._count('done')
+                return
+
+            if attempt > self.max_retries:
+                break
+            logger.warning("Job: Attempt %d of job %s failed (%s), retrying.", attempt, job_id, error)
+            self._count('retries')
+            self.store.update(job_id, status=RETRYING, error=error)
+            time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+        self.store.update(job_id, status=FAILED, error=error)
+        self._count('failed')
+
+
+def create_job_queue(handler):
+    """
+    Builds the job queue from environment configuration:
+        JOB_STORE_BACKEND   memory | sqlite (default: memory)
+        JOB_STORE_PATH      SQLite file path (default: cache/jobs.sqlite3)
+        JOB_WORKERS         Worker threads (default: 4)
+        JOB_QUEUE_MAX       Maximum waiting jobs before rejecting (default: 100)
+        JOB_TIMEOUT         Seconds per attempt (default: 120)
+        JOB_MAX_RETRIES     Retries after a failed attempt (default: 2)
+    """
+    backend_name = os.environ.get('JOB_STORE_BACKEND', 'memory').lower()
+    if backend_name == 'memory':
+        store = MemoryJobStore()
+    elif backend_name == 'sqlite':
+        store = SQLiteJobStore(os.environ.get('JOB_STORE_PATH', os.path.join('cache', 'jobs.sqlite3')))
+    else:
+        raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend_name}")
+    return JobQueue(
+        handler,
+        store,
+        workers=int(os.environ.get('JOB_WORKERS', 4)),
+        max_queued=int(os.environ.get('JOB_QUEUE_MAX', 100)),
+        timeout=float(os.environ.get('JOB_TIMEOUT', 120)),
+        max_retries=int(os.environ.get('JOB_MAX_RETRIES', 2))
+    )
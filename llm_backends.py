@@ -0,0 +1,476 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import deque
+
+import fast_extract
+import metrics
+
+# --- LLM Backends ---
+# Chat model backends behind one interface (invoke(prompt_value) -> message or
+# string, and optionally stream(prompt_value) -> chunks), a registry to build
+# them by name, and a router that tries them in tiers, cheapest first:
+#   gemini    Google Gemini via LangChain (remote; needs GOOGLE_API_KEY)
+#   llamacpp  a local GGUF model run on the CPU by llama-cpp-python (LLAMA_MODEL_PATH)
+#   stub      deterministic and offline: answers with what the rule-based
+#             extractor finds in the prompt (tests, demos, outages)
+# LLM_TIERS lists the tiers in order, e.g. "llamacpp,gemini" (default: gemini).
+# Easy inputs (at most LLM_EASY_MAX_CHARS characters of resume text) start on
+# the first tier, others on the second. A response moves up one tier when it
+# is not valid resume JSON, when the backend fails, or when it fills fewer
+# than LLM_MIN_CONFIDENCE of the requested fields; the top tier's answer is
+# accepted as is. Per-tier latency and escalations are on /stats and /metrics.
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+MODEL_TEMPERATURE = 0.3
+# Seconds before a single model request is abandoned (and retried by the guard)
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+
+LLAMA_MODEL_PATH = os.environ.get('LLAMA_MODEL_PATH')
+LLAMA_CONTEXT = int(os.environ.get('LLAMA_CONTEXT', 8192))
+LLAMA_THREADS = int(os.environ.get('LLAMA_THREADS', os.cpu_count() or 1))
+LLAMA_MAX_TOKENS = int(os.environ.get('LLAMA_MAX_TOKENS', 2048))
+
+EASY_MAX_CHARS = int(os.environ.get('LLM_EASY_MAX_CHARS', 3000))
+MIN_CONFIDENCE = float(os.environ.get('LLM_MIN_CONFIDENCE', 0.5))
+LATENCY_WINDOW = 200
+
+# Delimits the resume text in resume_parser.PROMPT_TEMPLATE
+_PROMPT_DELIMITER = '-------------------'
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when a backend cannot run here (missing package, model file or key)."""
+
+
+def prompt_text(prompt_value):
+    return prompt_value.to_string() if hasattr(prompt_value, 'to_string') else str(prompt_value)
+
+
+class GeminiBackend:
+    """
+    Gemini through LangChain. The client is created on first use; retries
+    are left to the guard, not the client.
+    """
+    name = 'gemini'
+    guarded = True # Calls go through the shared concurrency limit, retries and hedging
+
+    def __init__(self, model=GEMINI_MODEL, temperature=MODEL_TEMPERATURE, timeout=LLM_TIMEOUT):
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from langchain_google_genai import ChatGoogleGenerativeAI
+                    self._client = ChatGoogleGenerativeAI(model=self.model, temperature=self.temperature,
+                                                          timeout=self.timeout, max_retries=0)
+        return self._client
+
+    def warm_up(self):
+        return self.client
+
+    def invoke(self, prompt_value):
+        return self.client.invoke(prompt_value)
+
+    def stream(self, prompt_value):
+        return self.client.stream(prompt_value)
+
+    def describe(self):
+        return f'gemini:{self.model}:{self.temperature}'
+
+
+class LlamaCppBackend:
+    """
+    A local GGUF model (e.g. a small instruction-tuned Qwen or Llama) run on
+    the CPU with llama-cpp-python, constrained to JSON output. One model is
+    loaded per process and runs one completion at a time.
+    """
+    name = 'llamacpp'
+    guarded = False
+
+    def __init__(self, model_path=LLAMA_MODEL_PATH, context=LLAMA_CONTEXT, threads=LLAMA_THREADS,
+                 max_tokens=LLAMA_MAX_TOKENS, temperature=MODEL_TEMPERATURE):
+        self.model_path = model_path
+        self.context = context
+        self.threads = threads
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from llama_cpp import Llama
+            except ImportError:
+                raise BackendUnavailable("llama-cpp-python is not installed")
+            if not self.model_path or not os.path.exists(self.model_path):
+                raise BackendUnavailable(f"LLAMA_MODEL_PATH does not point to a model file: {self.model_path!r}")
+            logger.info("Loading local model %s (%d threads).", self.model_path, self.threads)
+            self._model = Llama(model_path=self.model_path, n_ctx=self.context, n_threads=self.threads, verbose=False)
+        return self._model
+
+    def warm_up(self):
+        with self._lock:
+            return self._load()
+
+    def invoke(self, prompt_value):
+        from langchain_core.messages import AIMessage
+        with self._lock:
+            response = self._load().create_chat_completion(
+                messages=[{'role': 'user', 'content': prompt_text(prompt_value)}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={'type': 'json_object'}
+            )
+        usage = response.get('usage') or {}
+        input_tokens, output_tokens = usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+        return AIMessage(content=response['choices'][0]['message']['content'], usage_metadata={
+            'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens
+        })
+
+    def stream(self, prompt_value):
+        with self._lock:
+            chunks = self._load().create_chat_completion(
+                messages=[{'role': 'user', 'content': prompt_text(prompt_value)}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={'type': 'json_object'},
+                stream=True
+            )
+            for chunk in chunks:
+                piece = chunk['choices'][0]['delta'].get('content')
+                if piece:
+                    yield piece
+
+    def describe(self):
+        return f'llamacpp:{os.path.basename(self.model_path or "")}:{self.temperature}'
+
+
+class StubBackend:
+    """
+    Answers with the rule-based extraction of the resume text in the prompt
+    (name, email, phone, skills; never education or work experience).
+    Same prompt, same answer.
+    """
+    name = 'stub'
+    guarded = False
+
+    def invoke(self, prompt_value):
+        text = prompt_text(prompt_value)
+        parts = text.split(_PROMPT_DELIMITER)
+        if len(parts) >= 3:
+            text = parts[1]
+        pre = fast_extract.pre_extract(text.strip())
+        return json.dumps(dict(pre.data, education=[], work_experience=[]))
+
+    def describe(self):
+        return 'stub'
+
+
+class RunnableBackend:
+    """
+    Wraps any object with invoke(prompt_value), e.g. a LangChain chat model or
+    an offline stand-in (see resume_parser.set_llm).
+    """
+    guarded = True
+
+    def __init__(self, runnable, name='custom'):
+        self.runnable = runnable
+        self.name = name
+
+    def invoke(self, prompt_value):
+        return self.runnable.invoke(prompt_value)
+
+    def stream(self, prompt_value):
+        if hasattr(self.runnable, 'stream'):
+            return self.runnable.stream(prompt_value)
+        return iter([self.runnable.invoke(prompt_value)])
+
+    def describe(self):
+        return f'{self.name}:{type(self.runnable).__name__}'
+
+
+BACKENDS = {}
+
+
+def register_backend(name, factory):
+    """
+    Makes a backend available to LLM_TIERS under `name`.
+    Args:
+        factory: Callable returning the backend (an object with name, guarded,
+            invoke(prompt_value) and describe()).
+    """
+    BACKENDS[name] = factory
+
+
+def create_backend(name):
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend: {name} (available: {', '.join(sorted(BACKENDS))})")
+    return factory()
+
+
+register_backend('gemini', GeminiBackend)
+register_backend('llamacpp', LlamaCppBackend)
+register_backend('stub', StubBackend)
+
+
+def _count_usage(usage):
+    usage = usage or {}
+    metrics.count_tokens(usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+
+
+def _coverage(result, requested):
+    if not requested:
+        return 1.0
+    return sum(1 for field in requested if result.get(field)) / len(requested)
+
+
+class _TierStats:
+    __slots__ = ('calls', 'accepted', 'escalated', 'failures', 'durations')
+
+    def __init__(self):
+        self.calls = 0
+        self.accepted = 0
+        self.escalated = 0
+        self.failures = 0
+        self.durations = deque(maxlen=LATENCY_WINDOW)
+
+
+class TieredRouter:
+    """
+    Sends each model input to the cheapest suitable backend and escalates
+    to the next tier when the answer is unusable.
+
+    Args:
+        backends (list): Backends, cheapest first.
+        guard (llm_guard.LLMGuard, optional): Runs calls to guarded backends.
+        easy_max_chars (int): Inputs with at most this much resume text start on the first tier.
+        min_confidence (float): Share of the requested fields an answer below the top tier must fill.
+    """
+
+    def __init__(self, backends, guard=None, easy_max_chars=EASY_MAX_CHARS, min_confidence=MIN_CONFIDENCE):
+        if not backends:
+            raise ValueError("At least one LLM backend is required")
+        self.backends = list(backends)
+        self.guard = guard
+        self.easy_max_chars = easy_max_chars
+        self.min_confidence = min_confidence
+        self._unavailable = set()
+        self._stats = {backend.name: _TierStats() for backend in self.backends}
+        self._lock = threading.Lock()
+
+    def describe(self):
+        """
+        Tier configuration, for salting parse cache keys.
+        """
+        return [backend.describe() for backend in self.backends] + [self.easy_max_chars, self.min_confidence]
+
+    def _disable(self, backend, error):
+        with self._lock:
+            self._unavailable.add(backend.name)
+        logger.warning("LLM: Backend %s is unavailable (%s); skipping it from now on.", backend.name, error)
+
+    def warm_up(self):
+        """
+        Creates clients and loads local models ahead of the first request.
+        """
+        for backend in self.backends:
+            try:
+                if hasattr(backend, 'warm_up'):
+                    backend.warm_up()
+            except BackendUnavailable as e:
+                self._disable(backend, e)
+
+    def _call(self, backend, prompt_value):
+        def invoke(value):
+            with metrics.span('llm'):
+                return backend.invoke(value)
+        if backend.guarded and self.guard is not None:
+            return self.guard.call(invoke, prompt_value)
+        return invoke(prompt_value)
+
+    def _record(self, backend, outcome, elapsed=None, reason=None):
+        with self._lock:
+            tier = self._stats[backend.name]
+            tier.calls += 1
+            setattr(tier, outcome, getattr(tier, outcome) + 1)
+            if elapsed is not None:
+                tier.durations.append(elapsed)
+        if elapsed is not None:
+            metrics.LLM_TIER_SECONDS.observe(elapsed, tier=backend.name)
+        if outcome == 'escalated':
+            metrics.LLM_ESCALATIONS.inc(tier=backend.name, reason=reason)
+
+    def _tiers(self):
+        return [backend for backend in self.backends if backend.name not in self._unavailable] or self.backends
+
+    def _start(self, text, tiers):
+        return 0 if len(text) <= self.easy_max_chars else min(1, len(tiers) - 1)
+
+    def _escalate(self, backend, elapsed, reason, error=None):
+        logger.info("LLM: Escalating from %s (%s%s).", backend.name, reason, f": {error}" if error else "")
+        self._record(backend, 'escalated', elapsed, reason=reason)
+
+    def _settle(self, backend, last, started, answer, requested, parse):
+        """
+        Parses a tier's answer and decides whether to keep it.
+        Returns:
+            The parsed answer, or None to try the next tier.
+        Raises:
+            Exception: Why the top tier's answer is unusable.
+        """
+        try:
+            result = parse(answer)
+        except Exception as e:
+            if last:
+                self._record(backend, 'failures', time.perf_counter() - started)
+                raise
+            self._escalate(backend, time.perf_counter() - started, 'invalid' if isinstance(e, ValueError) else 'error', e)
+            return None
+        elapsed = time.perf_counter() - started
+        if not last and _coverage(result, requested) < self.min_confidence:
+            self._escalate(backend, elapsed, 'low_confidence')
+            return None
+        self._record(backend, 'accepted', elapsed)
+        return result
+
+    def run(self, prompt_value, text, requested, parse):
+        """
+        Gets a parsed answer for one model input.
+        Args:
+            prompt_value: The rendered prompt.
+            text (str): The resume text in the prompt (decides the starting tier).
+            requested (list): Fields the answer should fill; empty skips the confidence check.
+            parse (callable): Turns a model response into resume data; raises if it is invalid.
+        Returns:
+            The parsed answer of the first tier that gives a usable one.
+        Raises:
+            Exception: The top tier's error if no tier gave an answer.
+        """
+        tiers = self._tiers()
+        return self._run(tiers, self._start(text, tiers), prompt_value, requested, parse)
+
+    def _run(self, tiers, start, prompt_value, requested, parse):
+        for position in range(start, len(tiers)):
+            backend, last = tiers[position], position == len(tiers) - 1
+            started = time.perf_counter()
+            try:
+                message = self._call(backend, prompt_value)
+            except BackendUnavailable as e:
+                self._disable(backend, e)
+                self._record(backend, 'failures')
+                if last:
+                    raise
+                continue
+            except Exception as e:
+                if last:
+                    self._record(backend, 'failures', time.perf_counter() - started)
+                    raise
+                self._escalate(backend, time.perf_counter() - started, 'error', e)
+                continue
+            _count_usage(getattr(message, 'usage_metadata', None))
+            result = self._settle(backend, last, started, message, requested, parse)
+            if result is not None:
+                return result
+
+    def stream(self, prompt_value, text, requested, parse):
+        """
+        Like run(), but streams the starting tier's answer: yields
+        ('partial', dict) with the JSON received so far after each chunk, then
+        ('result', answer). A stream holds a concurrency slot but is not
+        retried or hedged; if it fails, the call is repeated through run()'s
+        path. Escalations and backends without stream() are not streamed.
+        """
+        from langchain_core.utils.json import parse_json_markdown
+        tiers = self._tiers()
+        position = self._start(text, tiers)
+        backend, last = tiers[position], position == len(tiers) - 1
+        if not hasattr(backend, 'stream'):
+            yield 'result', self._run(tiers, position, prompt_value, requested, parse)
+            return
+
+        held = backend.guarded and self.guard is not None
+        if held:
+            self.guard.limiter.acquire()
+        started = time.perf_counter()
+        content, usage, failed = '', {}, None
+        try:
+            with metrics.span('llm'):
+                for chunk in backend.stream(prompt_value):
+                    for key, amount in (getattr(chunk, 'usage_metadata', None) or {}).items():
+                        if isinstance(amount, int):
+                            usage[key] = usage.get(key, 0) + amount
+                    piece = getattr(chunk, 'content', chunk)
+                    if not piece or not isinstance(piece, str):
+                        continue
+                    content += piece
+                    try:
+                        partial = parse_json_markdown(content)
+                    except ValueError:
+                        continue # Not even a prefix of a JSON object yet
+                    if isinstance(partial, dict) and partial:
+                        yield 'partial', partial
+        except Exception as e:
+            failed = e
+        finally:
+            if held:
+                self.guard.limiter.release()
+
+        if isinstance(failed, BackendUnavailable):
+            self._disable(backend, failed)
+            self._record(backend, 'failures')
+            if last:
+                raise failed
+            yield 'result', self._run(tiers, position + 1, prompt_value, requested, parse)
+            return
+        if failed is not None:
+            logger.warning("LLM: Streaming from %s failed (%s); retrying without streaming.", backend.name, failed)
+            yield 'result', self._run(tiers, position, prompt_value, requested, parse)
+            return
+        _count_usage(usage)
+        result = self._settle(backend, last, started, content, requested, parse)
+        if result is None:
+            result = self._run(tiers, position + 1, prompt_value, requested, parse)
+        yield 'result', result
+
+    def stats(self):
+        result = {}
+        with self._lock:
+            for backend in self.backends:
+                tier = self._stats[backend.name]
+                ordered = sorted(tier.durations)
+                result[backend.name] = {
+                    'calls': tier.calls,
+                    'accepted': tier.accepted,
+                    'escalated': tier.escalated,
+                    'failures': tier.failures,
+                    'escalation_rate': round(tier.escalated / tier.calls, 4) if tier.calls else None,
+                    'mean_seconds': round(sum(ordered) / len(ordered), 3) if ordered else None,
+                    'p95_seconds': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3) if ordered else None,
+                    'available': backend.name not in self._unavailable
+                }
+        return result
+
+
+def create_router(guard=None):
+    """
+    Builds the router from LLM_TIERS (comma-separated backend names, cheapest
+    first; default gemini), LLM_EASY_MAX_CHARS (default 3000) and
+    LLM_MIN_CONFIDENCE (default 0.5). Backends load their clients or models
+    on first use, so this is cheap.
+    """
+    names = [name.strip().lower() for name in os.environ.get('LLM_TIERS', 'gemini').split(',') if name.strip()]
+    return TieredRouter([create_backend(name) for name in names], guard=guard)
@@ -0,0 +1,289 @@
+import os
+import time
+import random
+import threading
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+
+# --- LLM Call Guard ---
+# Every model call goes through one process-wide guard:
+#   - a concurrency limiter caps the calls in flight (LLM_MAX_CONCURRENCY);
+#     callers beyond the cap wait up to LLM_QUEUE_TIMEOUT seconds for a slot
+#   - transient failures (rate limits, 5xx, timeouts) are retried with
+#     exponential backoff and full jitter
+#   - a call still running after the hedge delay is duplicated (if a slot is
+#     free) and whichever finishes first wins. With LLM_HEDGE_AFTER=auto the
+#     delay is the p95 of recent call durations, so roughly 5% of calls hedge.
+# Limiter saturation, retries and hedges are exported on /metrics and /stats.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 8
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20 # Observed calls needed before automatic hedging starts
+LATENCY_WINDOW = 200
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Exception class names used by the Google API client and HTTP libraries for transient errors
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'ReadTimeout', 'ConnectTimeout', 'RemoteProtocolError'
+}
+
+
+class LimiterTimeout(Exception):
+    """Raised when no model call slot frees up within the queue timeout."""
+
+
+def is_retryable(error):
+    """
+    Whether a model call error is transient (rate limit, server error, timeout).
+    Wrapped errors are checked through their __cause__ chain.
+    """
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        if type(error).__name__ in RETRYABLE_ERRORS:
+            return True
+        status = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+        if isinstance(status, int) and status in RETRYABLE_STATUS:
+            return True
+        error = error.__cause__
+    return False
+
+
+class ConcurrencyLimiter:
+    """
+    Counting semaphore that records how often callers had to wait for a slot.
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, queue_timeout=None):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.acquired = 0
+        self.saturated = 0 # Acquisitions that had to wait
+        self.rejected = 0  # Waits that timed out
+        self._slot_freed = threading.Condition()
+
+    def acquire(self, blocking=True):
+        """
+        Takes a slot. Returns False only when `blocking` is False and none is free.
+        Raises:
+            LimiterTimeout: If no slot frees up within the queue timeout.
+        """
+        with self._slot_freed:
+            if self.in_flight >= self.max_in_flight:
+                if not blocking:
+                    return False
+                self.saturated += 1
+                self.waiting += 1
+                metrics.LLM_WAITING.inc()
+                try:
+                    with metrics.span('llm_queue'):
+                        free = self._slot_freed.wait_for(lambda: self.in_flight < self.max_in_flight,
+                                                         timeout=self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                    metrics.LLM_WAITING.dec()
+                if not free:
+                    self.rejected += 1
+                    metrics.LLM_SATURATED.inc(outcome='rejected')
+                    raise LimiterTimeout(f"No model call slot free after {self.queue_timeout}s "
+                                         f"({self.max_in_flight} calls in flight)")
+                metrics.LLM_SATURATED.inc(outcome='waited')
+            self.in_flight += 1
+            self.acquired += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            metrics.LLM_IN_FLIGHT.inc()
+            return True
+
+    def release(self):
+        with self._slot_freed:
+            self.in_flight -= 1
+            metrics.LLM_IN_FLIGHT.dec()
+            self._slot_freed.notify()
+
+    def stats(self):
+        with self._slot_freed:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'peak_in_flight': self.peak_in_flight,
+                'acquired': self.acquired,
+                'saturated': self.saturated,
+                'rejected': self.rejected
+            }
+
+
+class LLMGuard:
+    """
+    Runs model calls under the concurrency limit with retries and hedging.
+
+    Args:
+        limiter (ConcurrencyLimiter): Shared limit on calls in flight.
+        max_retries (int): Retries after a transient failure.
+        backoff (float): Base delay in seconds; attempt n waits up to backoff * 2**n.
+        backoff_max (float): Upper bound for a single backoff delay.
+        hedge_after: Seconds before a slow call is duplicated, 'auto' (recent p95)
+            or None to never hedge.
+    """
+
+    def __init__(self, limiter, max_retries=3, backoff=0.5, backoff_max=8.0, hedge_after='auto'):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self._durations = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {'calls': 0, 'failures': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'hedges_skipped': 0}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def hedge_delay(self):
+        """
+        Seconds after which a call is hedged, or None if hedging is off (or,
+        in auto mode, until enough calls have been observed).
+        """
+        if self.hedge_after != 'auto':
+            return self.hedge_after
+        with self._lock:
+            if len(self._durations) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._durations)
+        return ordered[min(len(ordered) - 1, int(HEDGE_QUANTILE * len(ordered)))]
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Every task holds a limiter slot, so this many threads never queue
+                    self._executor = ThreadPoolExecutor(max_workers=self.limiter.max_in_flight,
+                                                        thread_name_prefix='llm-call')
+        return self._executor
+
+    def _run(self, func, args):
+        # Called with a slot already held; gives it back when done
+        try:
+            start = time.perf_counter()
+            result = func(*args)
+            with self._lock:
+                self._durations.append(time.perf_counter() - start)
+            return result
+        finally:
+            self.limiter.release()
+
+    def _submit(self, func, args):
+        # Copy the context so request timing spans are recorded from the pool thread
+        return self._pool().submit(contextvars.copy_context().run, self._run, func, args)
+
+    def _attempt(self, func, args):
+        delay = self.hedge_delay()
+        self.limiter.acquire()
+        if delay is None:
+            return self._run(func, args)
+
+        primary = self._submit(func, args)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        # Only hedge with spare capacity, so hedging never makes other callers wait
+        if not self.limiter.acquire(blocking=False):
+            self._count('hedges_skipped')
+            metrics.LLM_HEDGES.inc(outcome='skipped')
+            return primary.result()
+        hedge = self._submit(func, args)
+        self._count('hedges')
+        metrics.LLM_HEDGES.inc(outcome='launched')
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                        metrics.LLM_HEDGES.inc(outcome='won')
+                    # The slower call keeps its slot until it finishes; its result is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, func, *args):
+        """
+        Calls func(*args) under the guard and returns its result.
+        Raises:
+            LimiterTimeout: If no slot became free in time.
+            Exception: The last error once retries are exhausted, or any
+                non-transient error immediately.
+        """
+        self._count('calls')
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._attempt(func, args)
+            except LimiterTimeout:
+                self._count('failures')
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                metrics.LLM_RETRIES.inc(reason=type(e).__name__)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+                logger.warning("LLM: Attempt %d failed (%s: %s), retrying in %.2fs.",
+                               attempt + 1, type(e).__name__, e, delay)
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            samples = len(self._durations)
+        delay = self.hedge_delay()
+        stats.update({
+            'limiter': self.limiter.stats(),
+            'max_retries': self.max_retries,
+            'hedge_after': self.hedge_after,
+            'hedge_delay': round(delay, 3) if delay is not None else None,
+            'latency_samples': samples
+        })
+        return stats
+
+
+def _hedge_setting(value):
+    value = value.strip().lower()
+    if value == 'auto':
+        return 'auto'
+    seconds = float(value)
+    return seconds if seconds > 0 else None
+
+
+def create_llm_guard():
+    """
+    Builds the model call guard from the environment:
+    LLM_MAX_CONCURRENCY (default 8), LLM_QUEUE_TIMEOUT (default 30 s),
+    LLM_MAX_RETRIES (default 3), LLM_BACKOFF (default 0.5 s) and
+    LLM_HEDGE_AFTER ('auto' (default), seconds, or 0 to disable).
+    """
+    limiter = ConcurrencyLimiter(
+        max_in_flight=max(1, int(os.environ.get('LLM_MAX_CONCURRENCY', DEFAULT_MAX_IN_FLIGHT))),
+        queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT', 30))
+    )
+    return LLMGuard(
+        limiter,
+        max_retries=int(os.environ.get('LLM_MAX_RETRIES', 3)),
+        backoff=float(os.environ.get('LLM_BACKOFF', 0.5)),
+        hedge_after=_hedge_setting(os.environ.get('LLM_HEDGE_AFTER', 'auto'))
+    )
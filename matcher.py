@@ -0,0 +1,379 @@
+import os
+import time
+import zlib
+import threading
+import logging
+from array import array
+
+import numpy as np
+
+import fast_extract
+from models import Resume
+from search_index import tokenize
+
+# --- Job Description Matching ---
+# Ranks stored resumes against a job description. Every resume is kept as one
+# sparse row (CSR: column and value arrays per row) of a hashed term-frequency
+# matrix: signed feature hashing into MATCH_DIMENSIONS columns of its skills,
+# titles, descriptions and education. Each column also has a posting list of
+# (row, value) pairs, so scoring only touches the columns the job description
+# uses. IDF weights are kept per column and applied at query time, so rows
+# never need recomputing as the collection grows. Skills also go into a
+# posting list per (lowercased) skill for the overlap score.
+#
+#   score = (1 - MATCH_SKILL_WEIGHT) * tfidf_cosine + MATCH_SKILL_WEIGHT * skill_overlap
+#
+# skill_overlap is the share of the job description's skills (found with the
+# fast_extract skill dictionary) that the resume lists. Scoring is a
+# scatter-add per query term and per skill, so ranking 100k resumes takes a
+# few milliseconds.
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = int(os.environ.get('MATCH_DIMENSIONS', 2 ** 16))
+SKILL_WEIGHT = float(os.environ.get('MATCH_SKILL_WEIGHT', 0.5))
+SKILL_TERM_WEIGHT = 2.0 # A listed skill counts as much as two mentions in the text
+COMPACT_RATIO = 0.2
+INITIAL_CAPACITY = 1024
+# Resume fields a row is built from; edits to anything else leave the index as is
+INDEXED_FIELDS = {'name', 'email', 'skills', 'education', 'work_experience'}
+
+
+def _text_parts(resume):
+    """
+    Yields (text, weight) pairs that make up a resume's term vector.
+    """
+    for skill in resume.skills:
+        yield skill, SKILL_TERM_WEIGHT
+    for exp in resume.work_experience:
+        yield exp.title, 1.0
+        yield exp.description, 1.0
+    for edu in resume.education:
+        yield edu.degree, 1.0
+
+
+def term_vector(parts, dimensions=DIMENSIONS):
+    """
+    Hashed, sublinear term-frequency vector of weighted text parts, as sorted
+    (columns, values) arrays of its non-zero entries.
+    Each term goes to column crc32(term) % dimensions with a sign taken from
+    another hash bit, so colliding terms tend to cancel instead of adding up.
+    """
+    counts = {}
+    for text, weight in parts:
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0.0) + weight
+    entries = {}
+    for token, count in counts.items():
+        hashed = zlib.crc32(token.encode('utf-8'))
+        sign = 1.0 if hashed & 0x80000000 else -1.0
+        column = hashed % dimensions
+        entries[column] = entries.get(column, 0.0) + sign * (1.0 + np.log(count))
+    columns = np.array(sorted(column for column, value in entries.items() if value), dtype=np.uint32)
+    values = np.array([entries[column] for column in columns], dtype=np.float32)
+    return columns, values
+
+
+class _Postings:
+    __slots__ = ('rows', 'values')
+
+    def __init__(self):
+        self.rows = array('I')
+        self.values = array('f')
+
+
+class MatchIndex:
+    """
+    Resume vectors and skill postings, updated incrementally.
+    """
+
+    def __init__(self, dimensions=DIMENSIONS):
+        self.dimensions = dimensions
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # CSR rows: row r holds entries _indptr[r]:_indptr[r + 1] of _columns/_values
+        self._indptr = array('q', [0])
+        self._columns = array('I')
+        self._values = array('f')
+        self._postings = {} # column -> _Postings (rows ascending)
+        self._alive = bytearray() # row -> 1, or 0 once deleted
+        self._doc_freq = np.zeros(self.dimensions, dtype=np.float64) # live rows with a non-zero column
+        self._rows = 0
+        self._ids = [] # row -> resume id (None once deleted)
+        self._numbers = {} # resume id -> row
+        self._summaries = [] # row -> {'name', 'email'}
+        self._skills = [] # row -> set of lowercased skills
+        self._skill_rows = {} # lowercased skill -> list of rows
+        self._deleted = 0
+        self._version = 0 # bumped on every write; invalidates the cached IDF weights and norms
+        self._weights = None # (version, idf, row norms)
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def build(self, resumes):
+        with self._lock:
+            self._clear()
+            for resume in resumes:
+                self._add(resume['id'], resume)
+
+    def add(self, resume_id, data):
+        with self._lock:
+            if resume_id in self._numbers:
+                self._remove(resume_id)
+            self._add(resume_id, data)
+
+    def remove(self, resume_id):
+        with self._lock:
+            self._remove(resume_id)
+            if self._deleted > COMPACT_RATIO * max(self._rows, 1):
+                self._compact()
+
+    def _add(self, resume_id, data):
+        resume = Resume.from_dict(data)
+        row = self._rows
+        columns, values = term_vector(_text_parts(resume), self.dimensions)
+        for column, value in zip(columns.tolist(), values.tolist()):
+            postings = self._postings.get(column)
+            if postings is None:
+                postings = self._postings[column] = _Postings()
+            postings.rows.append(row)
+            postings.values.append(value)
+        self._columns.frombytes(columns.tobytes())
+        self._values.frombytes(values.tobytes())
+        self._indptr.append(len(self._columns))
+        self._doc_freq[columns] += 1
+        self._alive.append(1)
+        skills = {skill.lower() for skill in resume.skills}
+        for skill in skills:
+            self._skill_rows.setdefault(skill, []).append(row)
+        self._ids.append(resume_id)
+        self._numbers[resume_id] = row
+        self._summaries.append({'name': resume.name, 'email': resume.email})
+        self._skills.append(skills)
+        self._rows += 1
+        self._version += 1
+
+    def _remove(self, resume_id):
+        row = self._numbers.pop(resume_id, None)
+        if row is None:
+            return
+        # Tombstone; postings are filtered with the alive mask until compaction
+        columns = np.frombuffer(self._columns, dtype=np.uint32)[self._indptr[row]:self._indptr[row + 1]]
+        self._doc_freq[columns] -= 1
+        del columns
+        self._alive[row] = 0
+        self._ids[row] = None
+        self._summaries[row] = None
+        self._skills[row] = None
+        self._deleted += 1
+        self._version += 1
+
+    def _compact(self):
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        live = np.flatnonzero(alive)
+        indptr = np.frombuffer(self._indptr, dtype=np.int64)
+        entry_rows = np.repeat(np.arange(self._rows), np.diff(indptr))
+        keep = alive[entry_rows]
+        renumber = np.cumsum(alive) - 1
+        rows = renumber[entry_rows[keep]].astype(np.uint32)
+        columns = np.frombuffer(self._columns, dtype=np.uint32)[keep]
+        values = np.frombuffer(self._values, dtype=np.float32)[keep]
+        lengths = np.diff(indptr)[live]
+        del alive, indptr, entry_rows
+
+        # Postings: entries grouped by column, rows ascending within each column
+        order = np.lexsort((rows, columns))
+        sorted_columns = columns[order]
+        starts = np.flatnonzero(np.r_[True, sorted_columns[1:] != sorted_columns[:-1]]) if len(order) else []
+        ends = list(starts[1:]) + [len(order)] if len(order) else []
+        postings = {}
+        for start, end in zip(starts, ends):
+            compacted = _Postings()
+            compacted.rows = array('I', rows[order[start:end]].tobytes())
+            compacted.values = array('f', values[order[start:end]].tobytes())
+            postings[int(sorted_columns[start])] = compacted
+
+        ids = [self._ids[row] for row in live]
+        skills = [self._skills[row] for row in live]
+        self._summaries = [self._summaries[row] for row in live]
+        self._indptr = array('q', np.r_[0, np.cumsum(lengths)].astype(np.int64).tobytes())
+        self._columns = array('I', columns.tobytes())
+        self._values = array('f', values.tobytes())
+        self._postings = postings
+        self._alive = bytearray(b'\x01') * len(live)
+        self._rows = len(live)
+        self._ids = ids
+        self._numbers = {resume_id: row for row, resume_id in enumerate(ids)}
+        self._skills = skills
+        self._skill_rows = {}
+        for row, row_skills in enumerate(skills):
+            for skill in row_skills:
+                self._skill_rows.setdefault(skill, []).append(row)
+        self._deleted = 0
+        self._version += 1
+
+    def _idf_and_norms(self):
+        """
+        Smoothed IDF per hashed column and the IDF-weighted norm of every row,
+        cached until the next write.
+        """
+        if self._weights is not None and self._weights[0] == self._version:
+            return self._weights[1], self._weights[2]
+        total = len(self._numbers)
+        idf = (np.log((1 + total) / (1 + self._doc_freq)) + 1.0).astype(np.float32)
+        indptr = np.frombuffer(self._indptr, dtype=np.int64)
+        entry_rows = np.repeat(np.arange(self._rows), np.diff(indptr))
+        weighted = np.frombuffer(self._values, dtype=np.float32) * idf[np.frombuffer(self._columns, dtype=np.uint32)]
+        norms = np.sqrt(np.bincount(entry_rows, weights=np.square(weighted), minlength=self._rows)).astype(np.float32)
+        self._weights = (self._version, idf, norms)
+        return idf, norms
+
+    def match(self, job_description, k=20, skill_weight=SKILL_WEIGHT):
+        """
+        Ranks the stored resumes against a job description.
+        Returns:
+            dict: 'skills' (skills found in the job description), 'total'
+            (resumes scored) and 'results' (top `k` dicts with 'id', 'name',
+            'email', 'score', 'text_score', 'skill_score', 'matched_skills'
+            and 'missing_skills').
+        """
+        jd_skills = fast_extract.skill_matcher.find(job_description)
+        jd_keys = [skill.lower() for skill in jd_skills]
+        query_columns, query_values = term_vector(
+            [(job_description, 1.0)] + [(skill, SKILL_TERM_WEIGHT) for skill in jd_skills], self.dimensions)
+        with self._lock:
+            rows = self._rows
+            total = len(self._numbers)
+            if not total:
+                return {'skills': jd_skills, 'total': 0, 'results': []}
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+
+            # cos(q*idf, d*idf) = d . (q*idf^2) / (|d*idf| |q*idf|): the stored rows stay unweighted
+            idf, norms = self._idf_and_norms()
+            query_idf = idf[query_columns]
+            query_norm = float(np.linalg.norm(query_values * query_idf))
+            dots = np.zeros(rows, dtype=np.float32)
+            for column, weight in zip(query_columns.tolist(), (query_values * query_idf * query_idf).tolist()):
+                postings = self._postings.get(column)
+                if postings is not None:
+                    dots[np.frombuffer(postings.rows, dtype=np.uint32)] += np.frombuffer(postings.values, dtype=np.float32) * weight
+            text_scores = np.zeros(rows, dtype=np.float32)
+            if query_norm:
+                np.divide(dots, norms * query_norm, out=text_scores, where=norms > 0)
+
+            skill_scores = np.zeros(rows, dtype=np.float32)
+            if jd_keys:
+                for skill in jd_keys:
+                    postings = self._skill_rows.get(skill)
+                    if postings:
+                        skill_scores[postings] += 1.0
+                skill_scores /= len(jd_keys)
+                scores = (1 - skill_weight) * text_scores + skill_weight * skill_scores
+            else:
+                scores = text_scores.copy()
+            scores[~alive] = -np.inf
+
+            if total > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top], kind='stable')]
+            else:
+                top = np.argsort(-scores, kind='stable')[:total]
+
+            results = []
+            for row in top:
+                row_skills = self._skills[row]
+                results.append(dict(
+                    self._summaries[row],
+                    id=self._ids[row],
+                    score=round(float(scores[row]), 4),
+                    text_score=round(float(text_scores[row]), 4),
+                    skill_score=round(float(skill_scores[row]), 4),
+                    matched_skills=[skill for skill, key in zip(jd_skills, jd_keys) if key in row_skills],
+                    missing_skills=[skill for skill, key in zip(jd_skills, jd_keys) if key not in row_skills]
+                ))
+            return {'skills': jd_skills, 'total': total, 'results': results}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'resumes': len(self._numbers),
+                'dimensions': self.dimensions,
+                'tombstones': self._deleted,
+                'entries': len(self._columns),
+                'matrix_bytes': len(self._columns) * 8 + sum(len(p.rows) * 8 for p in self._postings.values()),
+                'skills': len(self._skill_rows)
+            }
+
+
+# --- Shared index ---
+# Built on first use from a full scan of the collection and kept current by
+# the database change listener (same lifecycle as the search index).
+
+_index = None
+_listening = False
+_pending = None # change events received while a build is in progress
+_events_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def _apply(index, event, resume_id, data):
+    if event == 'insert':
+        index.add(resume_id, data)
+    elif event == 'update':
+        if INDEXED_FIELDS.intersection(data['changed']):
+            index.add(resume_id, data['document'])
+    elif event == 'delete':
+        index.remove(resume_id)
+
+
+def _on_change(event, resume_id, data):
+    with _events_lock:
+        if _pending is not None:
+            _pending.append((event, resume_id, data))
+            return
+        index = _index
+    if index is not None:
+        _apply(index, event, resume_id, data)
+
+
+def get_index():
+    """
+    Returns the shared MatchIndex, building it on first use.
+    """
+    global _index, _listening, _pending
+    if _index is not None:
+        return _index
+    import database
+    with _build_lock:
+        if _index is not None:
+            return _index
+        with _events_lock:
+            _pending = []
+        if not _listening:
+            database.add_change_listener(_on_change)
+            _listening = True
+        index = MatchIndex()
+        try:
+            start = time.perf_counter()
+            # Read through the repository so a failed scan is not mistaken for an
+            # empty collection (and published as an index that matches nothing)
+            index.build(database.run(database.get_repository().list_all()))
+        except Exception:
+            with _events_lock:
+                _pending = None
+            raise
+        with _events_lock:
+            for event, resume_id, data in _pending:
+                _apply(index, event, resume_id, data)
+            _pending = None
+            _index = index
+        logger.info("Match index built over %d resumes in %.2fs", len(index), time.perf_counter() - start)
+        return index
+
+
+def stats():
+    index = _index
+    return index.stats() if index is not None else None
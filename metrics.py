@@ -0,0 +1,206 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Metrics ---
+# Timing spans and counters for the parse/store/render pipeline, exposed in
+# the Prometheus text format by /metrics. Metrics are kept per process (each
+# gunicorn worker reports its own; Prometheus sums them per instance).
+#
+#   with metrics.span('extract'):
+#       text = extract_text_from_bytes(...)
+#
+# Every span is observed into the resume_parser_span_seconds histogram. While
+# request timing is active (TIMING_HEADER=1), spans are also collected per
+# request and returned in a Server-Timing response header.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TIMING_HEADER = os.environ.get('TIMING_HEADER', '0') == '1'
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}')
+        return lines
+
+
+SPAN_SECONDS = Histogram('resume_parser_span_seconds', 'Duration of pipeline operations in seconds.', ['span'])
+SPAN_ERRORS = Counter('resume_parser_span_errors_total', 'Pipeline operations that raised an exception.', ['span'])
+HTTP_SECONDS = Histogram('resume_parser_http_request_seconds', 'HTTP request latency in seconds.', ['endpoint', 'method', 'status'])
+LLM_TOKENS = Counter('resume_parser_llm_tokens_total', 'Model tokens reported by the LLM provider.', ['direction'])
+PROCESSED_BYTES = Counter('resume_parser_bytes_total', 'Bytes processed per stage (uploads, extracted text, rendered files).', ['kind'])
+LLM_IN_FLIGHT = Gauge('resume_parser_llm_in_flight', 'Model calls currently holding a concurrency slot.')
+LLM_WAITING = Gauge('resume_parser_llm_waiting', 'Model calls waiting for a concurrency slot.')
+LLM_SATURATED = Counter('resume_parser_llm_limiter_saturated_total', 'Model calls that found every concurrency slot taken, by outcome.', ['outcome'])
+LLM_RETRIES = Counter('resume_parser_llm_retries_total', 'Model call retries, by error type.', ['reason'])
+LLM_HEDGES = Counter('resume_parser_llm_hedges_total', 'Hedged (duplicate) model calls, by outcome.', ['outcome'])
+LLM_TIER_SECONDS = Histogram('resume_parser_llm_tier_seconds', 'Model call latency per backend tier in seconds.', ['tier'])
+LLM_ESCALATIONS = Counter('resume_parser_llm_escalations_total', 'Answers passed on to the next backend tier, by tier and reason.', ['tier', 'reason'])
+RESUME_CACHE_LOOKUPS = Counter('resume_parser_resume_cache_lookups_total', 'Read cache lookups of resume documents and list pages, by result.', ['cache', 'result'])
+RESUME_CACHE_READS_SAVED = Counter('resume_parser_firestore_reads_saved_total', 'Firestore document reads answered from the read cache.')
+
+REGISTRY = [SPAN_SECONDS, SPAN_ERRORS, HTTP_SECONDS, LLM_TOKENS, PROCESSED_BYTES,
+            LLM_IN_FLIGHT, LLM_WAITING, LLM_SATURATED, LLM_RETRIES, LLM_HEDGES, LLM_TIER_SECONDS, LLM_ESCALATIONS,
+            RESUME_CACHE_LOOKUPS, RESUME_CACHE_READS_SAVED]
+
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+@contextmanager
+def span(name):
+    """
+    Times a block of code as pipeline operation `name`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def count_bytes(kind, amount):
+    PROCESSED_BYTES.inc(amount, kind=kind)
+
+
+def count_tokens(input_tokens=0, output_tokens=0):
+    if input_tokens:
+        LLM_TOKENS.inc(input_tokens, direction='input')
+    if output_tokens:
+        LLM_TOKENS.inc(output_tokens, direction='output')
+
+
+def start_request_timing():
+    """
+    Starts collecting spans for the current request (context).
+    Returns:
+        A token for `finish_request_timing`.
+    """
+    return _request_spans.set([])
+
+
+def finish_request_timing(token, total):
+    """
+    Stops collecting spans and formats them as a Server-Timing header value.
+    Spans with the same name (e.g. chunked LLM calls) are summed.
+    """
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    entries = [f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in totals.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def render():
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
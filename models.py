@@ -0,0 +1,300 @@
+import re
+
+# --- Resume Data Model ---
+# Typed, __slots__-based records for parsed resumes. Model output, form posts
+# and stored documents are validated and normalized once, at the boundary
+# (Resume.from_dict / Resume.from_form); everything after that can rely on
+# every field being present with the right type:
+#   name, email, phone       str (stripped, '' when missing)
+#   skills                   list of non-empty str
+#   education                list of Education
+#   work_experience          list of WorkExperience
+# to_dict() / to_document() produce plain dicts for templates, JSON, the
+# parse cache and Firestore. diff_document() / apply_changes() describe an
+# edit as per-field changes, so only what changed is written back.
+
+# Bump when normalization changes so cached parse results are not reused
+SCHEMA_VERSION = '1'
+
+# Stored document fields that hold resume content (and can be edited)
+DOCUMENT_FIELDS = ('name', 'email', 'phone', 'skills', 'education', 'work_experience')
+
+_FORM_ENTRY_RE = re.compile(r'^(education|work_experience)_(\d+)_(\w+)$')
+
+
+class ResumeValidationError(ValueError):
+    """Raised when resume data does not have the expected shape."""
+
+
+def _text(value):
+    """
+    Normalizes a scalar field to a stripped string ('' for None).
+    """
+    if value is None:
+        return ''
+    if type(value) is not str:
+        if isinstance(value, (list, tuple)):
+            # Models sometimes split a value into parts, e.g. ["2019", "2021"]
+            return ', '.join(filter(None, (_text(part) for part in value)))
+        if isinstance(value, float) and value.is_integer():
+            value = int(value) # 2019.0 -> "2019"
+        value = str(value)
+    return value.strip()
+
+
+def _skills(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, (list, tuple)):
+        raise ResumeValidationError(f"skills must be a list or a comma-separated string, not {type(value).__name__}")
+    skills = []
+    seen = set()
+    for skill in value:
+        skill = _text(skill)
+        key = skill.lower()
+        if skill and key not in seen:
+            seen.add(key)
+            skills.append(skill)
+    return skills
+
+
+class _Entry:
+    """
+    Base for list entries; subclasses define __slots__, ALIASES and PRIMARY.
+    """
+    __slots__ = ()
+    ALIASES = {}
+    PRIMARY = None # Field a bare string entry is stored in
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, _text(fields.get(field)))
+
+    @classmethod
+    def from_dict(cls, value):
+        """
+        Builds an entry from model output or a stored document.
+        Unknown keys are ignored; common key variants are mapped via ALIASES.
+        Returns:
+            The entry, or None when every field is empty.
+        Raises:
+            ResumeValidationError: If `value` is neither a dict nor a string.
+        """
+        if isinstance(value, str):
+            value = {cls.PRIMARY: value}
+        elif not isinstance(value, dict):
+            raise ResumeValidationError(f"{cls.__name__} entries must be objects, not {type(value).__name__}")
+        entry = cls.__new__(cls)
+        empty = True
+        for field in cls.__slots__:
+            raw = value.get(field)
+            if raw is None:
+                raw = next((value[alias] for alias in cls.ALIASES.get(field, ()) if value.get(alias) is not None), None)
+            text = _text(raw)
+            setattr(entry, field, text)
+            empty = empty and not text
+        return None if empty else entry
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)})"
+
+
+class Education(_Entry):
+    __slots__ = ('institution', 'degree', 'passing_year', 'marks_percentage_cgpa')
+    ALIASES = {
+        'institution': ('school', 'university', 'college'),
+        'passing_year': ('year', 'graduation_year', 'end_year'),
+        'marks_percentage_cgpa': ('cgpa', 'gpa', 'marks', 'percentage', 'grade'),
+    }
+    PRIMARY = 'degree'
+
+
+class WorkExperience(_Entry):
+    __slots__ = ('title', 'company', 'dates', 'description')
+    ALIASES = {
+        'title': ('role', 'position', 'designation'),
+        'company': ('organization', 'employer'),
+        'dates': ('duration', 'period'),
+        'description': ('responsibilities', 'summary', 'details'),
+    }
+    PRIMARY = 'title'
+
+
+def _entries(cls, value, field):
+    if not value:
+        return []
+    if isinstance(value, dict):
+        value = [value] # A single entry returned as an object instead of a list
+    elif not isinstance(value, (list, tuple)):
+        raise ResumeValidationError(f"{field} must be a list, not {type(value).__name__}")
+    return [entry for entry in map(cls.from_dict, value) if entry is not None]
+
+
+class Resume:
+    """
+    A parsed resume. Build instances with from_dict/from_form (which validate
+    and normalize) rather than the constructor, which trusts its arguments.
+    """
+    __slots__ = ('name', 'email', 'phone', 'skills', 'education', 'work_experience', 'field_confidence')
+
+    def __init__(self, name='', email='', phone='', skills=(), education=(), work_experience=(), field_confidence=None):
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.skills = list(skills)
+        self.education = list(education)
+        self.work_experience = list(work_experience)
+        self.field_confidence = field_confidence
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Validates and normalizes model output, JSON or a stored document.
+        Raises:
+            ResumeValidationError: If the data or one of its fields has the wrong shape.
+        """
+        if isinstance(data, Resume):
+            return data
+        if not isinstance(data, dict):
+            raise ResumeValidationError(f"Resume data must be an object, not {type(data).__name__}")
+        resume = cls.__new__(cls)
+        resume.name = _text(data.get('name'))
+        resume.email = _text(data.get('email'))
+        resume.phone = _text(data.get('phone'))
+        resume.skills = _skills(data.get('skills'))
+        resume.education = _entries(Education, data.get('education'), 'education')
+        resume.work_experience = _entries(WorkExperience, data.get('work_experience'), 'work_experience')
+        confidence = data.get('field_confidence')
+        resume.field_confidence = confidence if isinstance(confidence, dict) else None
+        return resume
+
+    @classmethod
+    def from_form(cls, form):
+        """
+        Builds a resume from the edit form (name, email, phone, comma-separated
+        skills and education_<i>_<field> / work_experience_<j>_<field> inputs).
+        Entries are ordered by index; gaps left by removed entries are skipped.
+        """
+        rows = {'education': {}, 'work_experience': {}}
+        for key in form.keys():
+            match = _FORM_ENTRY_RE.match(key)
+            if match:
+                section, index, field = match.groups()
+                rows[section].setdefault(int(index), {})[field] = form.get(key)
+        return cls.from_dict({
+            'name': form.get('name'),
+            'email': form.get('email'),
+            'phone': form.get('phone'),
+            'skills': form.get('skills'),
+            'education': [rows['education'][i] for i in sorted(rows['education'])],
+            'work_experience': [rows['work_experience'][i] for i in sorted(rows['work_experience'])],
+        })
+
+    def to_dict(self):
+        """
+        Plain dict for templates, JSON responses and the parse cache.
+        """
+        data = {
+            'name': self.name,
+            'email': self.email,
+            'phone': self.phone,
+            'skills': list(self.skills),
+            'education': [entry.to_dict() for entry in self.education],
+            'work_experience': [entry.to_dict() for entry in self.work_experience],
+        }
+        if self.field_confidence is not None:
+            data['field_confidence'] = self.field_confidence
+        return data
+
+    def to_document(self, original_filename=None, timestamp=None):
+        """
+        The stored Firestore document (no parse metadata such as field_confidence).
+        """
+        document = self.to_dict()
+        document.pop('field_confidence', None)
+        document['original_filename'] = original_filename
+        document['timestamp'] = timestamp
+        return document
+
+    def __eq__(self, other):
+        return isinstance(other, Resume) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Resume(name={self.name!r}, email={self.email!r}, skills={len(self.skills)}, " \
+               f"education={len(self.education)}, work_experience={len(self.work_experience)})"
+
+
+# --- Field-level Changes ---
+# A change is (op, value): 'set' replaces the field, 'union' appends the
+# listed items to an array and 'remove' drops them from it. Array operations
+# are only used when they reproduce the edited list exactly: the stored list
+# has no repeated items, an append adds new items at the end, and a removal
+# keeps the order of the remaining ones. Anything else (reordering, editing
+# an entry in place) rewrites the array.
+
+def _unique(items):
+    return all(item not in items[:i] for i, item in enumerate(items))
+
+
+def _list_change(old, new):
+    if _unique(old):
+        if new[:len(old)] == old and _unique(new):
+            return ('union', new[len(old):])
+        if [item for item in old if item in new] == new:
+            return ('remove', [item for item in old if item not in new])
+    return ('set', new)
+
+
+def diff_document(stored, resume, fields=DOCUMENT_FIELDS):
+    """
+    The changes that turn a stored document into an edited resume.
+    Args:
+        stored (dict): The document as currently stored.
+        resume (Resume or dict): The edited resume (validated and normalized). A
+            dict may also carry 'original_filename'.
+        fields (iterable, optional): Fields to compare; others are left as stored.
+    Returns:
+        dict: field -> (op, value), for changed fields only.
+    Raises:
+        ResumeValidationError: If `resume` does not have the resume shape.
+    """
+    edited = Resume.from_dict(resume).to_dict()
+    if isinstance(resume, dict) and 'original_filename' in resume:
+        # Not resume content, so only compared when the edit carries it
+        edited['original_filename'] = resume['original_filename']
+    changes = {}
+    for field in fields:
+        if field not in edited:
+            continue
+        old, new = stored.get(field), edited[field]
+        if old == new:
+            continue
+        if isinstance(old, list) and isinstance(new, list):
+            changes[field] = _list_change(old, new)
+        else:
+            changes[field] = ('set', new)
+    return changes
+
+
+def apply_changes(document, changes):
+    """
+    Returns a copy of `document` with `changes` (from diff_document) applied.
+    """
+    updated = dict(document)
+    for field, (op, value) in changes.items():
+        current = list(updated.get(field) or [])
+        if op == 'union':
+            updated[field] = current + [item for item in value if item not in current]
+        elif op == 'remove':
+            updated[field] = [item for item in current if item not in value]
+        else:
+            updated[field] = value
+    return updated
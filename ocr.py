@@ -0,0 +1,207 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+# --- OCR Fallback ---
+# Scanned resumes have pages without a text layer, for which page.get_text()
+# returns nothing. Those pages (and only those) are rendered and run through
+# Tesseract via PyMuPDF's OCR support (requires the tesseract binary and its
+# language data, see TESSDATA_PREFIX).
+#   * pages are OCR'd in parallel in worker processes, one page per task
+#   * OCR_DPI sets the render resolution, OCR_MAX_PAGES caps the pages per document
+#   * results are cached by a hash of the page's content and image streams
+#     (plus the OCR settings), so re-uploading a scan costs no OCR at all
+# Without Tesseract the fallback logs a warning and the page stays empty.
+
+logger = logging.getLogger(__name__)
+
+OCR_ENABLED = os.environ.get('OCR_ENABLED', '1') != '0'
+OCR_DPI = int(os.environ.get('OCR_DPI', 200))
+OCR_MAX_PAGES = int(os.environ.get('OCR_MAX_PAGES', 10))
+OCR_LANGUAGE = os.environ.get('OCR_LANGUAGE', 'eng')
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', min(4, os.cpu_count() or 1)))
+# Pages with fewer non-whitespace characters than this are treated as having no text layer
+OCR_MIN_CHARS = int(os.environ.get('OCR_MIN_CHARS', 10))
+
+_pool = None
+_cache = None
+_unavailable = False # set once Tesseract turns out to be missing
+_init_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'documents': 0, 'pages': 0, 'cache_hits': 0, 'failures': 0, 'skipped_pages': 0, 'seconds': 0.0}
+
+
+def needs_ocr(text):
+    return OCR_ENABLED and not _unavailable and len(''.join(text.split())) < OCR_MIN_CHARS
+
+
+def _is_missing_tesseract(error):
+    message = str(error).lower()
+    return 'tesseract' in message or 'tessdata' in message
+
+
+def page_key(doc, page, dpi=OCR_DPI, language=OCR_LANGUAGE):
+    """
+    Cache key for the OCR text of a page: a hash of its content stream and
+    the raw streams of the images it draws, so identical scans share a key
+    without anything being rendered.
+    """
+    digest = hashlib.sha256(f'{dpi}\0{language}\0{page.rect}\0'.encode('utf-8'))
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b'')
+    return 'ocr:' + digest.hexdigest()
+
+
+def _single_page_pdf(doc, page_number):
+    # Workers get just the page they OCR, not the whole upload
+    import fitz
+    single = fitz.open()
+    single.insert_pdf(doc, from_page=page_number, to_page=page_number)
+    return single.tobytes()
+
+
+def ocr_page_bytes(pdf_bytes, dpi=OCR_DPI, language=OCR_LANGUAGE):
+    """
+    OCRs the first page of a PDF (worker process entry point).
+    """
+    import fitz
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page = doc[0]
+        textpage = page.get_textpage_ocr(dpi=dpi, language=language, full=True)
+        return page.get_text(textpage=textpage)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _pool
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = create_ocr_cache()
+    return _cache if _cache is not False else None
+
+
+def create_ocr_cache():
+    """
+    Builds the OCR page cache. OCR_CACHE_BACKEND is memory, sqlite or none
+    and defaults to PARSE_CACHE_BACKEND ('shared' falls back to sqlite);
+    the SQLite file is OCR_CACHE_PATH (default cache/ocr_cache.sqlite3).
+    Returns:
+        A parse_cache backend, or False when disabled.
+    """
+    from parse_cache import MemoryBackend, SQLiteBackend, DEFAULT_TTL_SECONDS
+    backend_name = os.environ.get('OCR_CACHE_BACKEND', os.environ.get('PARSE_CACHE_BACKEND', 'sqlite')).lower()
+    max_entries = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', 5000))
+    if backend_name == 'none':
+        return False
+    if backend_name == 'memory':
+        return MemoryBackend(max_entries=max_entries, ttl=DEFAULT_TTL_SECONDS)
+    path = os.environ.get('OCR_CACHE_PATH', os.path.join('cache', 'ocr_cache.sqlite3'))
+    return SQLiteBackend(path, max_entries=max_entries, ttl=DEFAULT_TTL_SECONDS)
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            _stats[name] += amount
+
+
+def ocr_pages(doc, page_numbers):
+    """
+    OCRs pages of an open PyMuPDF document.
+    Args:
+        doc: The fitz.Document.
+        page_numbers (list): Pages without a text layer; only the first
+            OCR_MAX_PAGES are processed.
+    Returns:
+        dict: page number -> OCR text ('' if OCR failed or is unavailable).
+    """
+    selected = page_numbers[:OCR_MAX_PAGES]
+    if len(page_numbers) > len(selected):
+        logger.info("OCR: Skipping %d pages over OCR_MAX_PAGES=%d.", len(page_numbers) - len(selected), OCR_MAX_PAGES)
+    cache = _get_cache()
+    results = {}
+    missing = {}
+    for number in selected:
+        key = page_key(doc, doc[number])
+        try:
+            text = cache.get(key) if cache is not None else None
+        except Exception as e:
+            logger.warning("OCR: Cache lookup failed, treating as miss: %s", e)
+            text = None
+        if text is not None:
+            results[number] = text
+        else:
+            missing[number] = key
+    _count(documents=1, cache_hits=len(results), skipped_pages=len(page_numbers) - len(selected))
+    if not missing:
+        return results
+
+    payloads = {number: _single_page_pdf(doc, number) for number in missing}
+    start = time.perf_counter()
+    with metrics.span('ocr'):
+        # Inside a worker process (e.g. batch ingestion) or for a single page, OCR inline
+        if len(payloads) == 1 or OCR_WORKERS <= 1 or multiprocessing.parent_process() is not None:
+            outcomes = {}
+            for number, payload in payloads.items():
+                try:
+                    outcomes[number] = ocr_page_bytes(payload)
+                except Exception as e:
+                    outcomes[number] = e
+        else:
+            futures = {number: _get_pool().submit(ocr_page_bytes, payload) for number, payload in payloads.items()}
+            outcomes = {}
+            for number, future in futures.items():
+                try:
+                    outcomes[number] = future.result()
+                except Exception as e:
+                    outcomes[number] = e
+    failures = 0
+    for number, outcome in outcomes.items():
+        if isinstance(outcome, Exception) and _is_missing_tesseract(outcome):
+            _disable(outcome)
+        if isinstance(outcome, Exception):
+            failures += 1
+            logger.warning("OCR: Page %d failed: %s", number + 1, outcome)
+            results[number] = ''
+            continue
+        results[number] = outcome
+        try:
+            if cache is not None:
+                cache.set(missing[number], outcome)
+        except Exception as e:
+            logger.warning("OCR: Failed to cache page %d: %s", number + 1, e)
+    _count(pages=len(outcomes) - failures, failures=failures, seconds=time.perf_counter() - start)
+    return results
+
+
+def _disable(error):
+    global _unavailable
+    if not _unavailable:
+        _unavailable = True
+        logger.warning("OCR: Tesseract is not available (%s); OCR is disabled in this process.", error)
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    result['seconds'] = round(result['seconds'], 3)
+    result['enabled'] = OCR_ENABLED and not _unavailable
+    result['dpi'] = OCR_DPI
+    result['max_pages'] = OCR_MAX_PAGES
+    return result
@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+# --- Parse Cache ---
+# Parsed resumes are cached by content hash so that re-uploading the same
+# document (or a document that extracts to the same text) skips the LLM call.
+# Two keys are used for every parse:
+#   * a file key, the hash of the raw upload bytes (checked before extraction)
+#   * a text key, the hash of the normalized extracted text (checked after
+#     extraction, catches re-exports of the same resume)
+# Both keys are salted with a fingerprint of the prompt and model settings so
+# that changing either one naturally invalidates old entries.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def normalize_text(text):
+    """
+    Normalizes extracted resume text before hashing so that whitespace-only
+    differences between extractions map to the same cache entry.
+    """
+    return " ".join(text.split()).lower()
+
+
+def fingerprint(*parts):
+    """
+    Builds a short, stable fingerprint from prompt/model settings.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class MemoryBackend:
+    """
+    In-process LRU backend with TTL eviction. Fast, but private to a single
+    worker process and lost on restart.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    Local disk backend. Survives restarts and is shared by every worker
+    process on the same host (e.g. several gunicorn workers).
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS parse_cache_accessed ON parse_cache (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM parse_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE parse_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            # Drop expired rows first, then the least recently used ones
+            self.evictions += self._conn.execute(
+                "DELETE FROM parse_cache WHERE expires_at < ?", (now,)
+            ).rowcount
+            self.evictions += self._conn.execute(
+                "DELETE FROM parse_cache WHERE key IN ("
+                " SELECT key FROM parse_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM parse_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+
+
+class _LocalStoreClient:
+    """
+    Stand-in for a shared key/value store. Implements the small subset of the
+    redis-py client interface used by SharedStoreBackend, so a real
+    `redis.Redis(...)` instance can be dropped in without code changes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (time.time() + ex if ex else None, value)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def dbsize(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SharedStoreBackend:
+    """
+    Backend for a store shared between hosts (redis-compatible client).
+    Size bounding is left to the store's own eviction policy
+    (e.g. redis `maxmemory-policy allkeys-lru`); TTL is set per key.
+    """
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL_SECONDS, namespace='parse_cache:'):
+        self.client = client if client is not None else _LocalStoreClient()
+        self.ttl = ttl
+        self.namespace = namespace
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(self.namespace + key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value):
+        self.client.set(self.namespace + key, value, ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.namespace + key)
+
+    def clear(self):
+        # Entries expire on their own; a shared store is not wiped from here.
+        pass
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+class ParseCache:
+    """
+    Content-hash cache for parsed resume data with hit/miss counters.
+    Values are stored as JSON so every lookup returns a fresh copy that the
+    caller is free to mutate.
+    """
+
+    def __init__(self, backend, version=''):
+        self.backend = backend
+        self.version = version
+        self._lock = threading.Lock()
+        self._counters = {'file_hits': 0, 'file_misses': 0, 'text_hits': 0, 'text_misses': 0, 'stores': 0}
+
+    def file_key(self, file_bytes):
+        """
+        Cache key for the raw bytes of an uploaded file.
+        """
+        digest = hashlib.sha256(self.version.encode('utf-8') + b'\0')
+        digest.update(file_bytes) # bytes or memoryview, hashed without copying
+        return 'file:' + digest.hexdigest()
+
+    def text_key(self, text):
+        """
+        Cache key for extracted resume text (after normalization).
+        """
+        normalized = normalize_text(text)
+        return 'text:' + hashlib.sha256((self.version + '\0' + normalized).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a cached parse result.
+        Args:
+            key (str): A key returned by `file_key` or `text_key`.
+        Returns:
+            dict: The cached parse result, or None on a miss.
+        """
+        kind = key.split(':', 1)[0]
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Parse cache: Lookup failed, treating as miss: %s", e)
+            value = None
+        with self._lock:
+            self._counters[f'{kind}_hits' if value is not None else f'{kind}_misses'] += 1
+        return json.loads(value) if value is not None else None
+
+    def set(self, keys, data):
+        """
+        Stores a parse result under one or more keys.
+        Args:
+            keys (list): Keys returned by `file_key`/`text_key`.
+            data (dict): The parsed resume data.
+        """
+        value = json.dumps(data)
+        try:
+            for key in keys:
+                self.backend.set(key, value)
+        except Exception as e:
+            # The cache is an optimization only, never fail a parse because of it
+            logger.warning("Parse cache: Failed to store entry: %s", e)
+            return
+        with self._lock:
+            self._counters['stores'] += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and backend size information.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        hits = stats['file_hits'] + stats['text_hits']
+        # A text lookup only happens after a file miss, so text misses are
+        # exactly the parses that went to the model.
+        lookups = hits + stats['text_misses']
+        stats['hits'] = hits
+        stats['misses'] = stats['text_misses']
+        stats['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        stats['backend'] = type(self.backend).__name__
+        stats['evictions'] = getattr(self.backend, 'evictions', 0)
+        try:
+            stats['entries'] = len(self.backend)
+        except Exception:
+            stats['entries'] = None
+        return stats
+
+
+def create_parse_cache(version=''):
+    """
+    Builds the parse cache from environment configuration:
+        PARSE_CACHE_BACKEND      memory | sqlite | shared | none (default: sqlite)
+        PARSE_CACHE_PATH         SQLite file path (default: cache/parse_cache.sqlite3)
+        PARSE_CACHE_MAX_ENTRIES  LRU size bound (default: 1000)
+        PARSE_CACHE_TTL          Entry lifetime in seconds (default: 7 days)
+    Returns:
+        ParseCache: The configured cache, or None when caching is disabled.
+    """
+    backend_name = os.environ.get('PARSE_CACHE_BACKEND', 'sqlite').lower()
+    max_entries = int(os.environ.get('PARSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    ttl = int(os.environ.get('PARSE_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+    if backend_name == 'none':
+        return None
+    if backend_name == 'memory':
+        backend = MemoryBackend(max_entries=max_entries, ttl=ttl)
+    elif backend_name == 'sqlite':
+        path = os.environ.get('PARSE_CACHE_PATH', os.path.join('cache', 'parse_cache.sqlite3'))
+        backend = SQLiteBackend(path, max_entries=max_entries, ttl=ttl)
+    elif backend_name == 'shared':
+        backend = SharedStoreBackend(ttl=ttl)
+    else:
+        raise ValueError(f"Unknown PARSE_CACHE_BACKEND: {backend_name}")
+    logger.info("Parse cache initialized with %s.", type(backend).__name__)
+    return ParseCache(backend, version=version)
@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+from collections import Counter
+
+import fast_extract
+
+# --- Prompt Preprocessing ---
+# Cleans extracted resume text before it goes into the prompt:
+#   * removes running headers/footers repeated across pages
+#   * drops noise lines (page numbers, separators, stray bullets)
+#   * collapses whitespace
+# and splits very long resumes into section-aligned chunks that are parsed
+# concurrently and merged back together.
+#
+# Page boundaries come from the form feed ("\f") that extract_text_from_pdf
+# puts between pages.
+
+PAGE_BREAK = '\f'
+
+PREPROCESS_ENABLED = os.environ.get('PREPROCESS_ENABLED', '1') != '0'
+CHUNK_MAX_CHARS = int(os.environ.get('CHUNK_MAX_CHARS', 12000))
+MAX_CHUNKS = int(os.environ.get('MAX_CHUNKS', 8))
+
+# Bump when the cleaning rules change so cached parses are not reused
+VERSION = '1'
+
+_EDGE_LINES = 3 # lines at the top/bottom of a page checked for headers/footers
+_PAGE_NUMBER_RE = re.compile(r'^(?:page\s*\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?|\d{1,3}\s*(?:/|of)\s*\d{1,3})$', re.IGNORECASE)
+_NOISE_RE = re.compile(r'^[\W_]+$') # only bullets, separators or punctuation
+_DIGITS_RE = re.compile(r'\d+')
+_SPACES_RE = re.compile(r'[ \t\u00a0\u2000-\u200a\u202f\u205f\u3000]+')
+_INVISIBLE_RE = re.compile(r'[\u200b-\u200f\ufeff\x00-\x08\x0b\x0e-\x1f]') # keeps \f (page break)
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+_stats_lock = threading.Lock()
+_stats = {'documents': 0, 'tokens_before': 0, 'tokens_after': 0, 'chars_before': 0, 'chars_after': 0,
+          'chunked_documents': 0, 'chunks': 0}
+
+
+def estimate_tokens(text):
+    """
+    Approximates the model token count (words and punctuation marks). Cheap
+    enough to run on every request; close to real tokenizer counts for
+    resume-style English text.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def _line_signature(line):
+    # "Page 2 of 3" and "Page 3 of 3" must be recognised as the same footer
+    return _DIGITS_RE.sub('#', line.strip().lower())
+
+
+def _repeated_edge_lines(pages):
+    """
+    Returns signatures of lines that appear at the top or bottom of at least
+    half of the pages (running headers and footers).
+    """
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        content = [line for line in lines if line.strip()]
+        edges = content[:_EDGE_LINES] + content[-_EDGE_LINES:]
+        counts.update({_line_signature(line) for line in edges})
+    threshold = max(2, (len(pages) + 1) // 2)
+    return {signature for signature, count in counts.items() if count >= threshold and signature}
+
+
+def preprocess_text(text):
+    """
+    Cleans extracted resume text for the prompt.
+    Returns:
+        str: The cleaned text (page breaks removed).
+    """
+    if not PREPROCESS_ENABLED:
+        return text
+    text = _INVISIBLE_RE.sub('', text)
+    pages = [page.splitlines() for page in text.split(PAGE_BREAK)]
+    repeated = _repeated_edge_lines(pages)
+
+    cleaned = []
+    for lines in pages:
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        edges = set(content[:_EDGE_LINES] + content[-_EDGE_LINES:]) if repeated else set()
+        for i, line in enumerate(lines):
+            line = _SPACES_RE.sub(' ', line).strip()
+            if not line:
+                # Keep single blank lines, they separate entries and sections
+                if cleaned and cleaned[-1]:
+                    cleaned.append('')
+                continue
+            if _PAGE_NUMBER_RE.match(line) or _NOISE_RE.match(line):
+                continue
+            if i in edges and _line_signature(line) in repeated:
+                continue
+            cleaned.append(line)
+    result = '\n'.join(cleaned).strip()
+
+    before, after = estimate_tokens(text), estimate_tokens(result)
+    with _stats_lock:
+        _stats['documents'] += 1
+        _stats['tokens_before'] += before
+        _stats['tokens_after'] += after
+        _stats['chars_before'] += len(text)
+        _stats['chars_after'] += len(result)
+    return result
+
+
+def _split_long_block(block, max_chars):
+    """
+    Splits a single oversized section on line boundaries.
+    """
+    chunk = []
+    size = 0
+    for line in block.splitlines():
+        if chunk and size + len(line) + 1 > max_chars:
+            yield '\n'.join(chunk)
+            chunk, size = [], 0
+        chunk.append(line[:max_chars])
+        size += len(line) + 1
+    if chunk:
+        yield '\n'.join(chunk)
+
+
+def chunk_text(text, max_chars=CHUNK_MAX_CHARS, max_chunks=MAX_CHUNKS):
+    """
+    Splits text into chunks of at most `max_chars`, cutting at section
+    headings so that an education or experience entry is never split across
+    two model calls unless the section itself is oversized.
+    Returns:
+        list: The chunks (a single element when the text is short enough).
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    blocks = []
+    for section, body in fast_extract.segment_sections(text).items():
+        if not body:
+            continue
+        block = body if section == 'header' else f"{section.title()}\n{body}"
+        if len(block) > max_chars:
+            blocks.extend(_split_long_block(block, max_chars))
+        else:
+            blocks.append(block)
+
+    chunks = []
+    for block in blocks:
+        if chunks and len(chunks[-1]) + len(block) + 2 <= max_chars:
+            chunks[-1] += '\n\n' + block
+        else:
+            chunks.append(block)
+
+    with _stats_lock:
+        _stats['chunked_documents'] += 1
+        _stats['chunks'] += min(len(chunks), max_chunks)
+    # Anything past the chunk budget is almost always appendix material
+    return chunks[:max_chunks]
+
+
+def _entry_key(entry):
+    if isinstance(entry, dict):
+        return tuple(sorted((k, str(v).strip().lower()) for k, v in entry.items()))
+    return str(entry).strip().lower()
+
+
+def merge_partial_results(results):
+    """
+    Merges the JSON objects parsed from the chunks of one resume.
+    Scalar fields keep the first non-empty value; list fields are
+    concatenated in chunk order with duplicates removed.
+    """
+    if len(results) == 1:
+        return results[0]
+    merged = {}
+    for partial in results:
+        if not isinstance(partial, dict):
+            continue
+        for field, value in partial.items():
+            if isinstance(value, list):
+                existing = merged.setdefault(field, [])
+                seen = {_entry_key(item) for item in existing}
+                for item in value:
+                    key = _entry_key(item)
+                    if key not in seen:
+                        seen.add(key)
+                        existing.append(item)
+            elif value and not merged.get(field):
+                merged[field] = value
+    return merged
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    if result['tokens_before']:
+        result['token_reduction'] = round(1 - result['tokens_after'] / result['tokens_before'], 4)
+    return result
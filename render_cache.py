@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+
+from parse_cache import fingerprint
+
+# --- Render Cache ---
+# Rendered PDF/DOCX downloads, kept in memory and keyed on
+# (resume id, content hash, format). The content hash covers every field the
+# renderers read, so an edited resume never gets a stale file; deleting a
+# resume, or editing one of its rendered fields, drops all of its entries.
+# Eviction is least-recently-used, bounded by the total size of the cached files.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Fields read by renderers.py; the timestamp and filename do not change the output
+RENDERED_FIELDS = ['name', 'email', 'phone', 'skills', 'education', 'work_experience']
+
+
+def content_hash(data):
+    """
+    Hashes the rendered fields of a resume.
+    """
+    content = json.dumps({field: data.get(field) for field in RENDERED_FIELDS}, sort_keys=True, default=str)
+    return fingerprint(content)
+
+
+class RenderCache:
+    """
+    Size-bounded LRU of rendered files.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # (resume_id, content_hash, file_type) -> bytes
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, resume_id):
+        """
+        Drops every cached rendering of a resume.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == resume_id]:
+                self.size -= len(self._entries.pop(key))
+
+    def on_change(self, event, resume_id, data):
+        """
+        Change listener for database.add_change_listener.
+        """
+        if event == 'delete':
+            self.invalidate(resume_id)
+        elif event == 'update' and set(data['changed']).intersection(RENDERED_FIELDS):
+            self.invalidate(resume_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+def create_render_cache():
+    """
+    Builds the render cache from RENDER_CACHE_MAX_MB (default 64; 0 disables it).
+    Returns None when disabled.
+    """
+    max_mb = float(os.environ.get('RENDER_CACHE_MAX_MB', DEFAULT_MAX_BYTES / (1024 * 1024)))
+    if max_mb <= 0:
+        logger.info("Render cache disabled.")
+        return None
+    return RenderCache(max_bytes=int(max_mb * 1024 * 1024))
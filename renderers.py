@@ -0,0 +1,255 @@
+import io
+import re
+import threading
+
+import metrics
+from models import Resume
+
+# --- Resume Renderers ---
+# PDF (reportlab) and DOCX (python-docx) generation for /download_resume.
+# The PDF stylesheet and the empty DOCX base document are built once per
+# process and reused; rendering only reads them. reportlab and python-docx are
+# imported on first use (or by warm_up()) to keep app start-up fast.
+
+MIMETYPES = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+_pdf_styles = None
+_base_docx = None
+_init_lock = threading.Lock()
+
+
+def get_pdf_styles():
+    """
+    Returns the shared PDF stylesheet (sample stylesheet plus the resume styles).
+    """
+    global _pdf_styles
+    with _init_lock:
+        if _pdf_styles is None:
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.units import inch
+            from reportlab.lib.enums import TA_CENTER
+            styles = getSampleStyleSheet()
+
+            # Modify existing 'Normal' and 'Bullet' styles
+            styles['Normal'].fontSize = 10
+            styles['Normal'].leading = 12
+            styles['Normal'].spaceAfter = 6
+
+            styles['Bullet'].fontSize = 10
+            styles['Bullet'].leading = 12
+            styles['Bullet'].spaceAfter = 2
+            styles['Bullet'].leftIndent = 0.2 * inch
+            styles['Bullet'].bulletIndent = 0.1 * inch
+            styles['Bullet'].bulletText = '•'
+
+            # Add custom styles with unique names
+            styles.add(ParagraphStyle(name='TitleStyle', fontSize=24, leading=28, alignment=TA_CENTER, spaceAfter=12, fontName='Helvetica-Bold'))
+            styles.add(ParagraphStyle(name='ContactStyle', fontSize=10, leading=12, alignment=TA_CENTER, spaceAfter=12))
+            styles.add(ParagraphStyle(name='SectionHeading', fontSize=16, leading=18, spaceAfter=8, fontName='Helvetica-Bold', textColor='#4f46e5')) # Indigo color
+            styles.add(ParagraphStyle(name='SubHeading', fontSize=12, leading=14, spaceAfter=4, fontName='Helvetica-Bold'))
+            _pdf_styles = styles
+        return _pdf_styles
+
+
+def get_base_docx():
+    """
+    Returns the bytes of an empty DOCX document built from the default template.
+    Opening a document from these bytes skips locating and reading the template
+    package from disk on every render.
+    """
+    global _base_docx
+    with _init_lock:
+        if _base_docx is None:
+            from docx import Document as DocxDocument
+            buffer = io.BytesIO()
+            DocxDocument().save(buffer)
+            _base_docx = buffer.getvalue()
+        return _base_docx
+
+
+def generate_pdf_from_data(data, buffer):
+    """Generates a PDF resume from parsed data and writes to a buffer."""
+    resume = Resume.from_dict(data)
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.units import inch
+
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = get_pdf_styles()
+
+    story = []
+
+    # Personal Details
+    story.append(Paragraph(resume.name or 'Unnamed Resume', styles['TitleStyle']))
+    contact_info = []
+    if resume.email:
+        contact_info.append(resume.email)
+    if resume.phone:
+        contact_info.append(resume.phone)
+    if contact_info:
+        story.append(Paragraph(" | ".join(contact_info), styles['ContactStyle']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Skills
+    if resume.skills:
+        story.append(Paragraph("Skills", styles['SectionHeading']))
+        story.append(Paragraph(", ".join(resume.skills), styles['Normal']))
+        story.append(Spacer(1, 0.1 * inch))
+
+    # Education
+    if resume.education:
+        story.append(Paragraph("Education", styles['SectionHeading']))
+        for edu in resume.education:
+            edu_line = f"<b>{edu.degree}</b>"
+            if edu.institution:
+                edu_line += f" - {edu.institution}"
+            if edu.passing_year:
+                edu_line += f" ({edu.passing_year})"
+            story.append(Paragraph(edu_line, styles['SubHeading']))
+            if edu.marks_percentage_cgpa:
+                story.append(Paragraph(f"Marks/CGPA: {edu.marks_percentage_cgpa}", styles['Normal']))
+            story.append(Spacer(1, 0.05 * inch))
+        story.append(Spacer(1, 0.1 * inch))
+
+    # Work Experience
+    if resume.work_experience:
+        story.append(Paragraph("Work Experience", styles['SectionHeading']))
+        for exp in resume.work_experience:
+            exp_line = f"<b>{exp.title}</b>"
+            if exp.company:
+                exp_line += f" at {exp.company}"
+            if exp.dates:
+                exp_line += f" ({exp.dates})"
+            story.append(Paragraph(exp_line, styles['SubHeading']))
+            if exp.description:
+                # Split description into lines and add as bullet points
+                desc_lines = [line.strip() for line in exp.description.split('\n') if line.strip()]
+                for desc_line in desc_lines:
+                    story.append(Paragraph(desc_line, styles['Bullet']))
+            story.append(Spacer(1, 0.05 * inch))
+        story.append(Spacer(1, 0.1 * inch))
+
+    doc.build(story)
+
+
+def generate_docx_from_data(data, buffer):
+    """Generates a DOCX resume from parsed data and writes to a buffer."""
+    resume = Resume.from_dict(data)
+    from docx import Document as DocxDocument
+    from docx.shared import Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    document = DocxDocument(io.BytesIO(get_base_docx()))
+    
+    # Add Name
+    name_para = document.add_paragraph()
+    name_run = name_para.add_run(resume.name or 'Unnamed Resume')
+    name_run.bold = True
+    name_run.font.size = Pt(24)
+    name_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Add Contact Info
+    contact_para = document.add_paragraph()
+    contact_info = []
+    if resume.email:
+        contact_info.append(resume.email)
+    if resume.phone:
+        contact_info.append(resume.phone)
+    if contact_info:
+        contact_para.add_run(" | ".join(contact_info)).font.size = Pt(10)
+    contact_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    document.add_paragraph() # Spacer
+
+    # Skills
+    if resume.skills:
+        document.add_heading('Skills', level=2)
+        skills_para = document.add_paragraph()
+        skills_para.add_run(", ".join(resume.skills)).font.size = Pt(10)
+        document.add_paragraph() # Spacer
+
+    # Education
+    if resume.education:
+        document.add_heading('Education', level=2)
+        for edu in resume.education:
+            edu_para = document.add_paragraph()
+            edu_para.add_run(f"{edu.degree}").bold = True
+            if edu.institution:
+                edu_para.add_run(f" - {edu.institution}")
+            if edu.passing_year:
+                edu_para.add_run(f" ({edu.passing_year})")
+            edu_para.runs[0].font.size = Pt(12) # Apply size to bold part
+            if len(edu_para.runs) > 1: # Apply size to rest of the run
+                for run in edu_para.runs[1:]:
+                    run.font.size = Pt(12)
+
+            if edu.marks_percentage_cgpa:
+                marks_para = document.add_paragraph()
+                marks_para.add_run(f"Marks/CGPA: {edu.marks_percentage_cgpa}").font.size = Pt(10)
+            document.add_paragraph() # Small spacer
+
+    # Work Experience
+    if resume.work_experience:
+        document.add_heading('Work Experience', level=2)
+        for exp in resume.work_experience:
+            exp_para = document.add_paragraph()
+            exp_para.add_run(f"{exp.title}").bold = True
+            if exp.company:
+                exp_para.add_run(f" at {exp.company}")
+            if exp.dates:
+                exp_para.add_run(f" ({exp.dates})")
+            exp_para.runs[0].font.size = Pt(12) # Apply size to bold part
+            if len(exp_para.runs) > 1: # Apply size to rest of the run
+                for run in exp_para.runs[1:]:
+                    run.font.size = Pt(12)
+
+            if exp.description:
+                desc_lines = [line.strip() for line in exp.description.split('\n') if line.strip()]
+                for desc_line in desc_lines:
+                    bullet_para = document.add_paragraph(style='List Bullet')
+                    bullet_para.add_run(desc_line).font.size = Pt(10)
+            document.add_paragraph() # Small spacer
+            
+    document.save(buffer)
+
+
+def warm_up():
+    """
+    Imports the PDF/DOCX libraries and builds the shared stylesheet and base document.
+    """
+    get_pdf_styles()
+    get_base_docx()
+
+
+def file_basename(data):
+    """
+    Builds a download filename (without extension) from the resume's name.
+    """
+    filename_base = (data.get('name') or 'resume').replace(' ', '_') # Use name for filename, secure_filename not needed for base
+    # Ensure filename_base is safe for file systems (remove invalid chars)
+    filename_base = re.sub(r'[^\w\s.-]', '', filename_base).strip()
+    return re.sub(r'\s+', '_', filename_base) or 'resume'
+
+
+def render_resume(data, file_type):
+    """
+    Renders a resume to a file.
+    Args:
+        data (dict): Resume data.
+        file_type (str): 'pdf' or 'docx'.
+    Returns:
+        bytes: The rendered file.
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    generators = {'pdf': generate_pdf_from_data, 'docx': generate_docx_from_data}
+    if file_type not in generators:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    buffer = io.BytesIO()
+    with metrics.span(f'render_{file_type}'):
+        generators[file_type](data, buffer)
+    body = buffer.getvalue()
+    metrics.count_bytes(f'rendered_{file_type}', len(body))
+    return body
@@ -0,0 +1,560 @@
+import os
+import json
+import uuid
+import base64
+import sqlite3
+import asyncio
+import threading
+import datetime
+
+from models import Resume, DOCUMENT_FIELDS, diff_document, apply_changes
+
+# --- Async Resume Repository ---
+# Asynchronous data layer for the 'resumes' collection. Single-document calls
+# go straight to the backend; bulk calls use Firestore batched writes
+# (insert_many/delete_many) and a single multi-document read (get_many).
+# Edits are field-level: update() writes only the fields that changed, as a
+# Firestore update() with array operations, inside a transaction that checks
+# the document's version (its timestamp) has not moved since it was read.
+#
+# Backends: Firestore, an embedded SQLite file (local and offline use) and an
+# in-memory store for tests. store_sync.py copies documents between them.
+#
+# Flask views are synchronous, so every coroutine is run on one long-lived
+# event loop in a background thread (see `run`). The Firestore AsyncClient and
+# its gRPC channel are bound to that loop and reused by every request.
+
+COLLECTION = 'resumes'
+MAX_BATCH_WRITES = 500 # Firestore limit per batched write
+DEFAULT_SQLITE_PATH = os.path.join('data', 'resumes.sqlite3')
+
+# Fields fetched for list views; the education/work_experience arrays are left out
+SUMMARY_FIELDS = ['name', 'email', 'phone', 'original_filename', 'timestamp']
+
+
+class ResumeNotFoundError(LookupError):
+    """Raised when updating a resume that does not exist."""
+
+
+class ConflictError(Exception):
+    """Raised when a resume changed after the version an update was based on."""
+
+    def __init__(self, resume_id, expected_version, current_version):
+        super().__init__(f"Resume {resume_id} was modified (version {current_version}, expected {expected_version})")
+        self.resume_id = resume_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def document_version(doc):
+    """
+    The version token of a stored document: its timestamp, which every write refreshes.
+    """
+    timestamp = doc.get('timestamp')
+    return timestamp.isoformat() if timestamp is not None else None
+
+
+def _check_version(resume_id, stored, expected_version):
+    if stored is None:
+        raise ResumeNotFoundError(resume_id)
+    current_version = document_version(stored)
+    if expected_version is not None and current_version != expected_version:
+        raise ConflictError(resume_id, expected_version, current_version)
+
+
+def build_resume_doc(data, original_filename=None, timestamp=None):
+    """
+    Builds the stored document for parsed resume data (a Resume or a dict,
+    which is validated and normalized).
+    Raises:
+        ResumeValidationError: If a dict does not have the resume shape.
+    """
+    return Resume.from_dict(data).to_document(original_filename, timestamp)
+
+
+def encode_cursor(doc):
+    """
+    Encodes the position after `doc` (newest-first order) as an opaque URL-safe string.
+    """
+    position = [doc['timestamp'].isoformat(), doc['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor from `encode_cursor`.
+    Returns:
+        tuple: (timestamp, document id)
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        timestamp, resume_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.datetime.fromisoformat(timestamp), str(resume_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FirestoreBackend:
+    """
+    Backend on the Firestore AsyncClient (requires an initialized firebase_admin app).
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from firebase_admin import firestore_async
+            client = firestore_async.client()
+        self.client = client
+        self.collection = client.collection(COLLECTION)
+
+    async def insert_many(self, docs):
+        from google.cloud import firestore
+        ids = []
+        for chunk in _chunks(docs, MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for doc in chunk:
+                doc_ref = self.collection.document()
+                batch.set(doc_ref, dict(doc, timestamp=firestore.SERVER_TIMESTAMP))
+                ids.append(doc_ref.id)
+            await batch.commit()
+        return ids
+
+    async def replace(self, resume_id, doc):
+        from google.cloud import firestore
+        await self.collection.document(resume_id).set(dict(doc, timestamp=firestore.SERVER_TIMESTAMP))
+
+    async def put_many(self, docs):
+        # Documents keep their ids and timestamps (imports from another store)
+        for chunk in _chunks(docs, MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for doc in chunk:
+                batch.set(self.collection.document(doc['id']), {k: v for k, v in doc.items() if k != 'id'})
+            await batch.commit()
+
+    async def update(self, resume_id, compute_changes, expected_version=None):
+        from google.cloud import firestore
+        ref = self.collection.document(resume_id)
+
+        @firestore.async_transactional
+        async def apply(transaction):
+            # The read takes part in the transaction: if the document is written before
+            # the commit, Firestore retries and the diff is recomputed on the new version
+            snapshot = await ref.get(transaction=transaction)
+            stored = snapshot.to_dict() if snapshot.exists else None
+            _check_version(resume_id, stored, expected_version)
+            changes = compute_changes(stored)
+            if changes:
+                updates = {}
+                for field, (op, value) in changes.items():
+                    if op == 'union':
+                        updates[field] = firestore.ArrayUnion(value)
+                    elif op == 'remove':
+                        updates[field] = firestore.ArrayRemove(value)
+                    else:
+                        updates[field] = value
+                updates['timestamp'] = firestore.SERVER_TIMESTAMP
+                transaction.update(ref, updates)
+            return stored, changes
+
+        stored, changes = await apply(self.client.transaction())
+        if not changes:
+            return stored, changes
+        # The server sets the timestamp on commit; read it back so the
+        # returned document carries its new version
+        snapshot = await ref.get()
+        return (snapshot.to_dict() if snapshot.exists else apply_changes(stored, changes)), changes
+
+    async def get_many(self, ids):
+        refs = [self.collection.document(resume_id) for resume_id in ids]
+        found = {}
+        # get_all fetches every document in one streaming RPC; results may arrive out of order
+        async for snapshot in self.client.get_all(refs):
+            if snapshot.exists:
+                found[snapshot.id] = dict(snapshot.to_dict(), id=snapshot.id)
+        return [found.get(resume_id) for resume_id in ids]
+
+    async def delete_many(self, ids):
+        for chunk in _chunks(list(ids), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for resume_id in chunk:
+                batch.delete(self.collection.document(resume_id))
+            await batch.commit()
+
+    async def list_all(self):
+        from google.cloud import firestore
+        query = self.collection.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        return [dict(doc.to_dict(), id=doc.id) async for doc in query.stream()]
+
+    async def list_page(self, limit, after=None, fields=None):
+        from google.cloud import firestore
+        # Document id breaks ties between equal timestamps so pages never overlap
+        query = self.collection.order_by('timestamp', direction=firestore.Query.DESCENDING) \
+                               .order_by('__name__', direction=firestore.Query.DESCENDING)
+        if fields:
+            query = query.select(fields)
+        if after:
+            timestamp, resume_id = after
+            query = query.start_after({'timestamp': timestamp, '__name__': resume_id})
+        return [dict(doc.to_dict(), id=doc.id) async for doc in query.limit(limit).stream()]
+
+
+class MemoryBackend:
+    """
+    In-memory stand-in for Firestore, for offline tests and benchmarks.
+    `latency` adds a simulated round-trip (in seconds) to every call.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.docs = {}
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def insert_many(self, docs):
+        ids = []
+        for chunk in _chunks(docs, MAX_BATCH_WRITES):
+            await self._round_trip()
+            for doc in chunk:
+                resume_id = uuid.uuid4().hex[:20]
+                self.docs[resume_id] = dict(doc, timestamp=datetime.datetime.now(datetime.timezone.utc))
+                ids.append(resume_id)
+        return ids
+
+    async def replace(self, resume_id, doc):
+        await self._round_trip()
+        self.docs[resume_id] = dict(doc, timestamp=datetime.datetime.now(datetime.timezone.utc))
+
+    async def put_many(self, docs):
+        for chunk in _chunks(docs, MAX_BATCH_WRITES):
+            await self._round_trip()
+            for doc in chunk:
+                self.docs[doc['id']] = {k: v for k, v in doc.items() if k != 'id'}
+
+    async def update(self, resume_id, compute_changes, expected_version=None):
+        await self._round_trip()
+        stored = self.docs.get(resume_id)
+        _check_version(resume_id, stored, expected_version)
+        changes = compute_changes(stored)
+        if changes:
+            self.docs[resume_id] = dict(apply_changes(stored, changes), timestamp=datetime.datetime.now(datetime.timezone.utc))
+        return dict(self.docs[resume_id]), changes
+
+    async def get_many(self, ids):
+        await self._round_trip()
+        return [dict(self.docs[resume_id], id=resume_id) if resume_id in self.docs else None for resume_id in ids]
+
+    async def delete_many(self, ids):
+        for chunk in _chunks(list(ids), MAX_BATCH_WRITES):
+            await self._round_trip()
+            for resume_id in chunk:
+                self.docs.pop(resume_id, None)
+
+    async def list_all(self):
+        await self._round_trip()
+        docs = [dict(doc, id=resume_id) for resume_id, doc in self.docs.items()]
+        return sorted(docs, key=lambda doc: doc['timestamp'], reverse=True)
+
+    async def list_page(self, limit, after=None, fields=None):
+        await self._round_trip()
+        ordered = sorted(self.docs.items(), key=lambda item: (item[1]['timestamp'], item[0]), reverse=True)
+        if after:
+            ordered = [item for item in ordered if (item[1]['timestamp'], item[0]) < after]
+        page = []
+        for resume_id, doc in ordered[:limit]:
+            if fields:
+                doc = {field: doc[field] for field in fields if field in doc}
+            page.append(dict(doc, id=resume_id))
+        return page
+
+
+def _format_timestamp(timestamp):
+    # Fixed-width UTC ISO 8601 strings sort in time order
+    return timestamp.astimezone(datetime.timezone.utc).isoformat(timespec='microseconds')
+
+
+class SQLiteBackend:
+    """
+    Embedded store in a local SQLite file (WAL mode, so several workers on a
+    host can share it), for offline and bulk work without network round-trips.
+    Each resume is one row: the document as a JSON column plus its email
+    (lowercased) and timestamp as indexed columns.
+    Calls run on a single worker thread that owns the connection, so the
+    event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, path):
+        from concurrent.futures import ThreadPoolExecutor
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-store')
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS resumes ("
+            " id TEXT PRIMARY KEY, email TEXT, timestamp TEXT NOT NULL, data TEXT NOT NULL CHECK (json_valid(data)));"
+            "CREATE INDEX IF NOT EXISTS resumes_email ON resumes (email) WHERE email != '';"
+            "CREATE INDEX IF NOT EXISTS resumes_timestamp ON resumes (timestamp DESC, id DESC);"
+        )
+
+    def _call(self, operation, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, operation, *args)
+
+    def _transaction(self, operation, *args, immediate=False):
+        # BEGIN IMMEDIATE takes the write lock up front, so a read-check-write
+        # can't interleave with another process's write
+        self._conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            result = operation(*args)
+            self._conn.execute("COMMIT")
+            return result
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _row(doc, resume_id, timestamp):
+        data = {k: v for k, v in doc.items() if k not in ('id', 'timestamp')}
+        return (resume_id, (doc.get('email') or '').strip().lower(), _format_timestamp(timestamp),
+                json.dumps(data, ensure_ascii=False, default=str))
+
+    @staticmethod
+    def _document(resume_id, timestamp, data, fields=None):
+        doc = json.loads(data)
+        doc['timestamp'] = datetime.datetime.fromisoformat(timestamp)
+        if fields:
+            doc = {field: doc[field] for field in fields if field in doc}
+        doc['id'] = resume_id
+        return doc
+
+    def _write(self, rows):
+        self._transaction(self._conn.executemany,
+                          "INSERT OR REPLACE INTO resumes (id, email, timestamp, data) VALUES (?, ?, ?, ?)", rows)
+
+    async def insert_many(self, docs):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        rows = [self._row(doc, uuid.uuid4().hex[:20], now) for doc in docs]
+        await self._call(self._write, rows)
+        return [row[0] for row in rows]
+
+    async def replace(self, resume_id, doc):
+        await self._call(self._write, [self._row(doc, resume_id, datetime.datetime.now(datetime.timezone.utc))])
+
+    async def put_many(self, docs):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await self._call(self._write, [self._row(doc, doc['id'], doc.get('timestamp') or now) for doc in docs])
+
+    def _update(self, resume_id, compute_changes, expected_version):
+        row = self._conn.execute("SELECT timestamp, data FROM resumes WHERE id = ?", (resume_id,)).fetchone()
+        stored = self._document(resume_id, *row) if row else None
+        if stored is not None:
+            del stored['id']
+        _check_version(resume_id, stored, expected_version)
+        changes = compute_changes(stored)
+        if not changes:
+            return stored, changes
+        updated = dict(apply_changes(stored, changes), timestamp=datetime.datetime.now(datetime.timezone.utc))
+        self._conn.execute("UPDATE resumes SET email = ?, timestamp = ?, data = ? WHERE id = ?",
+                           self._row(updated, resume_id, updated['timestamp'])[1:] + (resume_id,))
+        return updated, changes
+
+    async def update(self, resume_id, compute_changes, expected_version=None):
+        return await self._call(
+            lambda: self._transaction(self._update, resume_id, compute_changes, expected_version, immediate=True))
+
+    def _get_many(self, ids):
+        found = {}
+        for chunk in _chunks(ids, MAX_BATCH_WRITES):
+            placeholders = ', '.join('?' for _ in chunk)
+            for resume_id, timestamp, data in self._conn.execute(
+                    f"SELECT id, timestamp, data FROM resumes WHERE id IN ({placeholders})", chunk):
+                found[resume_id] = self._document(resume_id, timestamp, data)
+        return [found.get(resume_id) for resume_id in ids]
+
+    async def get_many(self, ids):
+        return await self._call(self._get_many, ids)
+
+    async def delete_many(self, ids):
+        await self._call(self._transaction, self._conn.executemany,
+                         "DELETE FROM resumes WHERE id = ?", [(resume_id,) for resume_id in ids])
+
+    def _select(self, limit=None, after=None, fields=None):
+        query = "SELECT id, timestamp, data FROM resumes"
+        params = []
+        if after:
+            query += " WHERE (timestamp, id) < (?, ?)"
+            params += [_format_timestamp(after[0]), after[1]]
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._document(resume_id, timestamp, data, fields)
+                for resume_id, timestamp, data in self._conn.execute(query, params)]
+
+    async def list_all(self):
+        return await self._call(self._select)
+
+    async def list_page(self, limit, after=None, fields=None):
+        return await self._call(self._select, limit, after, fields)
+
+
+class ResumeRepository:
+    """
+    Async repository for resume documents.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def insert(self, data, original_filename=None):
+        return (await self.insert_many([(data, original_filename)]))[0]
+
+    async def insert_many(self, items):
+        """
+        Inserts many resumes using batched writes.
+        Args:
+            items (list): (data, original_filename) tuples.
+        Returns:
+            list: The new document IDs, aligned with `items`.
+        """
+        docs = [build_resume_doc(data, original_filename) for data, original_filename in items]
+        return await self.backend.insert_many(docs) if docs else []
+
+    async def replace(self, resume_id, data, original_filename=None):
+        """
+        Overwrites a resume document, keeping its ID (the timestamp is refreshed).
+        """
+        await self.backend.replace(resume_id, build_resume_doc(data, original_filename))
+
+    async def update(self, resume_id, data, expected_version=None, fields=None):
+        """
+        Writes only the fields of a resume that differ from the stored document.
+        The diff is computed against the stored document inside the same
+        transaction as the write.
+        Args:
+            resume_id (str): The resume to update.
+            data (Resume or dict): The edited resume. A dict may also carry
+                'original_filename', which is then updated too (unless `fields`
+                leaves it out).
+            expected_version (str, optional): `document_version` of the document
+                the edit was based on; None skips the check.
+            fields (iterable, optional): Only compare these fields (partial updates).
+        Returns:
+            tuple: (document as written, with 'id' and its new timestamp,
+                dict of changes field -> (op, value))
+        Raises:
+            ResumeNotFoundError: If the resume does not exist.
+            ConflictError: If the stored version is not `expected_version`.
+            ResumeValidationError: If `data` does not have the resume shape.
+        """
+        edited = Resume.from_dict(data)
+        if isinstance(data, dict) and 'original_filename' in data:
+            edited = dict(edited.to_dict(), original_filename=data['original_filename'])
+        fields = tuple(fields) if fields is not None else DOCUMENT_FIELDS + ('original_filename',)
+        document, changes = await self.backend.update(
+            resume_id, lambda stored: diff_document(stored, edited, fields), expected_version)
+        return dict(document, id=resume_id), changes
+
+    async def get(self, resume_id):
+        return (await self.get_many([resume_id]))[0]
+
+    async def get_many(self, ids):
+        """
+        Fetches many resumes in one round-trip.
+        Returns:
+            list: Resume dicts (with 'id') aligned with `ids`; None where not found.
+        """
+        return await self.backend.get_many(list(ids)) if ids else []
+
+    async def delete(self, resume_id):
+        await self.delete_many([resume_id])
+
+    async def delete_many(self, ids):
+        if ids:
+            await self.backend.delete_many(ids)
+
+    async def put_many(self, docs):
+        """
+        Writes stored documents as they are, keeping their 'id' and
+        'timestamp' (e.g. when syncing with another store); existing
+        documents with the same ids are overwritten.
+        """
+        if docs:
+            await self.backend.put_many(list(docs))
+
+    async def list_all(self):
+        return await self.backend.list_all()
+
+    async def list_page(self, page_size, cursor=None, fields=SUMMARY_FIELDS):
+        """
+        Fetches one page of resumes, newest first. Only `fields` are read
+        (projection), and the cost of a page does not depend on the size of
+        the collection.
+        Args:
+            page_size (int): Resumes per page.
+            cursor (str, optional): `next_cursor` of the previous page.
+            fields (list, optional): Fields to fetch; None fetches whole documents.
+        Returns:
+            tuple: (list of resume dicts, next_cursor or None on the last page)
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        # One extra document tells us whether another page exists
+        docs = await self.backend.list_page(page_size + 1, after=after, fields=fields)
+        next_cursor = encode_cursor(docs[page_size - 1]) if len(docs) > page_size else None
+        return docs[:page_size], next_cursor
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='repository-loop', daemon=True).start()
+        return _loop
+
+
+def run(coro):
+    """
+    Runs a repository coroutine from synchronous code (e.g. a Flask view)
+    on the shared background event loop and returns its result.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def create_repository(backend_name=None, path=None):
+    """
+    Builds the repository from RESUME_STORE_BACKEND: firestore (default),
+    sqlite (file RESUME_STORE_PATH, default data/resumes.sqlite3, or `path`)
+    or memory.
+    """
+    backend_name = (backend_name or os.environ.get('RESUME_STORE_BACKEND', 'firestore')).lower()
+    if backend_name == 'sqlite':
+        return ResumeRepository(SQLiteBackend(path or os.environ.get('RESUME_STORE_PATH', DEFAULT_SQLITE_PATH)))
+    if backend_name == 'firestore':
+        # The async client must be created on the loop it will be used from
+        return ResumeRepository(run(_create_firestore_backend()))
+    if backend_name == 'memory':
+        return ResumeRepository(MemoryBackend(latency=float(os.environ.get('MEMORY_STORE_LATENCY', 0))))
+    raise ValueError(f"Unknown RESUME_STORE_BACKEND: {backend_name}")
+
+
+async def _create_firestore_backend():
+    return FirestoreBackend()
@@ -1,49 +1,371 @@
 import os
-from langchain_core.output_parsers import JsonOutputParser
-from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
+import io
+import asyncio
+import threading
 from dotenv import load_dotenv
-import fitz
-import docx  
+from parse_cache import fingerprint
+import fast_extract
+import preprocess
+import metrics
+import llm_guard
+import llm_backends
+import models
+import ocr
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
+# Concurrency limit, retries and hedging shared by every remote model call in this process
+guard = llm_guard.create_llm_guard()
 
-prompt = PromptTemplate.from_template("""
+# Model backends tried in tiers, cheapest first (LLM_TIERS; see llm_backends.py)
+router = llm_backends.create_router(guard)
+
+# The LangChain/Gemini stack, PyMuPDF and python-docx are slow to import, so
+# they are loaded on first use (or by warm_up()) rather than at import time.
+# `resume_parser.llm` and `resume_parser.prompt` still work as attributes.
+_prompt = None
+_json_parser = None
+_chain = None
+_init_lock = threading.Lock()
+
+PROMPT_TEMPLATE = """
 You are a resume parser. Extract the following fields in JSON format:
-- name
-- email
-- phone
-- skills
-- education (list with degree, institution, passing_year,marks_percentage_cgpa)
-- work_experience (list with title, company, dates, description)
+{fields}
 
 Resume Text:
 -------------------
 {text}
 -------------------
 Return JSON only.
-""")
+"""
+
+# Prompt line for each field; only the fields the rule-based stage could not
+# fill with confidence are requested from the model.
+FIELD_PROMPTS = {
+    'name': "- name",
+    'email': "- email",
+    'phone': "- phone",
+    'skills': "- skills",
+    'education': "- education (list with degree, institution, passing_year,marks_percentage_cgpa)",
+    'work_experience': "- work_experience (list with title, company, dates, description)",
+}
+
+# Rule-based pre-extraction in front of the model (set FAST_PATH_ENABLED=0 to always send everything)
+FAST_PATH_ENABLED = os.environ.get('FAST_PATH_ENABLED', '1') != '0'
+
+# Changes whenever the prompt or model settings change; used to salt parse cache keys
+PARSER_VERSION = fingerprint(
+    PROMPT_TEMPLATE, router.describe(),
+    FAST_PATH_ENABLED, fast_extract.VERSION, fast_extract.MIN_CONFIDENCE, sorted(fast_extract.skill_matcher.canonical),
+    preprocess.PREPROCESS_ENABLED, preprocess.VERSION, preprocess.CHUNK_MAX_CHARS, preprocess.MAX_CHUNKS,
+    models.SCHEMA_VERSION
+)
+
+
+class ExtractionError(ValueError):
+    """Raised when no text can be extracted from an uploaded document."""
+
+
+# Optional limits for oversized documents (unset means no limit)
+EXTRACT_MAX_PAGES = int(os.environ['EXTRACT_MAX_PAGES']) if os.environ.get('EXTRACT_MAX_PAGES') else None
+EXTRACT_MAX_CHARS = int(os.environ['EXTRACT_MAX_CHARS']) if os.environ.get('EXTRACT_MAX_CHARS') else None
+
+
+def _take_until(parts, max_chars):
+    """
+    Yields text parts until `max_chars` characters have been produced.
+    Stopping early means the remaining pages/paragraphs are never read.
+    """
+    total = 0
+    for part in parts:
+        if max_chars is not None and total + len(part) >= max_chars:
+            yield part[:max_chars - total]
+            return
+        total += len(part)
+        yield part
+
+
+def extract_text_from_pdf(source, max_pages=EXTRACT_MAX_PAGES, max_chars=EXTRACT_MAX_CHARS):
+    """
+    Extracts text from a PDF.
+    Args:
+        source: A file path, or the document itself as bytes, bytearray,
+            memoryview or a binary file-like object (e.g. BytesIO).
+        max_pages (int, optional): Only read the first `max_pages` pages.
+        max_chars (int, optional): Stop reading once this many characters are extracted.
+    Pages without a text layer are OCR'd (see ocr.py).
+    """
+    import fitz
+    if isinstance(source, (str, os.PathLike)):
+        doc = fitz.open(source)
+    else:
+        doc = fitz.open(stream=source, filetype="pdf")
+    with doc:
+        pages = doc.pages(0, min(max_pages, doc.page_count)) if max_pages else doc
+        texts = list(_take_until((page.get_text() for page in pages), max_chars))
+        # Scanned pages have no text layer; OCR just those (texts[i] is page i)
+        blank = [number for number, text in enumerate(texts) if ocr.needs_ocr(text)]
+        if blank:
+            for number, text in ocr.ocr_pages(doc, blank).items():
+                if len(text.strip()) > len(texts[number].strip()):
+                    texts[number] = text
+            texts = list(_take_until(texts, max_chars))
+        # Single join instead of repeated `+=`, which copies the text per page.
+        # Pages are separated by a form feed so preprocessing can find page
+        # boundaries (running headers/footers); it is whitespace to everything else.
+        return "\f".join(texts).strip()
+
+def extract_text_from_docx(source, max_chars=EXTRACT_MAX_CHARS):
+    """
+    Extracts text from a DOCX.
+    Args:
+        source: A file path, or the document itself as bytes, bytearray,
+            memoryview or a binary file-like object (e.g. BytesIO).
+        max_chars (int, optional): Stop reading once this many characters are extracted.
+    """
+    import docx
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    doc = docx.Document(source)
+    lines = _take_until((para.text + "\n" for para in doc.paragraphs), max_chars)
+    return "".join(lines).strip()
+
+def extract_text_from_bytes(data, filename, **limits):
+    """
+    Extracts text from an in-memory PDF or DOCX, dispatching on the file extension.
+    """
+    if filename.lower().endswith('.pdf'):
+        extract = extract_text_from_pdf
+    elif filename.lower().endswith('.docx'):
+        limits.pop('max_pages', None)
+        extract = extract_text_from_docx
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+    with metrics.span('extract'):
+        text = extract(data, **limits)
+    metrics.count_bytes('upload', len(data))
+    metrics.count_bytes('extracted_text', len(text.encode('utf-8')))
+    return text
+
+def _prepare(text):
+    """
+    Cleans the text, runs the rule-based stage and builds the model inputs
+    for what is left. Long texts are split into section-aligned chunks.
+    Returns:
+        tuple: (PreExtraction or None, list of chain input dicts; empty if the model call can be skipped)
+    """
+    with metrics.span('preprocess'):
+        text = preprocess.preprocess_text(text)
+        if not FAST_PATH_ENABLED:
+            pre, missing, prompt_text = None, list(FIELD_PROMPTS), text
+        else:
+            pre = fast_extract.pre_extract(text)
+            missing = pre.missing_fields()
+            prompt_text = pre.text_for(missing) if missing else ''
+            fast_extract.record_prompt(text, prompt_text)
+        if not missing:
+            return pre, []
+        fields = "\n".join(FIELD_PROMPTS[f] for f in missing)
+        chunks = preprocess.chunk_text(prompt_text)
+        # Each chunk of a long resume holds only some of the fields, so only
+        # single-chunk answers are checked for how many fields they fill
+        requested = missing if len(chunks) == 1 else []
+        return pre, [{"text": chunk, "fields": fields, "requested": requested} for chunk in chunks]
 
+def _finish(pre, llm_outputs):
+    llm_data = preprocess.merge_partial_results(llm_outputs) if llm_outputs else {}
+    return fast_extract.merge(pre, llm_data) if pre is not None else llm_data
 
-def extract_text_from_pdf(file_path):
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text.strip()
+def get_llm():
+    """
+    Returns the backend of the top (most capable) tier.
+    """
+    return router.backends[-1]
 
-def extract_text_from_docx(file_path):
-    doc = docx.Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs]).strip()
+def set_llm(model):
+    """
+    Replaces every tier with one chat model (any object whose invoke() returns
+    a message or string), e.g. an offline stand-in for tests and benchmarks.
+    Calls to it still go through `guard`.
+    """
+    global router
+    with _init_lock:
+        router = llm_backends.TieredRouter([llm_backends.RunnableBackend(model)], guard=guard)
+
+def get_prompt():
+    global _prompt
+    if _prompt is None:
+        with _init_lock:
+            if _prompt is None:
+                from langchain_core.prompts import PromptTemplate
+                _prompt = PromptTemplate.from_template(PROMPT_TEMPLATE)
+    return _prompt
+
+def __getattr__(name):
+    # Lazy module attributes for code that imports `llm` or `prompt` directly
+    if name == 'llm':
+        return get_llm()
+    if name == 'prompt':
+        return get_prompt()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _parse_json(message):
+    """
+    Parses a model response (message or string) into validated, normalized resume data.
+    Raises:
+        OutputParserException: If the response is not JSON.
+        models.ResumeValidationError: If the JSON does not have the resume shape.
+    """
+    global _json_parser
+    if _json_parser is None:
+        from langchain_core.output_parsers import JsonOutputParser
+        _json_parser = JsonOutputParser()
+    with metrics.span('json_parse'):
+        # Model output is validated and normalized here, once
+        return models.Resume.from_dict(_json_parser.invoke(message)).to_dict()
+
+def get_chain():
+    """
+    Returns the shared parse chain (prompt -> routed model calls -> JSON), built
+    once per process. The router is looked up on every call, so set_llm()
+    applies to the existing chain.
+    """
+    global _chain
+    if _chain is None:
+        prompt = get_prompt()
+        with _init_lock:
+            if _chain is None:
+                from langchain_core.runnables import RunnableLambda
+
+                def route(inputs):
+                    # Each tier's answer is parsed and validated before the router accepts it
+                    return router.run(prompt.invoke(inputs), inputs["text"], inputs.get("requested", []), _parse_json)
+
+                _chain = RunnableLambda(route)
+    return _chain
+
+def warm_up():
+    """
+    Performs the deferred initialization ahead of the first request: imports
+    the PDF/DOCX libraries and builds the model client and parse chain.
+    """
+    import fitz
+    import docx
+    router.warm_up()
+    get_chain()
 
 def parse_resume_text(text):
-    chain = (
-        {"text": RunnablePassthrough()}
-        | prompt
-        | llm
-        | JsonOutputParser()
-    )
-    return chain.invoke(text)
+    pre, inputs = _prepare(text)
+    if not inputs:
+        return _finish(pre, [])
+    chain = get_chain()
+    if len(inputs) == 1:
+        return _finish(pre, [chain.invoke(inputs[0])])
+    # Chunks of one long resume are parsed concurrently
+    return _finish(pre, chain.batch(inputs, config={"max_concurrency": len(inputs)}))
+
+def _normalized(field, value):
+    try:
+        return models.Resume.from_dict({field: value}).to_dict()[field]
+    except models.ResumeValidationError:
+        return None
+
+def stream_resume_text(text):
+    """
+    Parses resume text like parse_resume_text, but yields fields as soon as
+    they are known: confident rule-based fields first (name, email and phone
+    typically come straight from the header), then each model field once the
+    model has moved on to the next one.
+    Yields:
+        (field, value) pairs, in the order they become known; a field is
+        yielded again if the final merge changes it. The last item is
+        ('result', data) with what parse_resume_text would return.
+    """
+    pre, inputs = _prepare(text)
+    emitted = {}
+
+    def changed(field, value):
+        if field in emitted and emitted[field] == value:
+            return False
+        emitted[field] = value
+        return True
+
+    confident = set(pre.confident_fields()) if pre is not None else set()
+    for field in fast_extract.FIELDS:
+        if field in confident:
+            value = _normalized(field, pre.data[field])
+            if changed(field, value):
+                yield field, value
+
+    outputs = []
+    if len(inputs) == 1:
+        for kind, value in router.stream(get_prompt().invoke(inputs[0]), inputs[0]["text"],
+                                         inputs[0]["requested"], _parse_json):
+            if kind == 'result':
+                outputs = [value]
+                continue
+            # Every key but the last is complete (JSON keys arrive in order)
+            for field in list(value)[:-1]:
+                if field in fast_extract.FIELDS and field not in confident and value[field]:
+                    normalized = _normalized(field, value[field])
+                    if normalized and changed(field, normalized):
+                        yield field, normalized
+    elif inputs:
+        # Chunks of a long resume are parsed concurrently and merged, so they are not streamed
+        outputs = get_chain().batch(inputs, config={"max_concurrency": len(inputs)})
+
+    data = _finish(pre, outputs)
+    for field in fast_extract.FIELDS:
+        if field in data and changed(field, data[field]):
+            yield field, data[field]
+    yield 'result', data
+
+async def aparse_resume_text(text):
+    """
+    Async version of parse_resume_text for use from an event loop.
+    Model calls still go through the shared guard (in LangChain's executor),
+    so they count against the same concurrency limit as synchronous parses.
+    """
+    pre, inputs = await asyncio.to_thread(_prepare, text)
+    if not inputs:
+        return _finish(pre, [])
+    chain = get_chain()
+    if len(inputs) == 1:
+        return _finish(pre, [await chain.ainvoke(inputs[0])])
+    return _finish(pre, await chain.abatch(inputs, config={"max_concurrency": len(inputs)}))
+
+def parse_resume_texts(texts, max_concurrency=4):
+    """
+    Parses many resume texts with at most `max_concurrency` model calls in flight.
+    Returns a list aligned with `texts`; a failed item holds its exception
+    instead of a dict so one bad resume does not fail the whole batch.
+    """
+    prepared = []
+    for text in texts:
+        try:
+            prepared.append(_prepare(text))
+        except Exception as e:
+            # A text the preprocessing can't handle fails only its own resume
+            prepared.append((e, []))
+    # Flatten every chunk of every resume into one bounded batch
+    owners = [i for i, (_, inputs) in enumerate(prepared) for _ in inputs]
+    outputs = []
+    if owners:
+        chain = get_chain()
+        outputs = chain.batch(
+            [chunk for _, inputs in prepared for chunk in inputs],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+    per_resume = [[] for _ in texts]
+    for i, output in zip(owners, outputs):
+        per_resume[i].append(output)
+
+    results = []
+    for (pre, _), resume_outputs in zip(prepared, per_resume):
+        if isinstance(pre, Exception):
+            results.append(pre)
+            continue
+        error = next((output for output in resume_outputs if isinstance(output, Exception)), None)
+        results.append(error if error is not None else _finish(pre, resume_outputs))
+    return results
@@ -0,0 +1,384 @@
+import os
+import re
+import math
+import time
+import threading
+import logging
+from array import array
+
+import numpy as np
+
+# --- Resume Search Index ---
+# In-memory inverted index over skills, work experience titles/descriptions and
+# education. Every term maps to a compact posting list: an array of internal
+# document numbers (uint32, ascending) with a parallel array of term
+# frequencies (uint16). New documents get increasing numbers, so inserts are
+# appends; deletes are tombstones that get compacted away once they pile up.
+#
+# Query syntax:
+#   python django          both terms (AND)
+#   flask OR django        either term
+#   python -java           exclude documents containing "java" (also: NOT java)
+#   skills:python          term restricted to one field (skills, title,
+#                          description, company, degree, institution)
+# Results are ranked with BM25 over the positive terms.
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*')
+
+FIELDS = ['skills', 'title', 'company', 'description', 'degree', 'institution']
+# Resume fields the index reads (name and email only for result summaries)
+INDEXED_FIELDS = {'name', 'email', 'skills', 'education', 'work_experience'}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMPACT_RATIO = 0.2 # compact postings once 20% of indexed documents are deleted
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def _resume_fields(resume):
+    """
+    Returns (field, text) pairs to index for a resume document.
+    """
+    for skill in resume.get('skills') or []:
+        yield 'skills', skill
+    for exp in resume.get('work_experience') or []:
+        if isinstance(exp, dict):
+            yield 'title', exp.get('title', '')
+            yield 'company', exp.get('company', '')
+            yield 'description', exp.get('description', '')
+    for edu in resume.get('education') or []:
+        if isinstance(edu, dict):
+            yield 'degree', edu.get('degree', '')
+            yield 'institution', edu.get('institution', '')
+
+
+def _contains(docs, candidates):
+    """
+    Membership mask of sorted `candidates` in the sorted posting list `docs`.
+    Costs O(len(candidates) * log(len(docs))), so a short candidate list is
+    checked against a long posting list without scanning it.
+    """
+    if not len(docs):
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+    return docs[positions] == candidates
+
+
+class _Postings:
+    __slots__ = ('docs', 'freqs')
+
+    def __init__(self):
+        self.docs = array('I')
+        self.freqs = array('H')
+
+
+class SearchIndex:
+    """
+    Incrementally maintained inverted index with boolean and BM25 ranked search.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._postings = {} # term -> _Postings
+        self._doc_ids = [] # internal number -> resume id (None once deleted)
+        self._numbers = {} # resume id -> internal number
+        self._summaries = [] # internal number -> {'name', 'email'}
+        self._lengths = array('I') # internal number -> token count
+        self._alive = bytearray() # internal number -> 1, or 0 once deleted
+        self._deleted = 0
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def build(self, resumes):
+        """
+        Rebuilds the index from scratch from an iterable of resume dicts (with 'id').
+        """
+        with self._lock:
+            self._clear()
+            for resume in resumes:
+                self._add(resume['id'], resume)
+
+    def add(self, resume_id, resume):
+        with self._lock:
+            if resume_id in self._numbers:
+                self._remove(resume_id)
+            self._add(resume_id, resume)
+
+    def remove(self, resume_id):
+        with self._lock:
+            self._remove(resume_id)
+            if self._deleted > COMPACT_RATIO * max(len(self._doc_ids), 1):
+                self._compact()
+
+    def _add(self, resume_id, resume):
+        number = len(self._doc_ids)
+        counts = {}
+        length = 0
+        for field, text in _resume_fields(resume):
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+                qualified = f'{field}:{token}'
+                counts[qualified] = counts.get(qualified, 0) + 1
+                length += 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(number)
+            postings.freqs.append(min(count, 65535))
+        self._doc_ids.append(resume_id)
+        self._numbers[resume_id] = number
+        self._summaries.append({'name': resume.get('name', ''), 'email': resume.get('email', '')})
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+
+    def _remove(self, resume_id):
+        number = self._numbers.pop(resume_id, None)
+        if number is None:
+            return
+        # Tombstone only; postings are filtered at query time until compaction
+        self._doc_ids[number] = None
+        self._summaries[number] = None
+        self._alive[number] = 0
+        self._total_length -= self._lengths[number]
+        self._deleted += 1
+
+    def _compact(self):
+        live = [(self._doc_ids[n], n) for n in range(len(self._doc_ids)) if self._doc_ids[n] is not None]
+        renumber = np.full(len(self._doc_ids), -1, dtype=np.int64)
+        for new, (_, old) in enumerate(live):
+            renumber[old] = new
+        postings = {}
+        for term, old_postings in self._postings.items():
+            docs = renumber[np.frombuffer(old_postings.docs, dtype=np.uint32)]
+            keep = docs >= 0
+            if not keep.any():
+                continue
+            compacted = _Postings()
+            compacted.docs = array('I', docs[keep].astype(np.uint32).tobytes())
+            compacted.freqs = array('H', np.frombuffer(old_postings.freqs, dtype=np.uint16)[keep].tobytes())
+            postings[term] = compacted
+        self._postings = postings
+        self._summaries = [self._summaries[old] for _, old in live]
+        self._lengths = array('I', (self._lengths[old] for _, old in live))
+        self._alive = bytearray(b'\x01') * len(live)
+        self._doc_ids = [resume_id for resume_id, _ in live]
+        self._numbers = {resume_id: new for new, (resume_id, _) in enumerate(live)}
+        self._deleted = 0
+
+    def _docs(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            return np.empty(0, dtype=np.uint32)
+        return np.frombuffer(postings.docs, dtype=np.uint32)
+
+    def _group_docs(self, group):
+        if len(group) == 1:
+            return self._docs(group[0])
+        return np.unique(np.concatenate([self._docs(term) for term in group]))
+
+    @staticmethod
+    def parse_query(query):
+        """
+        Parses a query into (groups, excluded): `groups` is a list of OR-groups
+        that must all match, each a list of terms; `excluded` is a list of terms.
+        """
+        groups = []
+        excluded = []
+        negate_next = False
+        join_next = False
+        for word in query.split():
+            if word == 'OR':
+                join_next = bool(groups)
+                continue
+            if word == 'AND':
+                continue
+            if word == 'NOT':
+                negate_next = True
+                continue
+            negate = negate_next or word.startswith('-')
+            field, _, text = word.lstrip('-').rpartition(':')
+            terms = [f'{field.lower()}:{token}' if field.lower() in FIELDS else token for token in tokenize(text)]
+            if not terms:
+                continue
+            if negate:
+                excluded.extend(terms)
+            elif join_next:
+                groups[-1].extend(terms)
+            else:
+                groups.extend([term] for term in terms)
+            negate_next = join_next = False
+        return groups, excluded
+
+    def search(self, query, k=20, ranked=True):
+        """
+        Runs a query.
+        Args:
+            query (str): See the module comment for syntax.
+            k (int): Maximum number of results.
+            ranked (bool): Order by BM25 score; otherwise by recency (newest first).
+        Returns:
+            tuple: (total number of matches, list of {'id', 'name', 'email', 'score'})
+        """
+        groups, excluded = self.parse_query(query)
+        if not groups:
+            return 0, []
+        with self._lock:
+            # Intersect starting from the smallest group so intermediate results stay small
+            group_docs = sorted((self._group_docs(group) for group in groups), key=len)
+            matches = group_docs[0]
+            for docs in group_docs[1:]:
+                if not len(matches):
+                    break
+                matches = matches[_contains(docs, matches)]
+            for term in excluded:
+                if len(matches):
+                    matches = matches[~_contains(self._docs(term), matches)]
+            if self._deleted and len(matches):
+                matches = matches[np.frombuffer(self._alive, dtype=np.uint8)[matches].astype(bool)]
+            total = len(matches)
+            if not total:
+                return 0, []
+
+            if ranked:
+                scores = self._bm25(matches, [term for group in groups for term in group])
+                if total > k:
+                    # Partial selection of the top k, then sort just those
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top], kind='stable')]
+                else:
+                    top = np.argsort(-scores, kind='stable')
+                chosen = [(int(matches[i]), float(scores[i])) for i in top]
+            else:
+                chosen = [(int(n), None) for n in matches[::-1][:k]]
+
+            results = []
+            for number, score in chosen:
+                result = dict(self._summaries[number], id=self._doc_ids[number])
+                result['score'] = round(score, 4) if score is not None else None
+                results.append(result)
+            return total, results
+
+    def _bm25(self, matches, terms):
+        live_docs = max(len(self._numbers), 1)
+        average_length = self._total_length / live_docs if self._total_length else 1.0
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[matches].astype(np.float64)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+        scores = np.zeros(len(matches))
+        alive = np.frombuffer(self._alive, dtype=np.uint8) if self._deleted else None
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings.docs, dtype=np.uint32)
+            freqs = np.frombuffer(postings.freqs, dtype=np.uint16).astype(np.float64)
+            positions = np.minimum(np.searchsorted(docs, matches), len(docs) - 1)
+            present = docs[positions] == matches
+            # Tombstoned documents stay in the postings until compaction; they don't count
+            doc_freq = int(alive[docs].sum()) if alive is not None else len(docs)
+            idf = math.log(1 + (live_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            tf = np.where(present, freqs[positions], 0.0)
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._numbers),
+                'terms': len(self._postings),
+                'tombstones': self._deleted,
+                'posting_bytes': sum(p.docs.itemsize * len(p.docs) + p.freqs.itemsize * len(p.freqs)
+                                     for p in self._postings.values())
+            }
+
+
+# --- Shared index ---
+# Built on first use from a full scan of the collection, then kept current by
+# the database change listener. The index is per process: writes made by other
+# processes are picked up on the next rebuild (SEARCH_INDEX_MAX_AGE seconds).
+
+MAX_AGE = float(os.environ.get('SEARCH_INDEX_MAX_AGE', 0)) # 0 = never rebuild
+
+_index = None
+_built_at = 0.0
+_listening = False
+_pending = None # change events received while a build is in progress
+_events_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _apply(index, event, resume_id, data):
+    if event == 'insert':
+        index.add(resume_id, data)
+    elif event == 'update':
+        if INDEXED_FIELDS.intersection(data['changed']):
+            index.add(resume_id, data['document'])
+    elif event == 'delete':
+        index.remove(resume_id)
+
+
+def _on_change(event, resume_id, data):
+    with _events_lock:
+        if _pending is not None:
+            _pending.append((event, resume_id, data))
+            return
+        index = _index
+    if index is not None:
+        _apply(index, event, resume_id, data)
+
+
+def _is_fresh():
+    return _index is not None and not (MAX_AGE and time.monotonic() - _built_at > MAX_AGE)
+
+
+def get_index():
+    """
+    Returns the shared SearchIndex, building it on first use.
+    """
+    global _index, _built_at, _listening, _pending
+    if _is_fresh():
+        return _index
+    import database
+    with _rebuild_lock:
+        if _is_fresh():
+            return _index
+        with _events_lock:
+            _pending = []
+        if not _listening:
+            database.add_change_listener(_on_change)
+            _listening = True
+        index = SearchIndex()
+        try:
+            start = time.perf_counter()
+            # Read through the repository so a failed scan is not mistaken for an
+            # empty collection (and published as an index that matches nothing)
+            index.build(database.run(database.get_repository().list_all()))
+        except Exception:
+            with _events_lock:
+                _pending = None
+            raise
+        with _events_lock:
+            # Replay writes that raced with the full scan, then publish
+            for event, resume_id, data in _pending:
+                _apply(index, event, resume_id, data)
+            _pending = None
+            _index = index
+            _built_at = time.monotonic()
+        logger.info("Search index built over %d resumes in %.2fs", len(index), time.perf_counter() - start)
+        return index
+
+
+def stats():
+    index = _index
+    return index.stats() if index is not None else None
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import argparse
+import logging
+
+from repository import create_repository, run, DEFAULT_SQLITE_PATH
+
+# --- Store Sync ---
+# Copies resume documents between Firestore and the embedded SQLite store,
+# keeping their ids and timestamps:
+#   python store_sync.py pull    # Firestore -> SQLite (offline copy, local bulk work)
+#   python store_sync.py push    # SQLite -> Firestore
+# Only documents that differ from the target's copy are written; --prune
+# also deletes target documents the source doesn't have.
+# Both stores are read in full (one Firestore read per stored resume).
+
+logger = logging.getLogger(__name__)
+
+
+def open_store(backend_name, path=None):
+    """
+    Opens a repository for `backend_name` (firestore, sqlite or memory).
+    """
+    if backend_name == 'firestore':
+        from database import init_firebase
+        init_firebase()
+    return create_repository(backend_name, path=path)
+
+
+async def sync(source, target, prune=False, dry_run=False):
+    """
+    Makes `target` hold the documents of `source`.
+    Args:
+        source, target (ResumeRepository): The stores to copy from and to.
+        prune (bool): Also delete target documents missing from the source.
+        dry_run (bool): Only count what would change.
+    Returns:
+        dict: 'source' (documents read), 'written', 'unchanged' and 'deleted'.
+    """
+    docs = await source.list_all()
+    existing = {doc['id']: doc for doc in await target.list_all()}
+    changed = [doc for doc in docs if existing.get(doc['id']) != doc]
+    deleted = sorted(set(existing) - {doc['id'] for doc in docs}) if prune else []
+    if not dry_run:
+        await target.put_many(changed)
+        await target.delete_many(deleted)
+    return {'source': len(docs), 'written': len(changed), 'unchanged': len(docs) - len(changed), 'deleted': len(deleted)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync resumes between Firestore and the local SQLite store.")
+    parser.add_argument('direction', choices=['pull', 'push'],
+                        help="pull: Firestore -> SQLite; push: SQLite -> Firestore")
+    parser.add_argument('--path', default=os.environ.get('RESUME_STORE_PATH', DEFAULT_SQLITE_PATH),
+                        help="SQLite file (default: RESUME_STORE_PATH or data/resumes.sqlite3)")
+    parser.add_argument('--prune', action='store_true', help="Delete documents the source doesn't have")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(), format='%(levelname)s %(name)s: %(message)s')
+
+    firestore, sqlite = open_store('firestore'), open_store('sqlite', args.path)
+    source, target = (firestore, sqlite) if args.direction == 'pull' else (sqlite, firestore)
+    start = time.perf_counter()
+    result = run(sync(source, target, prune=args.prune, dry_run=args.dry_run))
+    print(f"{'Would write' if args.dry_run else 'Wrote'} {result['written']} of {result['source']} resumes "
+          f"({result['unchanged']} unchanged), {'would delete' if args.dry_run else 'deleted'} {result['deleted']} "
+          f"in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())